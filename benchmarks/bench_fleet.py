@@ -0,0 +1,97 @@
+"""
+Fleet evaluation benchmark: decisions/s for N synthetic segments against the number of
+worker processes of src/fleet.py's FleetEvaluator, plus a per-segment get_speed_limit loop.
+
+Segments and their sensors come from synthetic_sensors(); readings are random, so about
+a third of the segments are dark and routed to the NN. Uses models/nn_model.npz if it
+exists, otherwise a random-weight NumPy model of the same shape (64, 32), so the benchmark
+runs without a trained model. The AQI agent falls back to rules without GEMINI_API_KEY.
+
+Usage (from the repository root):
+    PYTHONPATH=. python benchmarks/bench_fleet.py [--segments 1000 100000] [--workers 0 1 2 4] [--repeat 5]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from src import decision_logic
+from src.fleet import FleetEvaluator, segments_from_sensors, synthetic_sensors
+from src.model_registry import BACKEND_NUMPY, ModelRegistry, NUMPY_MODEL_PATH
+from src.runtime_utils import available_cores
+
+
+def _random_numpy_model(path: str, hidden_layers=(64, 32), seed: int = 0) -> str:
+    rng = np.random.default_rng(seed)
+    dims = [8, *hidden_layers, 1]
+    arrays = {'scaler_mean': np.array([50, 500, 80, 5, 10, 180, 20, 800], dtype=np.float64),
+              'scaler_scale': np.array([20, 300, 10, 10, 5, 100, 10, 500], dtype=np.float64),
+              'activations': np.array(['relu'] * len(hidden_layers) + ['linear'])}
+    for i, (fan_in, fan_out) in enumerate(zip(dims[:-1], dims[1:])):
+        arrays[f'kernel_{i}'] = rng.normal(0, 1 / np.sqrt(fan_in), (fan_in, fan_out))
+        arrays[f'bias_{i}'] = np.zeros(fan_out)
+    np.savez_compressed(path, **arrays)
+    return path
+
+
+def _readings(segments: int, seed: int = 0) -> pd.Series:
+    rng = np.random.default_rng(seed)
+    sensors = synthetic_sensors(segments)
+    high = sensors['SensorTypeCode'].map({'L': 1500.0, 'W': 2000.0, 'T': 15.0}).to_numpy()
+    low = sensors['SensorTypeCode'].map({'L': 0.0, 'W': 0.0, 'T': -5.0}).to_numpy()
+    return pd.Series(rng.uniform(low, high), index=sensors['SensorID'])
+
+
+def benchmark_fleet(segment_counts=(1000, 100000), worker_counts=None, repeat: int = 5,
+                    single_loop_segments: int = 1000) -> dict:
+    worker_counts = worker_counts or sorted({0, 1, 2, len(available_cores())})
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = NUMPY_MODEL_PATH if os.path.exists(NUMPY_MODEL_PATH) else \
+            _random_numpy_model(os.path.join(tmp, 'nn_model.npz'))
+        options = {'numpy_model_path': model_path, 'backend': BACKEND_NUMPY}
+        decision_logic.registry = ModelRegistry(**options)
+        results = {'cores': len(available_cores()), 'model': model_path, 'repeat': repeat}
+
+        # Baseline: one get_speed_limit call per segment, as a per-segment controller loop does
+        readings = _readings(single_loop_segments)
+        with FleetEvaluator(segments_from_sensors(synthetic_sensors(single_loop_segments)), workers=0) as fleet:
+            inputs = fleet.segment_inputs(readings)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for illuminance, water_level, temperature in zip(*inputs):
+                decision_logic.get_speed_limit(illuminance, water_level, temperature, 18)
+        results['get_speed_limit_loop'] = {'segments': single_loop_segments,
+                                           'decisions_per_second': single_loop_segments / (time.perf_counter() - start)}
+
+        for segments in segment_counts:
+            readings = _readings(segments)
+            fleet_segments = segments_from_sensors(synthetic_sensors(segments))
+            for workers in worker_counts:
+                with FleetEvaluator(fleet_segments, workers=workers, registry_options=options) as fleet:
+                    fleet.evaluate(readings, 18)  # warm-up
+                    timings = []
+                    for _ in range(repeat):
+                        start = time.perf_counter()
+                        fleet.evaluate(readings, 18)
+                        timings.append(time.perf_counter() - start)
+                results[f'segments_{segments}_workers_{workers}'] = {
+                    'median_ms': float(np.median(timings) * 1000),
+                    'decisions_per_second': segments / float(np.median(timings)),
+                }
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--segments', type=int, nargs='+', default=[1000, 100000])
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help='Worker process counts (0: inline); default 0, 1, 2 and all cores')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(benchmark_fleet(args.segments, args.workers, args.repeat), indent=2))
@@ -0,0 +1,87 @@
+"""
+Incremental preprocessing benchmark: nightly append versus full rebuild.
+
+Builds a scaled copy of the year-N data (see bench_preprocessing.py), holds back the
+readings of the last `--days` days and the last `--accidents` lines of the accident log, runs an
+initial incremental pass, appends the held-back lines and then times the incremental update against a
+full rebuild of the same files. The accident log is not chronological, so the appended accidents fall
+on earlier hours whose counts the update has to revise.
+
+Usage (from the repository root):
+    PYTHONPATH=. python benchmarks/bench_incremental.py [--months 12] [--repeat 4] [--days 1] [--accidents 20]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from unittest.mock import patch
+
+import pandas as pd
+
+from benchmarks.bench_preprocessing import build_scaled_dataset
+from src.data_preprocessing import (
+    ACCIDENTS_FILE, SENSOR_READINGS_FILE, load_and_preprocess_data, load_processed_data)
+
+
+def _timed(**kwargs) -> float:
+    start = time.perf_counter()
+    with patch('builtins.print'):
+        load_and_preprocess_data(**kwargs)
+    return time.perf_counter() - start
+
+
+def benchmark_incremental(months: int = 12, repeat: int = 1, days: int = 1, accidents: int = 20) -> dict:
+    with tempfile.TemporaryDirectory() as data_dir:
+        rows = build_scaled_dataset(data_dir, months, repeat)
+        readings_path = os.path.join(data_dir, SENSOR_READINGS_FILE)
+        with open(readings_path, 'rb') as f:
+            content = f.read()
+        # Byte offset of the first held-back reading (the file is chronological)
+        readings = pd.read_csv(readings_path, sep=';', usecols=['Month', 'Day'])
+        held_back = (readings['Month'] == months) & (readings['Day'] > readings['Day'].where(
+            readings['Month'] == months).max() - days)
+        first_held_back = int(held_back.to_numpy().argmax())
+        cut = 0
+        for _ in range(first_held_back + 1):  # header plus the rows before the held-back ones
+            cut = content.index(b'\n', cut) + 1
+        accidents_path = os.path.join(data_dir, ACCIDENTS_FILE)
+        with open(accidents_path, 'rb') as f:
+            lines = [line for line in f.read().splitlines() if line]
+        late_accidents = lines[-accidents:] if accidents else []
+        with open(accidents_path, 'wb') as f:
+            f.write(b''.join(line + b'\r\n' for line in lines[:len(lines) - len(late_accidents)]))
+
+        incremental_path = os.path.join(data_dir, 'processed', 'incremental.parquet')
+        full_path = os.path.join(data_dir, 'processed', 'full.parquet')
+        with open(readings_path, 'wb') as f:
+            f.write(content[:cut])
+        initial = _timed(data_dir=data_dir, output_path=incremental_path, incremental=True)
+        with open(readings_path, 'ab') as f:
+            f.write(content[cut:])
+        with open(accidents_path, 'ab') as f:
+            f.write(b''.join(line + b'\r\n' for line in late_accidents))
+        update = _timed(data_dir=data_dir, output_path=incremental_path, incremental=True)
+        full = _timed(data_dir=data_dir, output_path=full_path)
+        # The incremental Parquet store is a directory of part files
+        identical = load_processed_data(incremental_path).equals(load_processed_data(full_path))
+    return {
+        'rows': rows,
+        'appended_rows': int(held_back.sum()),
+        'appended_accidents': len(late_accidents),
+        'initial_incremental_seconds': initial,
+        'incremental_update_seconds': update,
+        'full_rebuild_seconds': full,
+        'speedup': full / update,
+        'identical_output': identical,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--months', type=int, default=12)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--days', type=int, default=1)
+    parser.add_argument('--accidents', type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(benchmark_incremental(args.months, args.repeat, args.days, args.accidents), indent=2))
@@ -0,0 +1,77 @@
+"""
+Inference latency benchmark: Keras `model.predict` versus the NumPy backend
+(and the risk lookup table, if models/risk_table.npy has been built).
+
+Loads models/nn_model.keras and models/scaler.pkl (exporting models/nn_model.npz
+if needed), checks that the backends agree, and reports per-row and batched latency.
+
+Usage (from the repository root, after running src/nn_training.py):
+    PYTHONPATH=. python benchmarks/bench_inference.py [--rows 10000] [--single-calls 200]
+"""
+import argparse
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+from tensorflow.keras.models import load_model
+
+from src.model_registry import MODEL_PATH, SCALER_PATH, RISK_TABLE_PATH
+from src.risk_table import RiskTable
+from src.numpy_inference import NumpyMLP, export_numpy_model, NUMPY_MODEL_PATH
+
+
+def _per_call_seconds(fn, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls
+
+
+def benchmark_inference(rows: int = 10000, single_calls: int = 200, seed: int = 0) -> dict:
+    model = load_model(MODEL_PATH)
+    scaler = joblib.load(SCALER_PATH)
+    if not os.path.exists(NUMPY_MODEL_PATH):
+        export_numpy_model(model, scaler, NUMPY_MODEL_PATH)
+    engine = NumpyMLP.load(NUMPY_MODEL_PATH)
+
+    rng = np.random.default_rng(seed)
+    features = scaler.mean_ + rng.standard_normal((rows, len(scaler.mean_))) * scaler.scale_
+    keras_out = model.predict(scaler.transform(features), verbose=0, batch_size=rows)
+    numpy_out = engine.predict(features)
+
+    row = features[:1]
+    results = {
+        'rows': rows,
+        'max_abs_difference': float(np.max(np.abs(keras_out - numpy_out))),
+        'keras_single_row_ms': 1000 * _per_call_seconds(
+            lambda: model.predict(scaler.transform(row), verbose=0), single_calls),
+        'numpy_single_row_ms': 1000 * _per_call_seconds(lambda: engine.predict(row), single_calls),
+        'keras_batch_ms': 1000 * _per_call_seconds(
+            lambda: model.predict(scaler.transform(features), verbose=0, batch_size=rows), 5),
+        'numpy_batch_ms': 1000 * _per_call_seconds(lambda: engine.predict(features), 5),
+    }
+    if os.path.exists(RISK_TABLE_PATH):
+        table = RiskTable.load(RISK_TABLE_PATH)
+        # The table only varies light, temperature and water; the other features stay at their means
+        weather_features = np.tile(scaler.mean_, (rows, 1))
+        weather_features[:, 1] = np.clip(features[:, 1], table.light[0], table.light[-1])
+        weather_features[:, 3] = np.clip(features[:, 3], table.temperature[0], table.temperature[-1])
+        weather_features[:, 7] = np.clip(features[:, 7], table.water[0], table.water[-1])
+        results.update({
+            'table_max_error_bound': table.max_error,
+            'table_max_abs_difference': float(np.max(np.abs(
+                table.predict(weather_features) - engine.predict(weather_features)))),
+            'table_single_row_ms': 1000 * _per_call_seconds(lambda: table.predict(row), single_calls),
+            'table_batch_ms': 1000 * _per_call_seconds(lambda: table.predict(features), 5),
+        })
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--single-calls', type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(benchmark_inference(args.rows, args.single_calls), indent=2))
@@ -0,0 +1,70 @@
+"""
+SensorReadings reader benchmark: default pd.read_csv + to_datetime assembly versus the
+compact reader in src/log_reader.py (pandas and pyarrow engines).
+
+Builds a scaled copy of the year-N readings (see bench_preprocessing.py) and parses it in
+fresh processes. Reports parse and timestamp seconds, rows/s, DataFrame size and peak RSS.
+
+Usage (from the repository root):
+    PYTHONPATH=. python benchmarks/bench_log_reader.py [--months 12] [--repeat 4]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.bench_preprocessing import build_scaled_dataset
+from src.data_preprocessing import SENSOR_READINGS_FILE
+
+_RUN = """
+import json, resource, sys, time
+import numpy as np
+import pandas as pd
+from src.log_reader import YEAR, read_sensor_readings, reading_times
+path, variant = sys.argv[1], sys.argv[2]
+start = time.perf_counter()
+if variant == 'default':
+    readings = pd.read_csv(path, sep=';', decimal=',')
+else:
+    engine, value_dtype = variant.split('-')
+    readings = read_sensor_readings(path, engine=engine, value_dtype=np.dtype(value_dtype))
+parsed = time.perf_counter()
+if variant == 'default':
+    times = pd.to_datetime(readings[['Month', 'Day', 'Hour', 'Minute', 'Second']].assign(Year=YEAR))
+else:
+    times = reading_times(readings)
+done = time.perf_counter()
+print(json.dumps({'parse_seconds': parsed - start, 'timestamp_seconds': done - parsed,
+                  'frame_mb': readings.memory_usage(deep=True).sum() / 2**20,
+                  'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+VARIANTS = ('default', 'pandas-float32', 'pyarrow-float32', 'pandas-float64', 'pyarrow-float64')
+
+
+def _run(path: str, variant: str) -> dict:
+    output = subprocess.run([sys.executable, '-c', _RUN, path, variant],
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def benchmark_log_reader(months: int = 12, repeat: int = 1) -> dict:
+    with tempfile.TemporaryDirectory() as data_dir:
+        rows = build_scaled_dataset(data_dir, months, repeat)
+        path = os.path.join(data_dir, SENSOR_READINGS_FILE)
+        results = {'rows': rows, 'file_mb': os.path.getsize(path) / 2**20}
+        for variant in VARIANTS:
+            run = _run(path, variant)
+            run['rows_per_second'] = rows / (run['parse_seconds'] + run['timestamp_seconds'])
+            results[variant] = run
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--months', type=int, default=12)
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+    print(json.dumps(benchmark_log_reader(args.months, args.repeat), indent=2))
@@ -0,0 +1,88 @@
+"""
+Near-accident aggregation benchmark: filter + resample + count + left join (the previous
+pandas path, kept here as reference) versus the single np.bincount pass.
+
+The year-N accidents are replayed into every month and repeated `--repeat` times, then
+both paths align hourly counts to a full-year sensor index.
+
+Usage (from the repository root):
+    PYTHONPATH=. python benchmarks/bench_near_accidents.py [--repeat 100]
+"""
+import argparse
+import calendar
+import io
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.data_preprocessing import ACCIDENTS_FILE, YEAR, _count_accident_events, _with_accident_counts
+from src.log_reader import read_accidents
+
+
+def pandas_near_accidents(accidents: pd.DataFrame, sensor_hourly: pd.DataFrame) -> pd.DataFrame:
+    """The previous implementation, including its `notna() & col > 0` precedence."""
+    accidents = accidents.copy()
+    accidents['is_near_accident'] = (
+        (accidents['SkidAngle'].notna() & accidents['SkidAngle'] > 0) |
+        (accidents['CloseCarCm'].notna() & accidents['CloseCarCm'] > 0) |
+        (accidents['CloseGuardrailCm'].notna() & accidents['CloseGuardrailCm'] > 0)
+    )
+    accidents['datetime'] = pd.to_datetime(accidents[['Month', 'Day', 'Hour', 'Second']].assign(Year=YEAR))
+    accidents = accidents.drop(['Month', 'Day', 'Hour', 'Second', 'LicencePlate', 'Damage', 'Injured', 'CloseCarCm',
+                                'CloseGuardrailCm', 'SkidAngle'], axis=1)
+    near_accidents = accidents[accidents['is_near_accident']].resample('h', on='datetime').count()[
+        'is_near_accident'].rename('near_accidents')
+    combined_data = sensor_hourly.merge(near_accidents, left_index=True, right_index=True, how='left')
+    combined_data['near_accidents'] = combined_data['near_accidents'].fillna(0)
+    return combined_data
+
+
+def build_accidents(repeat: int = 1, source_dir: str = 'data') -> pd.DataFrame:
+    january = pd.read_csv(os.path.join(source_dir, ACCIDENTS_FILE), sep=';', decimal=',')
+    months = [january[january['Day'] <= calendar.monthrange(YEAR, month)[1]].assign(Month=month)
+              for month in range(1, 13)]
+    return pd.concat(months * repeat, ignore_index=True)
+
+
+def _to_csv_buffer(accidents: pd.DataFrame) -> io.BytesIO:
+    """Round-trips through the log format so the bincount path gets the reader's compact dtypes."""
+    return io.BytesIO(accidents.to_csv(sep=';', decimal=',', index=False).encode())
+
+
+def _best_of(function, repeats: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark_near_accidents(repeat: int = 1) -> dict:
+    accidents = build_accidents(repeat)
+    compact = read_accidents(_to_csv_buffer(accidents))
+    index = pd.date_range(f'{YEAR}-01-01', f'{YEAR}-12-31 23:00', freq='h', name='datetime')
+    sensor_hourly = pd.DataFrame({'light': np.zeros(len(index))}, index=index)
+
+    pandas_seconds = _best_of(lambda: pandas_near_accidents(accidents, sensor_hourly))
+    bincount_seconds = _best_of(lambda: _with_accident_counts(sensor_hourly, _count_accident_events(compact)))
+    expected = pandas_near_accidents(accidents, sensor_hourly)['near_accidents'].to_numpy()
+    result = _with_accident_counts(sensor_hourly, _count_accident_events(compact))
+    return {
+        'accidents': len(accidents),
+        'pandas_seconds': pandas_seconds,
+        'bincount_seconds': bincount_seconds,
+        'speedup': pandas_seconds / bincount_seconds,
+        'identical_near_accidents': bool(np.array_equal(expected, result['near_accidents'].to_numpy())),
+        'event_totals': {column: int(result[column].sum()) for column in result.columns if column != 'light'},
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+    print(json.dumps(benchmark_near_accidents(args.repeat), indent=2))
@@ -0,0 +1,78 @@
+"""
+Preprocessing benchmark: in-memory versus chunked sensor ingestion.
+
+Builds a scaled copy of the year-N data in a temporary directory (January is replayed
+into `--months` months, each reading repeated `--repeat` times at the same timestamp),
+then runs load_and_preprocess_data in fresh processes and reports rows/s and peak RSS.
+
+Usage (from the repository root):
+    PYTHONPATH=. python benchmarks/bench_preprocessing.py [--months 12] [--repeat 4] [--chunksize 100000]
+"""
+import argparse
+import calendar
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+
+from src.data_preprocessing import (ACCIDENTS_FILE, SENSOR_READINGS_FILE, SENSORS_FILE, SENSOR_TYPES_FILE, YEAR)
+
+_RUN = """
+import json, resource, sys, time
+from src.data_preprocessing import load_and_preprocess_data
+data_dir, output_path, chunksize = sys.argv[1], sys.argv[2], None if sys.argv[3] == 'None' else int(sys.argv[3])
+start = time.perf_counter()
+load_and_preprocess_data(data_dir, output_path, chunksize=chunksize)
+print(json.dumps({'seconds': time.perf_counter() - start,
+                  'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+def build_scaled_dataset(target_dir: str, months: int = 12, repeat: int = 1, source_dir: str = 'data') -> int:
+    """Writes a scaled, chronologically ordered copy of the V100 files. Returns the reading count."""
+    for name in (ACCIDENTS_FILE, SENSORS_FILE, SENSOR_TYPES_FILE):
+        shutil.copy(os.path.join(source_dir, name), target_dir)
+    january = pd.read_csv(os.path.join(source_dir, SENSOR_READINGS_FILE), sep=';', decimal=',')
+    rows = 0
+    with open(os.path.join(target_dir, SENSOR_READINGS_FILE), 'w') as f:
+        for month in range(1, months + 1):
+            block = january[january['Day'] <= calendar.monthrange(YEAR, month)[1]].assign(Month=month)
+            if repeat > 1:
+                block = block.loc[block.index.repeat(repeat)]
+            block.to_csv(f, sep=';', decimal=',', index=False, header=(month == 1), float_format='%.2f')
+            rows += len(block)
+    return rows
+
+
+def _run(data_dir: str, chunksize) -> dict:
+    output_path = os.path.join(data_dir, 'processed', f'processed_{chunksize}.csv')
+    output = subprocess.run([sys.executable, '-c', _RUN, data_dir, output_path, str(chunksize)],
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def benchmark_preprocessing(months: int = 12, repeat: int = 1, chunksize: int = 100000) -> dict:
+    with tempfile.TemporaryDirectory() as data_dir:
+        rows = build_scaled_dataset(data_dir, months, repeat)
+        results = {'rows': rows}
+        for name, size in (('in_memory', None), ('chunked', chunksize)):
+            run = _run(data_dir, size)
+            run['rows_per_second'] = rows / run['seconds']
+            results[name] = run
+        with open(os.path.join(data_dir, 'processed', 'processed_None.csv')) as a, \
+                open(os.path.join(data_dir, 'processed', f'processed_{chunksize}.csv')) as b:
+            results['identical_output'] = a.read() == b.read()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--months', type=int, default=12)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--chunksize', type=int, default=100000)
+    args = parser.parse_args()
+    print(json.dumps(benchmark_preprocessing(args.months, args.repeat, args.chunksize), indent=2))
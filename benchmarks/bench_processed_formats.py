@@ -0,0 +1,56 @@
+"""
+Processed-data format benchmark: CSV versus Parquet and Feather.
+
+Builds a processed dataset (the real one, tiled along the time axis `--scale` times),
+then reports write time, read time for the training columns, and file size per format.
+
+Usage (from the repository root):
+    PYTHONPATH=. python benchmarks/bench_processed_formats.py [--scale 100]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.data_preprocessing import (load_and_preprocess_data, load_processed_data, save_processed_data,
+                                    FEATURE_COLUMNS, TARGET_COLUMN)
+
+
+def _tiled(data: pd.DataFrame, scale: int) -> pd.DataFrame:
+    tiled = pd.concat([data] * scale)
+    tiled.index = pd.date_range(data.index[0], periods=len(tiled), freq='h', name='datetime')
+    return tiled
+
+
+def benchmark_formats(scale: int = 100, repeat: int = 3) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        data = _tiled(load_and_preprocess_data(output_path=os.path.join(tmp, 'base.csv')), scale)
+        results = {'rows': len(data)}
+        for extension in ('.csv', '.parquet', '.feather'):
+            path = os.path.join(tmp, f'processed_data{extension}')
+            write_times, read_times = [], []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                save_processed_data(data, path)
+                write_times.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                loaded = load_processed_data(path, columns=FEATURE_COLUMNS + [TARGET_COLUMN])
+                read_times.append(time.perf_counter() - start)
+            results[extension.lstrip('.')] = {
+                'write_seconds': float(np.median(write_times)),
+                'read_seconds': float(np.median(read_times)),
+                'size_mb': os.path.getsize(path) / 2**20,
+                'memory_mb': loaded.memory_usage(deep=True).sum() / 2**20,
+            }
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=int, default=100)
+    args = parser.parse_args()
+    print(json.dumps(benchmark_formats(args.scale), indent=2))
@@ -0,0 +1,71 @@
+"""
+Sensor aggregation benchmark: merge + pivot_table + resample versus the time x sensor matrix.
+
+Builds a scaled copy of the year-N readings (see bench_preprocessing.py), parses it once with
+the compact reader and times only the aggregation step of each path.
+
+Usage (from the repository root):
+    PYTHONPATH=. python benchmarks/bench_sensor_matrix.py [--months 12] [--repeat 4]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_preprocessing import build_scaled_dataset
+from src.data_preprocessing import (SENSOR_READINGS_FILE, SENSORS_FILE, SENSOR_TYPES_FILE, _aggregate_sensor_readings,
+                                    _build_sensor_lookup)
+from src.log_reader import read_sensor_readings, seconds_since_year_start
+from src.sensor_matrix import SensorMatrix
+
+
+def _best_of(function, repeats: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark_sensor_matrix(months: int = 12, repeat: int = 1) -> dict:
+    with tempfile.TemporaryDirectory() as data_dir:
+        rows = build_scaled_dataset(data_dir, months, repeat)
+        readings = read_sensor_readings(os.path.join(data_dir, SENSOR_READINGS_FILE), value_dtype=np.float64)
+        sensors = pd.read_csv(os.path.join(data_dir, SENSORS_FILE), sep=';')
+        sensor_types = pd.read_csv(os.path.join(data_dir, SENSOR_TYPES_FILE), sep=';')
+
+    lookup = _build_sensor_lookup(sensors.copy(), sensor_types.copy())
+    pivot_seconds = _best_of(lambda: _aggregate_sensor_readings(readings, lookup))
+
+    def build_matrix():
+        matrix = SensorMatrix(sensors, sensor_types)
+        seconds = seconds_since_year_start(readings['Month'], readings['Day'], readings['Hour'],
+                                           readings['Minute'], readings['Second'])
+        matrix.add_readings(seconds, readings['Sensor'].to_numpy(), readings['Value'].to_numpy())
+        return matrix.per_sensor(), matrix.per_type()
+
+    matrix_seconds = _best_of(build_matrix)
+    per_sensor, per_type = build_matrix()
+    return {
+        'rows': rows,
+        'merge_pivot_seconds': pivot_seconds,
+        'matrix_seconds': matrix_seconds,
+        'merge_pivot_rows_per_second': rows / pivot_seconds,
+        'matrix_rows_per_second': rows / matrix_seconds,
+        'speedup': pivot_seconds / matrix_seconds,
+        'per_sensor_columns': per_sensor.shape[1],
+        'per_type_columns': per_type.shape[1],
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--months', type=int, default=12)
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+    print(json.dumps(benchmark_sensor_matrix(args.months, args.repeat), indent=2))
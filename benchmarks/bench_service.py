@@ -0,0 +1,106 @@
+"""
+Load generator for the streaming speed limit service (src/speed_limit_service.py).
+
+Starts the service on a Unix socket in a separate process for every --max-batch-size value,
+then streams random sensor snapshots over --connections connections, either as fast as
+back-pressure allows or at a total --rate. Reports p50/p99 latency (send to decision) and
+decisions/s, plus the service's batching stats.
+
+Usage (from the repository root):
+    PYTHONPATH=. python benchmarks/bench_service.py [--requests 20000] [--connections 4]
+        [--max-batch-size 1 32 256] [--max-latency-ms 5] [--rate 0]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+
+def make_snapshots(count: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    return [json.dumps({'id': i, 'illuminance': float(rng.uniform(0, 2000)), 'water_level': float(rng.uniform(0, 2000)),
+                        'temperature': float(rng.uniform(-10, 20)), 'hour': int(rng.integers(0, 24)),
+                        'aqi': int(rng.integers(20, 180))}).encode() + b'\n'
+            for i in range(count)]
+
+
+async def _client(path: str, lines: list, interval: float) -> np.ndarray:
+    reader, writer = await asyncio.open_unix_connection(path)
+    sent = np.zeros(len(lines))
+    latencies = np.zeros(len(lines))
+
+    async def send():
+        start = time.perf_counter()
+        for i, line in enumerate(lines):
+            if interval:
+                await asyncio.sleep(max(0.0, start + i * interval - time.perf_counter()))
+            sent[i] = time.perf_counter()
+            writer.write(line)
+            await writer.drain()  # blocks when the service stops reading (back-pressure)
+        writer.write_eof()
+
+    sender = asyncio.ensure_future(send())
+    for i in range(len(lines)):
+        response = json.loads(await reader.readline())
+        latencies[i] = time.perf_counter() - sent[i]
+        if response.get('id') != json.loads(lines[i])['id']:
+            raise RuntimeError(f"Out-of-order response {response} for request {i}")
+    await sender
+    writer.close()
+    return latencies
+
+
+async def _load(path: str, snapshots: list, connections: int, rate: float) -> dict:
+    interval = connections / rate if rate else 0.0
+    parts = [snapshots[i::connections] for i in range(connections)]
+    start = time.perf_counter()
+    latencies = np.concatenate(await asyncio.gather(*(_client(path, part, interval) for part in parts)))
+    elapsed = time.perf_counter() - start
+    return {
+        'decisions': len(latencies),
+        'decisions_per_second': len(latencies) / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p99_ms': float(np.percentile(latencies, 99) * 1000),
+        'max_ms': float(latencies.max() * 1000),
+    }
+
+
+def benchmark_service(requests: int = 20000, connections: int = 4, batch_sizes=(1, 32, 256),
+                      max_latency_ms: float = 5.0, rate: float = 0.0) -> dict:
+    snapshots = make_snapshots(requests)
+    results = {'requests': requests, 'connections': connections, 'rate': rate or 'unpaced'}
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    for batch_size in batch_sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'speed_limit.sock')
+            service = subprocess.Popen([sys.executable, 'src/speed_limit_service.py', '--unix', path,
+                                        '--max-batch-size', str(batch_size), '--max-latency-ms', str(max_latency_ms)],
+                                       env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                while not os.path.exists(path):
+                    if service.poll() is not None:
+                        raise RuntimeError("The speed limit service exited during start-up.")
+                    time.sleep(0.05)
+                results[f'max_batch_size_{batch_size}'] = asyncio.run(_load(path, snapshots, connections, rate))
+            finally:
+                service.terminate()
+                service.wait()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--connections', type=int, default=4)
+    parser.add_argument('--max-batch-size', type=int, nargs='+', default=[1, 32, 256])
+    parser.add_argument('--max-latency-ms', type=float, default=5.0)
+    parser.add_argument('--rate', type=float, default=0.0, help='Total snapshots/s (0: as fast as possible)')
+    args = parser.parse_args()
+    print(json.dumps(benchmark_service(args.requests, args.connections, args.max_batch_size, args.max_latency_ms,
+                                       args.rate), indent=2))
@@ -0,0 +1,53 @@
+"""
+Start-up benchmark for the decision logic.
+
+Measures, in fresh interpreters, how long it takes to import src.decision_logic
+(rule-based path only) and to import it and warm up the NN model registry.
+
+Usage (from the repository root):
+    PYTHONPATH=. python benchmarks/bench_startup.py [--repeat 3]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+_IMPORT_ONLY = """
+import sys, time
+t0 = time.perf_counter()
+import src.decision_logic
+print(time.perf_counter() - t0, 'tensorflow' in sys.modules)
+"""
+
+_IMPORT_AND_WARM_UP = """
+import sys, time
+t0 = time.perf_counter()
+import src.decision_logic
+src.decision_logic.warm_up()
+print(time.perf_counter() - t0, 'tensorflow' in sys.modules)
+"""
+
+
+def _run(snippet: str) -> tuple[float, bool]:
+    output = subprocess.run([sys.executable, '-c', snippet], capture_output=True, text=True, check=True).stdout
+    seconds, tf_loaded = output.strip().splitlines()[-1].split()
+    return float(seconds), tf_loaded == 'True'
+
+
+def benchmark_startup(repeat: int = 3) -> dict:
+    results = {}
+    for name, snippet in (('import_only', _IMPORT_ONLY), ('import_and_warm_up', _IMPORT_AND_WARM_UP)):
+        runs = [_run(snippet) for _ in range(repeat)]
+        results[name] = {
+            'median_seconds': statistics.median(seconds for seconds, _ in runs),
+            'tensorflow_imported': runs[-1][1],
+        }
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    print(json.dumps(benchmark_startup(args.repeat), indent=2))
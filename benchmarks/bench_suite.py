@@ -0,0 +1,259 @@
+"""
+Benchmark suite: reproducible, offline timings of the data, training and decision paths,
+written as JSON for regression comparison between commits.
+
+For each scale (a multiple of the year-N volume, see synthetic_v100.py), synthetic V100
+logs are written to a temporary directory and timed, each step in a fresh process:
+- load_and_preprocess_data, in-memory and chunked: seconds, rows/s, peak RSS
+- train_nn_model (tf.data pipeline, fixed seed): seconds per epoch; skipped without TensorFlow
+- get_speed_limit per call and get_speed_limits per row, for the Keras and NumPy backends
+  of the trained model, with the router in local mode
+GEMINI_API_KEY is removed from the environment of every step, so the AQI agent uses its
+rule-based fallback and nothing touches the network. Scale 10000 (~126M readings, ~3 GB
+of CSV) is supported but not in the defaults.
+
+Usage (from the repository root):
+    PYTHONPATH=. python benchmarks/bench_suite.py [--scales 1 100] [--epochs 3] [--output bench.json]
+    PYTHONPATH=. python benchmarks/bench_suite.py --compare old.json new.json [--tolerance 0.1]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import importlib.util
+from importlib import metadata
+
+from benchmarks.synthetic_v100 import write_synthetic_v100
+from src.data_preprocessing import PROCESSED_PATH
+from src.model_registry import BACKEND_KERAS, BACKEND_NUMPY
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHUNKSIZE = 100_000
+INFERENCE_BACKENDS = (BACKEND_KERAS, BACKEND_NUMPY)
+# Result keys where larger is better; every other timing is better when smaller
+_HIGHER_IS_BETTER = ('per_second',)
+_TIMING_SUFFIXES = ('seconds', '_us', '_mb') + _HIGHER_IS_BETTER
+# Versions recorded with the results, and the distributions that provide each package
+_PACKAGES = {'numpy': ('numpy',), 'pandas': ('pandas',), 'pyarrow': ('pyarrow',), 'scikit-learn': ('scikit-learn',),
+             'tensorflow': ('tensorflow', 'tensorflow-cpu', 'tensorflow-macos'), 'keras': ('keras',)}
+
+_PREPROCESS = """
+import json, resource, sys, time
+from src.data_preprocessing import load_and_preprocess_data
+data_dir, output_path, chunksize = sys.argv[1], sys.argv[2], None if sys.argv[3] == 'None' else int(sys.argv[3])
+start = time.perf_counter()
+load_and_preprocess_data(data_dir, output_path, chunksize=chunksize)
+print(json.dumps({'seconds': time.perf_counter() - start,
+                  'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+_TRAIN = """
+import json, sys, time
+import tensorflow as tf
+import src.nn_training as nn_training
+epochs, batch_size, seed = map(int, sys.argv[1:4])
+tf.keras.utils.set_random_seed(seed)
+callbacks = []
+
+class _RecordingThroughput(nn_training.ThroughputCallback):
+    def __init__(self, rows):
+        super().__init__(rows)
+        callbacks.append(self)
+
+nn_training.ThroughputCallback = _RecordingThroughput
+start = time.perf_counter()
+nn_training.train_nn_model(epochs=epochs, batch_size=batch_size)
+seconds = time.perf_counter() - start
+throughput = callbacks[0]
+print(json.dumps({'seconds': seconds, 'train_rows': throughput.rows,
+                  'epoch_seconds': [throughput.rows / rate for rate in throughput.rows_per_second],
+                  'first_epoch_seconds': throughput.rows / throughput.rows_per_second[0],
+                  'median_epoch_rows_per_second': sorted(throughput.rows_per_second)[len(throughput.rows_per_second) // 2]}))
+"""
+
+_INFERENCE = """
+import contextlib, io, json, sys, time
+import numpy as np
+from src import decision_logic
+calls, rows, repeat, seed = map(int, sys.argv[1:5])
+rng = np.random.default_rng(seed)
+# About a third of the inputs are dark, so the router sends them to the NN
+illuminance, water_level = rng.uniform(0, 1500, rows), rng.uniform(0, 2000, rows)
+temperature, hours = rng.uniform(-5, 15, rows), rng.integers(0, 24, rows)
+start = time.perf_counter()
+decision_logic.warm_up()
+result = {'load_seconds': time.perf_counter() - start}
+with contextlib.redirect_stdout(io.StringIO()):
+    single, batched = [], []
+    for _ in range(repeat + 1):  # the first round warms up
+        start = time.perf_counter()
+        for i in range(calls):
+            decision_logic.get_speed_limit(illuminance[i], water_level[i], temperature[i], int(hours[i]))
+        single.append((time.perf_counter() - start) / calls)
+        start = time.perf_counter()
+        decision_logic.get_speed_limits(illuminance, water_level, temperature, hours)
+        batched.append(time.perf_counter() - start)
+result['single_call_us'] = float(np.median(single[1:]) * 1e6)
+result['single_calls_per_second'] = float(1 / np.median(single[1:]))
+result['batch_rows'] = rows
+result['batch_seconds'] = float(np.median(batched[1:]))
+result['batch_rows_per_second'] = rows / result['batch_seconds']
+print(json.dumps(result))
+"""
+
+
+def _offline_env(**overrides) -> dict:
+    """Environment of the timed processes: no API key, local router, the repository importable."""
+    env = {name: value for name, value in os.environ.items() if name != 'GEMINI_API_KEY'}
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [REPO_ROOT, env.get('PYTHONPATH')]))
+    env['SPEEDLIMIT_ROUTER_MODE'] = 'local'
+    env.update(overrides)
+    return env
+
+
+def _run(script: str, args, cwd: str, **env) -> dict:
+    """Runs a timing snippet in a fresh process and returns the JSON it prints last."""
+    completed = subprocess.run([sys.executable, '-c', script, *map(str, args)], cwd=cwd, env=_offline_env(**env),
+                               capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark step failed:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def _tensorflow_available() -> bool:
+    return importlib.util.find_spec('tensorflow') is not None  # without importing it here
+
+
+def environment() -> dict:
+    """Commit, interpreter, library versions and host of a run, to tell results apart."""
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], cwd=REPO_ROOT, capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    versions = {}
+    for package, distributions in _PACKAGES.items():
+        versions[package] = None
+        for distribution in distributions:
+            try:
+                versions[package] = metadata.version(distribution)
+                break
+            except metadata.PackageNotFoundError:
+                continue
+    status = git('status', '--porcelain', '--untracked-files=no')
+    return {'commit': git('rev-parse', 'HEAD'), 'dirty': bool(status) if status is not None else None,
+            'python': platform.python_version(), 'versions': versions, 'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(), 'cpus': os.cpu_count(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z')}
+
+
+def benchmark_scale(scale: float, epochs: int = 3, batch_size: int = 32, calls: int = 200, rows: int = 100_000,
+                    repeat: int = 5, seed: int = 0, chunksize: int = CHUNKSIZE) -> dict:
+    """Times every stage on synthetic data of one scale; the working directory is temporary."""
+    with tempfile.TemporaryDirectory() as work_dir:
+        data_dir = os.path.join(work_dir, 'data')
+        start = time.perf_counter()
+        generated = write_synthetic_v100(data_dir, scale, seed)
+        results = {'data': dict(generated, seconds=time.perf_counter() - start)}
+
+        # 1. Preprocessing; the chunked run writes the processed store that training reads
+        for name, size in (('in_memory', None), ('chunked', chunksize)):
+            output_path = os.path.join(work_dir, PROCESSED_PATH if size else 'data/processed/in_memory.parquet')
+            run = _run(_PREPROCESS, [data_dir, output_path, size], work_dir)
+            run['rows_per_second'] = generated['readings'] / run['seconds']
+            results[f'preprocess_{name}'] = run
+
+        # 2. Training, then inference with the model it saved under work_dir/models
+        if not _tensorflow_available():
+            print("Warning: TensorFlow is not installed, skipping the training and inference benchmarks.")
+            return results
+        results['train'] = _run(_TRAIN, [epochs, batch_size, seed], work_dir)
+        for backend in INFERENCE_BACKENDS:
+            results[f'inference_{backend}'] = _run(_INFERENCE, [calls, rows, repeat, seed], work_dir,
+                                                   SPEEDLIMIT_NN_BACKEND=backend)
+    return results
+
+
+def benchmark_suite(scales=(1, 100), **options) -> dict:
+    results = {'environment': environment(), 'options': dict(options, scales=list(scales)), 'scales': {}}
+    for scale in scales:
+        print(f"Scale {scale:g}x...", file=sys.stderr)
+        results['scales'][f'{scale:g}x'] = benchmark_scale(scale, **options)
+    return results
+
+
+def _timings(results: dict, prefix: str = '') -> dict:
+    """Flattens the per-scale results to {'1x.train.first_epoch_seconds': value} for the timing metrics."""
+    flat = {}
+    for key, value in results.items():
+        name = f'{prefix}.{key}' if prefix else key
+        if isinstance(value, dict):
+            flat.update(_timings(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and key.endswith(_TIMING_SUFFIXES):
+            flat[name] = float(value)
+    return flat
+
+
+def compare(old: dict, new: dict, tolerance: float = 0.1) -> tuple:
+    """
+    Compares the timings both results have. Returns (metric, old, new, change) rows, where
+    change is the relative slowdown (positive: worse), plus the metrics worse than `tolerance`.
+    """
+    old_timings, new_timings = _timings(old['scales']), _timings(new['scales'])
+    rows, regressions = [], []
+    for metric in sorted(old_timings.keys() & new_timings.keys()):
+        before, after = old_timings[metric], new_timings[metric]
+        if before == 0 or after == 0:
+            continue
+        change = before / after - 1 if metric.endswith(_HIGHER_IS_BETTER) else after / before - 1
+        rows.append((metric, before, after, change))
+        if change > tolerance:
+            regressions.append(metric)
+    return rows, regressions
+
+
+def _print_comparison(old: dict, new: dict, tolerance: float) -> bool:
+    rows, regressions = compare(old, new, tolerance)
+    print(f"{old['environment']['commit'] or 'old'} -> {new['environment']['commit'] or 'new'}")
+    width = max((len(metric) for metric, *_ in rows), default=6)
+    print(f"{'metric':<{width}}  {'old':>12}  {'new':>12}  change")
+    for metric, before, after, change in rows:
+        flag = '  REGRESSION' if metric in regressions else ''
+        print(f"{metric:<{width}}  {before:>12.6g}  {after:>12.6g}  {change:+.1%}{flag}")
+    print(f"{len(regressions)} of {len(rows)} metrics worse by more than {tolerance:.0%}.")
+    return not regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 100],
+                        help='Multiples of the year-N volume (default 1 100; 10000 needs ~3 GB of disk)')
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--calls', type=int, default=200, help='get_speed_limit calls per round (Keras: tens of ms each)')
+    parser.add_argument('--rows', type=int, default=100_000, help='get_speed_limits batch size')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='Write the results to this JSON file (default: stdout)')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), default=None,
+                        help='Compare two result files instead of running; exits 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Allowed relative slowdown (default 0.1)')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f_old, open(args.compare[1]) as f_new:
+            sys.exit(0 if _print_comparison(json.load(f_old), json.load(f_new), args.tolerance) else 1)
+    results = benchmark_suite(args.scales, epochs=args.epochs, batch_size=args.batch_size, calls=args.calls,
+                              rows=args.rows, repeat=args.repeat, seed=args.seed)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}")
+    else:
+        print(json.dumps(results, indent=2))
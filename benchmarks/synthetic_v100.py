@@ -0,0 +1,189 @@
+"""
+Synthetic V100 data generator: writes the four Case_Study_Speed_Limit_*_V100.csv files at
+a multiple of the year-N volume, without needing the original logs.
+
+Scale 1 matches year N (744 hours of January, one reading per sensor and hour, ~1.3
+accidents per hour). Larger scales cover more hours, up to the whole YEAR, and then add
+more readings per sensor and hour. Values follow the ranges of the year-N log (diurnal
+light, rainy days, seasonal temperature), and accidents are more frequent in dark hours
+and on icy roads, so the network has something to learn. Output is deterministic for a
+seed and in the V100 format: ';' separated, decimal comma, UTF-8 BOM, CRLF line ends.
+
+Usage (from the repository root):
+    PYTHONPATH=. python benchmarks/synthetic_v100.py OUTPUT_DIR [--scale 100] [--seed 0]
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.data_preprocessing import ACCIDENTS_FILE, SENSOR_READINGS_FILE, SENSORS_FILE, SENSOR_TYPES_FILE
+from src.log_reader import YEAR, YEAR_START
+
+BASE_HOURS = 744             # Year N: January only
+BASE_ACCIDENTS = 996
+HOURS_PER_YEAR = (pd.Timestamp(year=YEAR + 1, month=1, day=1) - YEAR_START) // pd.Timedelta(hours=1)
+
+# The V100 sensor tables, verbatim (including the odd padding of 'W ' and 'degrees   ')
+SENSORS = [(1, 'W'), (2, 'L'), (3, 'N'), (4, 'H'), (5, 'WD'), (6, 'WS'), (7, 'T'), (8, 'W'), (9, 'L'),
+           (10, 'N'), (11, 'W'), (12, 'L'), (13, 'WD'), (14, 'WS'), (15, 'T'), (16, 'T'), (17, 'AP'), (18, 'T')]
+SENSOR_TYPES = [('AP', 'air pressure', 'mmHG', 900, 1000), ('T', 'temperature', 'degrees Celsius', -30, 70),
+                ('H', 'humidity', 'percent', 0, 100), ('N', 'noise', 'decibel', 60, 120),
+                ('T', 'traffic', 'cars/second', 0, 50), ('WS', 'wind strength', 'hm/h', 0, 300),
+                ('WD', 'wind direction', 'degrees   ', 0, 360), ('W ', 'water', 'micrometer', 0, 10000),
+                ('L', 'light', 'lux', 0, 1000000)]
+# SensorIDs that report in the year-N log: -1 (no sensor) and 19 (not in the Sensors table)
+# are kept because the preprocessing has to skip them; 7, 10 and 17 never report
+READING_SENSORS = {-1: 'none', 1: 'water', 2: 'light', 3: 'noise', 4: 'humidity', 5: 'wind direction',
+                   6: 'wind strength', 8: 'water', 9: 'light', 11: 'water', 12: 'light', 13: 'wind direction',
+                   14: 'wind strength', 15: 'temperature', 16: 'traffic', 18: 'temperature', 19: 'temperature'}
+# Accident event columns and their share of the year-N accidents
+ACCIDENT_EVENT_SHARES = {'CloseCarCm': 0.89, 'CloseGuardrailCm': 0.063, 'SkidAngle': 0.015, 'Damage': 0.032}
+ACCIDENT_COLUMNS = ['Month', 'Day', 'Hour', 'Second', 'LicencePlate', 'Damage', 'Injured', 'CloseCarCm',
+                    'CloseGuardrailCm', 'SkidAngle']
+RISK_FACTOR = 2.0            # Accident rate in dark or icy hours relative to the others
+_LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def plan(scale: float) -> dict:
+    """Hours covered, readings per sensor and hour, and accidents per hour for a scale factor."""
+    hours = int(min(max(round(scale * BASE_HOURS), 1), HOURS_PER_YEAR))
+    return {'scale': scale, 'hours': hours,
+            'readings_per_sensor_hour': scale * BASE_HOURS / hours,
+            'accidents_per_hour': scale * BASE_ACCIDENTS / hours}
+
+
+def _weather(hours: np.ndarray, seed: int) -> dict:
+    """Hourly light, water and temperature 'truth' (readings scatter around it), from hours since YEAR start."""
+    hour_of_day, day = hours % 24, hours // 24
+    # Cloud cover, rain and temperature offset per day, the same for every chunk that touches the day
+    cloud, rain, rain_level, dry_level, warmth = np.random.default_rng([seed, 1]).random((5, HOURS_PER_YEAR // 24))[:, day]
+    daylight = np.clip(np.sin(np.pi * (hour_of_day - 7) / 10), 0, None)
+    season = -np.cos(2 * np.pi * day / 365)
+    return {
+        'light': daylight * 120000 * (0.3 + 0.7 * cloud),
+        'water': np.where(rain < 0.3, 200 + 2100 * rain_level, 50 * dry_level),
+        'temperature': 8 + 14 * season + 4 * daylight + 6 * (warmth - 0.5),
+        'hour_of_day': hour_of_day,
+    }
+
+
+def _values(kinds: np.ndarray, truth: dict, rng: np.random.Generator) -> np.ndarray:
+    n = len(kinds)
+    values = np.empty(n)
+    noise = rng.random(n)
+    for kind, value in (
+            ('light', lambda m: truth['light'][m] * (0.9 + 0.2 * noise[m]) + 0.1 * noise[m]),
+            ('water', lambda m: truth['water'][m] * (0.8 + 0.4 * noise[m])),
+            ('temperature', lambda m: truth['temperature'][m] + 2 * (noise[m] - 0.5)),
+            ('traffic', lambda m: 2 + 28 * np.clip(np.sin(np.pi * (truth['hour_of_day'][m] - 6) / 14), 0, None)
+             * (0.8 + 0.2 * noise[m])),
+            ('noise', lambda m: 80 + 31 * noise[m]),
+            ('humidity', lambda m: 71 + 29 * noise[m]),
+            ('wind direction', lambda m: 257 * noise[m]),
+            ('wind strength', lambda m: np.minimum(-20 * np.log1p(-noise[m]), 151)),
+            ('none', lambda m: np.round(40 + 40 * noise[m]))):
+        mask = kinds == kind
+        if mask.any():
+            values[mask] = value(mask)
+    return values
+
+
+def _calendar(hours: np.ndarray) -> tuple:
+    times = pd.DatetimeIndex(np.datetime64(YEAR_START, 'ns') + hours.astype('timedelta64[h]'))
+    return times.month.to_numpy(), times.day.to_numpy(), times.hour.to_numpy()
+
+
+def _write(f, frame: pd.DataFrame, header: bool):
+    frame.to_csv(f, sep=';', decimal=',', index=False, header=header, float_format='%.2f', lineterminator='\r\n')
+
+
+def _readings_chunk(hours: np.ndarray, per_sensor_hour: float, rng: np.random.Generator, seed: int) -> pd.DataFrame:
+    sensor_ids = np.array(list(READING_SENSORS))
+    kinds = np.array(list(READING_SENSORS.values()))
+    # Whole readings per sensor-hour, plus one more with the probability of the fraction
+    counts = np.floor(per_sensor_hour) + (rng.random((len(hours), len(sensor_ids))) < per_sensor_hour % 1)
+    counts = counts.astype(np.int64).reshape(-1)
+    hour_index = np.repeat(np.repeat(np.arange(len(hours)), len(sensor_ids)), counts)
+    sensor_index = np.repeat(np.tile(np.arange(len(sensor_ids)), len(hours)), counts)
+    # Most sensors of an hour report at one shared instant, the rest at random ones (as in the log)
+    shared = rng.integers(0, 3600, len(hours))[hour_index]
+    offsets = np.where(rng.random(len(hour_index)) < 0.8, shared, rng.integers(0, 3600, len(hour_index)))
+    order = np.lexsort((offsets, hour_index))
+    hour_index, sensor_index, offsets = hour_index[order], sensor_index[order], offsets[order]
+
+    truth = _weather(hours, seed)
+    values = _values(kinds[sensor_index], {key: value[hour_index] for key, value in truth.items()}, rng)
+    month, day, hour = _calendar(hours)
+    return pd.DataFrame({'Month': month[hour_index], 'Day': day[hour_index], 'Hour': hour[hour_index],
+                         'Minute': offsets // 60, 'Second': offsets % 60, 'Sensor': sensor_ids[sensor_index],
+                         'Value': values})
+
+
+def _accidents_chunk(hours: np.ndarray, per_hour: float, rng: np.random.Generator, seed: int) -> pd.DataFrame:
+    truth = _weather(hours, seed)
+    risky = (truth['light'] < 500) | ((truth['water'] > 1000) & (truth['temperature'] < 0))
+    # Scaled so that the mean rate stays `per_hour` with ~60% risky (mostly dark) hours
+    rate = per_hour * np.where(risky, RISK_FACTOR, 1.0) / (1 + (RISK_FACTOR - 1) * 0.6)
+    hour_index = np.repeat(np.arange(len(hours)), rng.poisson(rate))
+    n = len(hour_index)
+    # The log counts hours 1-24: an accident in hour h of the day is written as Hour h + 1
+    month, day, hour = _calendar(hours)
+    events = rng.choice(list(ACCIDENT_EVENT_SHARES), n, p=np.array(list(ACCIDENT_EVENT_SHARES.values()))
+                        / sum(ACCIDENT_EVENT_SHARES.values()))
+    plates = [f"{_LETTERS[a]}{_LETTERS[b]} {number}{_LETTERS[c]}{_LETTERS[d]}{_LETTERS[e]}"
+              for (a, b, c, d, e), number in zip(rng.integers(0, 26, (n, 5)).tolist(),
+                                                 rng.integers(100, 1000, n).tolist())]
+    frame = pd.DataFrame({'Month': month[hour_index], 'Day': day[hour_index], 'Hour': hour[hour_index] + 1,
+                          'Second': rng.integers(0, 60, n), 'LicencePlate': plates}, columns=ACCIDENT_COLUMNS)
+    measurements = {'CloseCarCm': rng.integers(1, 31, n), 'CloseGuardrailCm': rng.integers(5, 31, n),
+                    'SkidAngle': rng.integers(10, 61, n), 'Damage': rng.integers(1, 50, n) * 1000}
+    for event, values in measurements.items():
+        frame.loc[events == event, event] = values[events == event]
+    injured = (events == 'Damage') & (rng.random(n) < 0.5)
+    frame.loc[injured, 'Injured'] = rng.integers(1, 6, n)[injured]
+    return frame.astype({column: 'Int64' for column in ('Damage', 'Injured', 'CloseCarCm', 'CloseGuardrailCm', 'SkidAngle')})
+
+
+def write_synthetic_v100(target_dir: str, scale: float = 1, seed: int = 0, chunk_hours: int = 24) -> dict:
+    """
+    Writes the V100 files for `scale` times the year-N volume into `target_dir`, streaming
+    `chunk_hours` hours at a time. Returns the plan with the row counts and file sizes.
+    """
+    os.makedirs(target_dir, exist_ok=True)
+    result = plan(scale)
+    rng = np.random.default_rng(seed)
+    paths = {name: os.path.join(target_dir, name)
+             for name in (SENSORS_FILE, SENSOR_TYPES_FILE, SENSOR_READINGS_FILE, ACCIDENTS_FILE)}
+
+    with open(paths[SENSORS_FILE], 'w', encoding='utf-8-sig', newline='') as f:
+        _write(f, pd.DataFrame(SENSORS, columns=['SensorID', 'SensorTypeCode']), True)
+    with open(paths[SENSOR_TYPES_FILE], 'w', encoding='utf-8', newline='') as f:  # the only V100 file without BOM
+        _write(f, pd.DataFrame(SENSOR_TYPES, columns=['SensorTypeCode', 'Type', 'Unit', 'Min', 'Max']), True)
+
+    readings = accidents = 0
+    with open(paths[SENSOR_READINGS_FILE], 'w', encoding='utf-8-sig', newline='') as reading_file, \
+            open(paths[ACCIDENTS_FILE], 'w', encoding='utf-8-sig', newline='') as accident_file:
+        for start in range(0, result['hours'], chunk_hours):
+            hours = np.arange(start, min(start + chunk_hours, result['hours']))
+            chunk = _readings_chunk(hours, result['readings_per_sensor_hour'], rng, seed)
+            _write(reading_file, chunk, start == 0)
+            readings += len(chunk)
+            chunk = _accidents_chunk(hours, result['accidents_per_hour'], rng, seed)
+            _write(accident_file, chunk, start == 0)
+            accidents += len(chunk)
+
+    result.update(readings=readings, accidents=accidents,
+                  bytes=sum(os.path.getsize(path) for path in paths.values()))
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output_dir')
+    parser.add_argument('--scale', type=float, default=1, help='Multiple of the year-N volume (default 1)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(write_synthetic_v100(args.output_dir, args.scale, args.seed), indent=2))
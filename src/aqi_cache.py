@@ -0,0 +1,159 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from src.cache import TTLCache
+
+KEY_BY_VALUE = 'value'
+KEY_BY_BAND = 'band'
+
+
+def aqi_band(aqi: int) -> int:
+    """Maps an AQI value to its guideline band: 0 Good, 1 Moderate, 2 Unhealthy, 3 Hazardous."""
+    if aqi > 150: return 3
+    elif aqi > 100: return 2
+    elif aqi > 50: return 1
+    return 0
+
+
+class AQIRecommendationCache:
+    """
+    Memoizes AQI agent recommendations.
+
+    Entries are keyed on the AQI value or its guideline band, expire after `ttl` seconds
+    and are evicted least-recently-used beyond `maxsize`. Concurrent callers asking for the
+    same key share one in-flight request (single-flight). If `persist_path` is set, entries
+    are written to a JSON file so a warm restart can skip the network.
+    Only successful computations are cached; errors are passed on to every waiting caller.
+    """
+
+    def __init__(self, key_mode: str = KEY_BY_VALUE, ttl: float = 600.0, maxsize: int = 256,
+                 persist_path: str = None, clock=time.time):
+        if key_mode not in (KEY_BY_VALUE, KEY_BY_BAND):
+            raise ValueError(f"Unknown key mode '{key_mode}'")
+        self.key_mode = key_mode
+        self.persist_path = persist_path
+        # Wall-clock expiry so persisted entries stay valid across restarts
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl, clock=clock)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._in_flight = {}  # key -> concurrent.futures.Future
+        self._counters = dict.fromkeys(('hits', 'misses', 'single_flight_joins', 'errors'), 0)
+        if persist_path:
+            self.load()
+
+    def key_for(self, aqi: int) -> int:
+        return aqi_band(aqi) if self.key_mode == KEY_BY_BAND else int(aqi)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['entries'] = len(self._cache)
+        return stats
+
+    def clear(self):
+        self._cache.clear()
+        with self._lock:
+            self._counters = dict.fromkeys(self._counters, 0)
+
+    def peek(self, aqi: int):
+        """Returns the cached recommendation for `aqi`, or None; never computes and counts no lookup."""
+        return self._cache.get(self.key_for(aqi))
+
+    def _lookup(self, aqi: int):
+        """Returns (cached_value, None, False), or (None, future, is_leader) when the value must be awaited."""
+        key = self.key_for(aqi)
+        value = self._cache.get(key)
+        with self._lock:
+            if value is not None:
+                self._counters['hits'] += 1
+                return value, None, False
+            future = self._in_flight.get(key)
+            if future is not None:
+                self._counters['single_flight_joins'] += 1
+                self._counters['hits'] += 1
+                return None, future, False
+            self._counters['misses'] += 1
+            future = self._in_flight[key] = Future()
+            return None, future, True
+
+    def _finish(self, aqi: int, future: Future, value=None, error: Exception = None):
+        key = self.key_for(aqi)
+        if error is None:
+            self._cache.set(key, value)
+        with self._lock:
+            self._in_flight.pop(key, None)
+            if error is not None:
+                self._counters['errors'] += 1
+        if error is None:
+            future.set_result(value)
+            if self.persist_path:
+                self.save()
+        else:
+            future.set_exception(error)
+
+    def get_or_compute(self, aqi: int, compute) -> int:
+        """Returns the cached recommendation for `aqi`, calling `compute()` at most once per key."""
+        value, future, is_leader = self._lookup(aqi)
+        if future is None:
+            return value
+        if not is_leader:
+            return future.result()
+        try:
+            value = compute()
+        except Exception as e:
+            self._finish(aqi, future, error=e)
+            raise
+        self._finish(aqi, future, value=value)
+        return value
+
+    async def get_or_compute_async(self, aqi: int, compute_async) -> int:
+        """Async variant of get_or_compute; `compute_async` is a zero-argument coroutine function."""
+        value, future, is_leader = self._lookup(aqi)
+        if future is None:
+            return value
+        if not is_leader:
+            return await asyncio.wrap_future(future)
+        try:
+            value = await compute_async()
+        except BaseException as e:
+            # Also release waiters if the leader is cancelled
+            self._finish(aqi, future, error=e if isinstance(e, Exception) else asyncio.CancelledError())
+            raise
+        self._finish(aqi, future, value=value)
+        return value
+
+    def save(self):
+        """Writes the live entries to `persist_path` atomically."""
+        entries = [[key, value, expires_at] for key, value, expires_at in self._cache.items()]
+        tmp_path = f"{self.persist_path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'key_mode': self.key_mode, 'entries': entries}, f)
+            os.replace(tmp_path, self.persist_path)
+        except OSError as e:
+            print(f"Warning: Could not persist AQI cache to {self.persist_path}: {e}")
+
+    def load(self):
+        """Restores unexpired entries from `persist_path`, if present."""
+        if not os.path.exists(self.persist_path):
+            return
+        try:
+            with open(self.persist_path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read AQI cache from {self.persist_path}: {e}")
+            return
+        if data.get('key_mode') != self.key_mode:
+            return
+        now = self._clock()
+        for key, value, expires_at in data.get('entries', []):
+            if expires_at is None:
+                self._cache.set(key, value, ttl=None)
+            elif expires_at > now:
+                self._cache.set(key, value, ttl=expires_at - now)
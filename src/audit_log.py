@@ -0,0 +1,372 @@
+import argparse
+import atexit
+import collections
+import datetime
+import glob
+import itertools
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.metrics import metrics
+
+AUDIT_DIR = 'logs/audit'
+AUDIT_FLUSH_SECONDS = 1.0      # Longest a record waits before the writer turns it into a row group
+AUDIT_BATCH_ROWS = 8192        # Queued rows that wake the writer before the flush interval
+AUDIT_ROTATE_SECONDS = 300.0   # A file is closed, and readable, at most this long after it was opened
+AUDIT_ROTATE_ROWS = 1_000_000
+AUDIT_MAX_PENDING = 65536      # Queued records (or batches) before the overflow policy applies
+POLICY_DROP = 'drop'           # Full queue: drop the record and count it; the decision path never waits
+POLICY_BLOCK = 'block'         # Full queue: wait up to block_timeout for the writer, then drop
+POLICIES = (POLICY_DROP, POLICY_BLOCK)
+
+# One row per decision. Times are UTC; predicted_accidents is NaN when the NN was not consulted,
+# and latency_us of a batched decision is the batch time divided by its rows.
+AUDIT_COLUMNS = {
+    'time': 'timestamp[us, tz=UTC]',
+    'path': 'string',               # 'single' (get_speed_limit), 'batch' (get_speed_limits), 'fleet' or 'segment'
+    'illuminance': 'float32',
+    'water_level': 'float32',
+    'temperature': 'float32',
+    'current_hour': 'int8',
+    'check_nn': 'bool',             # Router decision
+    'router_source': 'string',      # 'rule', 'cache', 'llm' or 'fallback' (see WeatherRouter.route)
+    'predicted_accidents': 'float32',
+    'weather_reduction': 'int8',
+    'aqi': 'int16',
+    'aqi_reduction': 'int8',
+    'aqi_source': 'string',         # 'llm', 'rule' or 'fallback' (see last_recommendation_source)
+    'speed_limit': 'int8',
+    'code': 'uint8',                # JustificationCode flags
+    'latency_us': 'float32',
+}
+_DICTIONARY_COLUMNS = ('path', 'router_source', 'aqi_source')
+_file_numbers = itertools.count(1)   # unique file names for every AuditLog of the process
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        from pyarrow import parquet
+    except ImportError:
+        return None, None
+    return pa, parquet
+
+
+def _schema(pa):
+    types = {'string': pa.dictionary(pa.int8(), pa.string()), 'bool': pa.bool_()}
+    return pa.schema([(name, pa.timestamp('us', tz='UTC') if name == 'time' else
+                       types.get(kind) or pa.type_for_alias(kind)) for name, kind in AUDIT_COLUMNS.items()])
+
+
+def day_directory(directory: str, day) -> str:
+    """Partition directory of a UTC day (date, datetime or 'YYYY-MM-DD')."""
+    return os.path.join(directory, f"date={pd.Timestamp(day).strftime('%Y-%m-%d')}")
+
+
+class AuditLog:
+    """
+    Records every speed limit decision without writing in the decision path.
+
+    `record` and `record_batch` only append to an in-memory queue (a deque, no lock);
+    a background thread drains it every `flush_seconds` (or once `batch_rows` rows are
+    waiting) and writes one Parquet row group per drain into
+    `directory/date=YYYY-MM-DD/decisions-*.parquet`. A file is written under a temporary
+    name and renamed when it is closed: on rotation (`rotate_seconds`, `rotate_rows`, a new
+    UTC day), on close() and at interpreter exit. read_decisions only sees closed files.
+
+    The queue holds at most `max_pending` records or batches. When it is full, the 'drop'
+    policy discards new records at once and 'block' waits up to `block_timeout` for room
+    first. Dropped records are counted in stats(). Needs pyarrow; without it nothing is
+    recorded. A disabled instance turns every call into a no-op.
+    """
+
+    def __init__(self, directory: str = AUDIT_DIR, enabled: bool = True, flush_seconds: float = AUDIT_FLUSH_SECONDS,
+                 batch_rows: int = AUDIT_BATCH_ROWS, rotate_seconds: float = AUDIT_ROTATE_SECONDS,
+                 rotate_rows: int = AUDIT_ROTATE_ROWS, max_pending: int = AUDIT_MAX_PENDING,
+                 policy: str = POLICY_DROP, block_timeout: float = 0.1, clock=time.time):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown audit overflow policy '{policy}', expected one of {POLICIES}")
+        self.directory = directory
+        self.enabled = enabled
+        self.flush_seconds = flush_seconds
+        self.batch_rows = batch_rows
+        self.rotate_seconds = rotate_seconds
+        self.rotate_rows = rotate_rows
+        self.max_pending = max_pending
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self._clock = clock
+        self._pending = collections.deque()
+        self._pending_rows = 0           # approximate: updated without a lock by both sides
+        self._wakeup = threading.Event()
+        self._room = threading.Event()
+        self._lock = threading.Lock()    # the counters, never the append path
+        self._lifecycle = threading.Lock()
+        self._thread = None
+        self._closing = False
+        self._file = None                # (writer, temporary path, final path, day, opened at, rows)
+        self._counters = dict.fromkeys(('dropped', 'blocked', 'written', 'row_groups', 'files', 'write_errors'), 0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counters, pending=len(self._pending), enabled=int(self.enabled))
+
+    def start(self) -> 'AuditLog':
+        """Starts the writer thread (done on the first record)."""
+        with self._lifecycle:
+            if self._thread is not None or not self.enabled:
+                return self
+            if _pyarrow()[0] is None:
+                print("Warning: pyarrow not installed. Audit logging is disabled.")
+                self.enabled = False
+                return self
+            self._closing = False
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+        atexit.register(self.close)
+        return self
+
+    def close(self):
+        """Writes everything queued, closes the open file and stops the writer thread."""
+        with self._lifecycle:
+            thread, self._closing = self._thread, True
+            if thread is not None:
+                self._wakeup.set()
+                thread.join()
+                self._thread = None
+        atexit.unregister(self.close)
+
+    def flush(self):
+        """Writes everything queued and closes the open file, so read_decisions sees it; the writer keeps running."""
+        self.close()
+        self.start()
+
+    def _enqueue(self, item, rows: int):
+        if self._thread is None:
+            self.start()
+            if not self.enabled:
+                return
+        if len(self._pending) >= self.max_pending:
+            if self.policy == POLICY_BLOCK:
+                self._count('blocked')
+                self._room.clear()
+                self._wakeup.set()
+                self._room.wait(self.block_timeout)
+            if len(self._pending) >= self.max_pending:
+                self._count('dropped', rows)
+                metrics.count('audit_dropped', amount=rows)
+                return
+        self._pending.append(item)
+        self._pending_rows += rows
+        if self._pending_rows >= self.batch_rows:
+            self._wakeup.set()
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def record(self, illuminance, water_level, temperature, current_hour, check_nn, router_source,
+               predicted_accidents, weather_reduction, aqi, aqi_reduction, aqi_source, speed_limit, code,
+               latency_seconds, path: str = 'single'):
+        """Queues one decision (the AUDIT_COLUMNS fields, time is taken now)."""
+        if not self.enabled:
+            return
+        self._enqueue((self._clock(), path, illuminance, water_level, temperature, current_hour, check_nn,
+                       router_source, predicted_accidents, weather_reduction, aqi, aqi_reduction, aqi_source,
+                       speed_limit, code, latency_seconds * 1e6), 1)
+
+    def record_batch(self, columns: dict, latency_seconds: float, path: str = 'batch'):
+        """Queues a batch of decisions: AUDIT_COLUMNS arrays (without time, path, latency_us) of equal length."""
+        if not self.enabled:
+            return
+        rows = len(columns['speed_limit'])
+        if rows:
+            self._enqueue((self._clock(), path, latency_seconds * 1e6 / rows, columns), rows)
+
+    # --- Writer thread ---
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_seconds)
+            self._wakeup.clear()
+            closing = self._closing
+            try:
+                self._write(self._drain())
+                if closing or (self._file is not None and self._clock() - self._file[4] >= self.rotate_seconds):
+                    self._close_file()
+            except Exception as e:
+                self._count('write_errors')
+                metrics.count('errors', 'audit_write')
+                print(f"Error writing the audit log: {e}")
+            self._room.set()
+            if closing:
+                return
+
+    def _drain(self) -> list:
+        items = []
+        while True:
+            try:
+                items.append(self._pending.popleft())
+            except IndexError:
+                break
+        self._pending_rows = len(self._pending)
+        return items
+
+    def _table(self, items: list):
+        """Builds one Arrow table from queued single records and batches, in queue order."""
+        pa, _ = _pyarrow()
+        schema = _schema(pa)
+        names = list(AUDIT_COLUMNS)
+        columns = {name: [] for name in names}
+        rows = []
+
+        def flush_rows():
+            if rows:
+                for name, values in zip(names, zip(*rows)):
+                    columns[name].append(np.asarray(values))
+                rows.clear()
+
+        for item in items:
+            if len(item) == len(names):
+                rows.append(item)
+                continue
+            flush_rows()
+            recorded_at, path, latency_us, batch = item
+            length = len(batch['speed_limit'])
+            batch = dict(batch, time=np.full(length, recorded_at), path=np.full(length, path, dtype=object),
+                         latency_us=np.full(length, latency_us))
+            for name in names:
+                columns[name].append(np.asarray(batch[name]))
+        flush_rows()
+
+        arrays = []
+        for field in schema:
+            values = np.concatenate(columns[field.name])
+            if field.name == 'time':
+                values = (values * 1e6).astype('int64')
+                arrays.append(pa.array(values, pa.int64()).cast(field.type))
+            elif field.name in _DICTIONARY_COLUMNS:
+                arrays.append(pa.array(values.astype(object), pa.string()).dictionary_encode().cast(field.type))
+            else:
+                arrays.append(pa.array(values.astype(field.type.to_pandas_dtype()), field.type))
+        return pa.Table.from_arrays(arrays, schema=schema)
+
+    def _write(self, items: list):
+        if not items:
+            return
+        table = self._table(items)
+        # Split on UTC days so every file belongs to one day's partition
+        days = table.column('time').cast('int64').to_numpy() // 86_400_000_000
+        boundaries = np.flatnonzero(np.diff(days)) + 1
+        for start, stop in zip(np.r_[0, boundaries], np.r_[boundaries, len(days)]):
+            self._write_day(table.slice(start, stop - start), int(days[start]))
+
+    def _write_day(self, table, day: int):
+        if self._file is not None and (self._file[3] != day or self._file[5] >= self.rotate_rows):
+            self._close_file()
+        if self._file is None:
+            self._open_file(day, table.schema)
+        writer = self._file[0]
+        writer.write_table(table)
+        self._file = self._file[:5] + (self._file[5] + table.num_rows,)
+        with self._lock:
+            self._counters['written'] += table.num_rows
+            self._counters['row_groups'] += 1
+
+    def _open_file(self, day: int, schema):
+        _, parquet = _pyarrow()
+        date = datetime.datetime.fromtimestamp(day * 86400, datetime.timezone.utc).date()
+        directory = day_directory(self.directory, date)
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.datetime.fromtimestamp(self._clock(), datetime.timezone.utc).strftime('%H%M%S')
+        path = os.path.join(directory, f'decisions-{stamp}-{os.getpid()}-{next(_file_numbers):04d}.parquet')
+        temporary = path + '.tmp'
+        writer = parquet.ParquetWriter(temporary, schema, compression='zstd', use_dictionary=list(_DICTIONARY_COLUMNS))
+        self._file = (writer, temporary, path, day, self._clock(), 0)
+
+    def _close_file(self):
+        if self._file is None:
+            return
+        writer, temporary, path = self._file[:3]
+        self._file = None
+        writer.close()
+        os.replace(temporary, path)
+        self._count('files')
+
+
+def read_decisions(day=None, directory: str = AUDIT_DIR, columns: list = None, filters=None) -> pd.DataFrame:
+    """
+    Reads the decisions of one UTC day (date, datetime or 'YYYY-MM-DD'; default today)
+    from the closed audit files of its partition only. `filters` takes pyarrow's
+    [('column', 'op', value), ...] form, applied per row group while reading.
+    """
+    day = pd.Timestamp.now(tz='UTC') if day is None else day
+    paths = sorted(glob.glob(os.path.join(day_directory(directory, day), '*.parquet')))
+    if not paths:
+        return pd.DataFrame(columns=columns or list(AUDIT_COLUMNS))
+    _, parquet = _pyarrow()
+    table = parquet.ParquetDataset(paths, filters=filters, partitioning=None).read(columns=columns)
+    return table.to_pandas().sort_values('time', kind='stable', ignore_index=True) \
+        if 'time' in table.column_names else table.to_pandas()
+
+
+def audit_days(directory: str = AUDIT_DIR) -> list:
+    """The UTC days ('YYYY-MM-DD') that have audit files, oldest first."""
+    return sorted(os.path.basename(path)[len('date='):] for path in glob.glob(os.path.join(directory, 'date=*')))
+
+
+def summarize(decisions: pd.DataFrame) -> dict:
+    """Decision counts by speed limit and source, and latency percentiles, for a day's decisions."""
+    if decisions.empty:
+        return {'decisions': 0}
+    return {
+        'decisions': len(decisions),
+        'first': str(decisions['time'].min()),
+        'last': str(decisions['time'].max()),
+        'speed_limits': {int(limit): int(count) for limit, count in decisions['speed_limit'].value_counts().sort_index().items()},
+        'router_sources': {str(k): int(v) for k, v in decisions['router_source'].value_counts().items()},
+        'aqi_sources': {str(k): int(v) for k, v in decisions['aqi_source'].value_counts().items()},
+        'latency_p50_us': float(decisions['latency_us'].quantile(0.5)),
+        'latency_p99_us': float(decisions['latency_us'].quantile(0.99)),
+    }
+
+
+def explain(decisions: pd.DataFrame) -> pd.Series:
+    """Renders the justification text of each audited decision from its code, prediction and reductions."""
+    # Imported here, as decision_logic imports this module for its global audit_log
+    from src.decision_logic import render_justification
+    return pd.Series([render_justification(row.code, row.predicted_accidents, row.weather_reduction, row.aqi,
+                                           row.aqi_reduction, row.speed_limit)
+                      for row in decisions.itertuples(index=False)], index=decisions.index, dtype=object)
+
+
+audit_log = AuditLog(os.getenv("SPEEDLIMIT_AUDIT_DIR") or AUDIT_DIR, enabled=bool(os.getenv("SPEEDLIMIT_AUDIT_DIR")),
+                     policy=os.getenv("SPEEDLIMIT_AUDIT_POLICY", POLICY_DROP))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Queries a day's decisions from the audit log.")
+    parser.add_argument('--directory', default=os.getenv("SPEEDLIMIT_AUDIT_DIR") or AUDIT_DIR)
+    parser.add_argument('--day', default=None, help='UTC day, YYYY-MM-DD (default: today)')
+    parser.add_argument('--speed-limit', type=int, default=None, help='Only decisions that posted this limit')
+    parser.add_argument('--list-days', action='store_true')
+    parser.add_argument('--rows', type=int, default=0, help='Also print the first N matching decisions')
+    parser.add_argument('--explain', action='store_true', help='Render the justification text of the printed rows')
+    args = parser.parse_args()
+
+    if args.list_days:
+        print('\n'.join(audit_days(args.directory)))
+    else:
+        filters = None if args.speed_limit is None else [('speed_limit', '==', args.speed_limit)]
+        decisions = read_decisions(args.day, args.directory, filters=filters)
+        print(json.dumps(summarize(decisions), indent=2))
+        if args.rows:
+            rows = decisions.head(args.rows)
+            if args.explain:
+                rows = rows.assign(justification=explain(rows))
+            print(rows.to_string())
@@ -0,0 +1,63 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Small thread-safe LRU cache whose entries expire after `ttl` seconds.
+    `ttl=None` keeps entries until they are evicted by size.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None, clock=time.monotonic):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Returns the cached value for `key`, or `default` if missing or expired."""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= self._clock():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: Optional[float] = _MISSING):
+        """Stores `value`, evicting the least recently used entry when full."""
+        ttl = self.ttl if ttl is _MISSING else ttl
+        expires_at = None if ttl is None else self._clock() + ttl
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def items(self):
+        """Returns a list of (key, value, expires_at) for all live entries."""
+        now = self._clock()
+        with self._lock:
+            return [(key, value, expires_at) for key, (expires_at, value) in self._data.items()
+                    if expires_at is None or expires_at > now]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
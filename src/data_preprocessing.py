@@ -1,36 +1,60 @@
+import copy
+import hashlib
+import io
+import json
+import os
 
 import pandas as pd
 import numpy as np
 
-def load_and_preprocess_data():
-    """
-    Loads, cleans, and preprocesses the SpeedLimit project data.
-    """
-    # Load the datasets
-    try:
-        accidents = pd.read_csv('data/Case_Study_Speed_Limit_AccidentsYearN_V100.csv', sep=';', decimal=',')
-        sensor_readings = pd.read_csv('data/Case_Study_Speed_Limit_SensorReadingsYearN_V100.csv', sep=';', decimal=',')
-        sensors = pd.read_csv('data/Case_Study_Speed_Limit_Sensors_V100.csv', sep=';')
-        sensor_types = pd.read_csv('data/Case_Study_Speed_Limit_SensorTypes_V100.csv', sep=';')
-    except FileNotFoundError as e:
-        print(f"Error loading data: {e}. Make sure the data files are in the 'data/' directory.")
-        return None
+from src.log_reader import (YEAR, YEAR_START, HOURS_IN_YEAR, read_accidents, read_sensor_readings, reading_times,
+                            seconds_since_year_start)
+from src.sensor_matrix import OUT_OF_RANGE_CLAMP, OUT_OF_RANGE_MODES, build_sensor_matrix
 
-    # 1. Create a complete sensor lookup table
+ACCIDENTS_FILE = 'Case_Study_Speed_Limit_AccidentsYearN_V100.csv'
+SENSOR_READINGS_FILE = 'Case_Study_Speed_Limit_SensorReadingsYearN_V100.csv'
+SENSORS_FILE = 'Case_Study_Speed_Limit_Sensors_V100.csv'
+SENSOR_TYPES_FILE = 'Case_Study_Speed_Limit_SensorTypes_V100.csv'
+# Columnar artifact used for training (float32 features, datetime64 index); CSV is an optional export
+PROCESSED_PATH = 'data/processed/processed_data.parquet'
+CSV_EXPORT_PATH = 'data/processed/processed_data.csv'
+# Per-sensor dataset written by the sensor-matrix mode (one feature column per SensorID)
+PER_SENSOR_PATH = 'data/processed/processed_sensors.parquet'
+OUTPUT_PATH = PROCESSED_PATH
+PROCESSED_FORMATS = ('.parquet', '.feather', '.csv')
+# Incremental mode: bytes hashed at the start of a log and before its watermark to detect
+# rewritten or replaced logs, and rows parsed at a time
+WATERMARK_WINDOW = 4096
+INCREMENTAL_CHUNKSIZE = 100_000
+STORE_PART = 'part-{:05d}.parquet'       # Part files of an incremental Parquet store, named by their first hour
+STORE_PART_HOURS = 168                   # Hours per part file (one week), so a run rewrites at most a few of them
+CSV_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'   # Sorts like the timestamps, so a CSV store can be cut at an hour
+
+FEATURE_COLUMNS = ['humidity', 'light', 'noise', 'temperature', 'traffic', 'wind direction', 'wind strength', 'water']
+TARGET_COLUMN = 'near_accidents'
+# Hourly accident event counts: near-accidents (any of the events) and each event separately
+ACCIDENT_EVENTS = {'skid_events': 'SkidAngle', 'close_car_events': 'CloseCarCm',
+                   'close_guardrail_events': 'CloseGuardrailCm'}
+ACCIDENT_COUNT_COLUMNS = [TARGET_COLUMN] + list(ACCIDENT_EVENTS)
+
+
+
+def _build_sensor_lookup(sensors: pd.DataFrame, sensor_types: pd.DataFrame) -> pd.DataFrame:
+    """Creates a complete sensor lookup table (SensorID -> Type)."""
     # Strip whitespace from SensorTypeCode to ensure correct merging
     sensors['SensorTypeCode'] = sensors['SensorTypeCode'].str.strip()
     sensor_types['SensorTypeCode'] = sensor_types['SensorTypeCode'].str.strip()
-    
-    sensor_lookup = pd.merge(sensors, sensor_types, on='SensorTypeCode')
 
-    # 2. Clean and pivot sensor readings
+    return pd.merge(sensors, sensor_types, on='SensorTypeCode')
+
+
+def _aggregate_sensor_readings(sensor_readings: pd.DataFrame, sensor_lookup: pd.DataFrame) -> pd.DataFrame:
+    """In-memory path: merge, pivot by sensor type and resample to hourly means."""
     # Merge readings with the lookup table to get sensor types
     sensor_readings_merged = pd.merge(sensor_readings, sensor_lookup, left_on='Sensor', right_on='SensorID')
 
-    # Create a datetime index for time-series analysis
-    sensor_readings_merged['datetime'] = pd.to_datetime(
-        sensor_readings_merged[['Month', 'Day', 'Hour', 'Minute', 'Second']].assign(Year=2023)
-    )
+    # Create a datetime index for time-series analysis (computed arithmetically, see log_reader)
+    sensor_readings_merged['datetime'] = reading_times(sensor_readings_merged)
     sensor_readings_merged = sensor_readings_merged.drop(['Month', 'Day', 'Hour', 'Minute', 'Second', 'Sensor'], axis=1)
 
     # Pivot the table to have sensor types as columns
@@ -39,39 +63,825 @@ def load_and_preprocess_data():
         columns='Type',
         values='Value'
     )
-    
-    # Resample to hourly frequency and forward-fill missing values
-    sensor_hourly = sensor_pivot.resample('h').mean()
-    sensor_hourly = sensor_hourly.fillna(method='ffill')
-    
-
-    # 3. Process accident data
-    # Define a near-accident
-    accidents['is_near_accident'] = (
-        (accidents['SkidAngle'].notna() & accidents['SkidAngle'] > 0) |
-        (accidents['CloseCarCm'].notna() & accidents['CloseCarCm'] > 0) |
-        (accidents['CloseGuardrailCm'].notna() & accidents['CloseGuardrailCm'] > 0)
-    )
-    
-    # Create a datetime index for accidents
-    accidents['datetime'] = pd.to_datetime(
-        accidents[['Month', 'Day', 'Hour', 'Second']].assign(Year=2023)
-    )
-    accidents = accidents.drop(['Month', 'Day', 'Hour', 'Second', 'LicencePlate', 'Damage', 'Injured', 'CloseCarCm', 'CloseGuardrailCm', 'SkidAngle'], axis=1)
-    
-    # Aggregate near-accidents by hour
-    near_accidents_hourly = accidents[accidents['is_near_accident']].resample('h', on='datetime').count()['is_near_accident'].rename('near_accidents')
-    
-    # 4. Combine sensor data and near-accident counts
-    combined_data = sensor_hourly.merge(near_accidents_hourly, left_index=True, right_index=True, how='left')
-    combined_data['near_accidents'] = combined_data['near_accidents'].fillna(0) # Fill hours with no accidents with 0
-    
+
+    # Resample to hourly frequency
+    return sensor_pivot.resample('h').mean()
+
+
+def _kahan_accumulate(sums: np.ndarray, compensations: np.ndarray, groups: np.ndarray, values: np.ndarray):
+    """
+    Adds `values` to `sums[groups]` in stream order with Kahan compensation, as pandas' grouped
+    mean does, so the chunked results match the in-memory path bit for bit.
+    The sequential update runs vectorized across groups, one position-within-group at a time.
+    """
+    if len(groups) == 0:
+        return
+    order = np.argsort(groups, kind='stable')
+    groups, values = groups[order], values[order]
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    ranks = np.arange(len(groups)) - np.repeat(starts, np.diff(np.r_[starts, len(groups)]))
+    for rank in range(ranks.max() + 1):
+        selected = ranks == rank
+        g, value = groups[selected], values[selected]
+        y = value - compensations[g]
+        t = sums[g] + y
+        compensations[g] = t - sums[g] - y
+        sums[g] = t
+
+
+class _ChunkedSensorAggregator:
+    """
+    Streams sensor readings chunk by chunk into hourly per-type partials.
+
+    Mirrors pivot_table + resample: readings are first averaged per (timestamp, type),
+    then those per-timestamp means are averaged per hour. Readings must be in
+    chronological order; the groups of the last timestamp of a chunk stay open until
+    the next chunk arrives, so only O(hours x types) state is kept. `compact()` drops the
+    partials of finished hours and `state()`/`load_state()` persist the rest, which is
+    what the incremental mode carries between runs.
+    """
+
+    _STATE_ARRAYS = ('hourly_sum', 'hourly_compensation', 'hourly_count', 'has_data', '_open_keys', '_open_state')
+    _STATE_SCALARS = ('first_hour', 'base_hour', 'last_hour', 'last_second', 'rows')
+
+    def __init__(self, sensor_lookup: pd.DataFrame):
+        self.types = np.array(sorted(sensor_lookup['Type'].unique()))
+        type_index = {sensor_type: i for i, sensor_type in enumerate(self.types)}
+        self.max_sensor_id = int(sensor_lookup['SensorID'].max())
+        # membership[sensor_id, type] is True if the sensor reports that type. A sensor can map to
+        # several types when a SensorTypeCode is shared (the merge semantics of the pandas path).
+        self.membership = np.zeros((self.max_sensor_id + 1, len(self.types)), dtype=bool)
+        for sensor_id, sensor_type in zip(sensor_lookup['SensorID'], sensor_lookup['Type']):
+            if sensor_id >= 0:
+                self.membership[sensor_id, type_index[sensor_type]] = True
+        # Hourly partials (sum, Kahan compensation, count), rows relative to base_hour
+        self.hourly_sum = np.zeros((0, len(self.types)))
+        self.hourly_compensation = np.zeros((0, len(self.types)))
+        self.hourly_count = np.zeros((0, len(self.types)), dtype=np.int64)
+        self.has_data = np.zeros(len(self.types), dtype=bool)
+        self.first_hour = None
+        self.base_hour = None
+        self.last_hour = None
+        self.last_second = None
+        self.rows = 0
+        # Open (timestamp, type) groups carried over to the next chunk
+        self._open_keys = np.zeros(0, dtype=np.int64)
+        self._open_state = np.zeros((3, 0))  # sum, compensation, count
+
+    def add_chunk(self, seconds: np.ndarray, sensors: np.ndarray, values: np.ndarray):
+        self.rows += len(seconds)
+        if len(seconds) == 0:
+            return
+        if np.any(np.diff(seconds) < 0) or (self.last_second is not None and seconds[0] < self.last_second):
+            raise ValueError("Chunked preprocessing requires sensor readings in chronological order.")
+        self.last_second = int(seconds[-1])
+
+        # Map Sensor -> Type(s) by array index; unknown sensor IDs (e.g. -1) are dropped like in the merge
+        known = (sensors >= 0) & (sensors <= self.max_sensor_id)
+        rows, types = np.nonzero(self.membership[sensors[known]])
+        group_values = values[known][rows]
+        valid = ~np.isnan(group_values)
+        keys = seconds[known][rows][valid] * len(self.types) + types[valid]
+        group_values = group_values[valid]
+
+        # Per-(timestamp, type) Kahan sums, continuing the groups left open by the previous chunk
+        unique_keys, inverse = np.unique(np.concatenate((self._open_keys, keys)), return_inverse=True)
+        state = np.zeros((3, len(unique_keys)))
+        carried = inverse[:len(self._open_keys)]
+        state[:, carried] = self._open_state
+        inverse = inverse[len(self._open_keys):]
+        _kahan_accumulate(state[0], state[1], inverse, group_values)
+        state[2] += np.bincount(inverse, minlength=len(unique_keys))
+
+        # Keep the groups of the last timestamp open, it may continue in the next chunk
+        is_open = unique_keys // len(self.types) == self.last_second
+        self._open_keys, self._open_state = unique_keys[is_open], state[:, is_open]
+        self._close(unique_keys[~is_open], state[0, ~is_open] / state[2, ~is_open])
+
+    def _close(self, keys: np.ndarray, means: np.ndarray):
+        """Adds finished per-(timestamp, type) means to the hourly partials."""
+        if len(keys) == 0:
+            return
+        hours = keys // len(self.types) // 3600
+        types = keys % len(self.types)
+        if self.first_hour is None:
+            self.first_hour = self.base_hour = int(hours[0])
+        offsets = hours - self.base_hour
+        if offsets.max() >= len(self.hourly_sum):
+            grow = max(int(offsets.max()) + 1, 2 * len(self.hourly_sum)) - len(self.hourly_sum)
+            padding = np.zeros((grow, len(self.types)))
+            self.hourly_sum = np.vstack((self.hourly_sum, padding))
+            self.hourly_compensation = np.vstack((self.hourly_compensation, padding))
+            self.hourly_count = np.vstack((self.hourly_count, padding.astype(np.int64)))
+        flat = offsets * len(self.types) + types
+        _kahan_accumulate(self.hourly_sum.reshape(-1), self.hourly_compensation.reshape(-1), flat, means)
+        np.add.at(self.hourly_count.reshape(-1), flat, 1)
+        self.has_data[types] = True
+        self.last_hour = max(self.last_hour or 0, int(hours.max()))
+
+    def compact(self):
+        """Drops the partials of the hours before the last reading; those hours can no longer change."""
+        if self.base_hour is None:
+            return
+        drop = min(self.last_second // 3600 - self.base_hour, len(self.hourly_sum))
+        if drop > 0:
+            self.hourly_sum = self.hourly_sum[drop:]
+            self.hourly_compensation = self.hourly_compensation[drop:]
+            self.hourly_count = self.hourly_count[drop:]
+            self.base_hour += drop
+
+    def state(self) -> dict:
+        """The aggregation state as arrays (see load_state)."""
+        state = {name: getattr(self, name) for name in self._STATE_ARRAYS}
+        state['types'] = self.types
+        state['scalars'] = np.array([-1 if getattr(self, name) is None else getattr(self, name)
+                                     for name in self._STATE_SCALARS], dtype=np.int64)
+        return state
+
+    def load_state(self, state: dict):
+        if list(state['types']) != list(self.types):
+            raise ValueError("Saved aggregation state was built for different sensor types.")
+        for name in self._STATE_ARRAYS:
+            setattr(self, name, np.array(state[name]))
+        for name, value in zip(self._STATE_SCALARS, state['scalars'].tolist()):
+            setattr(self, name, None if value == -1 else value)
+
+    def result(self, start_hour: int = None) -> pd.DataFrame:
+        """
+        Returns the hourly means, equivalent to the pivot_table + resample path, from
+        `start_hour` (hours since the start of the year, at least base_hour) onwards.
+        This closes the open groups, so no further chunks can be added afterwards.
+        """
+        self._close(self._open_keys, self._open_state[0] / self._open_state[2])
+        self._open_keys, self._open_state = self._open_keys[:0], self._open_state[:, :0]
+        if self.first_hour is None:
+            return pd.DataFrame(columns=pd.Index([], name='Type'), index=pd.DatetimeIndex([], name='datetime'))
+        start_hour = self.first_hour if start_hour is None else max(start_hour, self.first_hour)
+        if start_hour < self.base_hour:
+            raise ValueError(f"Hours before {self.base_hour} were compacted away.")
+        n_hours = max(self.last_hour - start_hour + 1, 0)
+        offset = start_hour - self.base_hour
+        counts = self.hourly_count[offset:offset + n_hours]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(counts > 0, self.hourly_sum[offset:offset + n_hours] / counts, np.nan)
+        # pivot_table drops types without any readings
+        has_data = self.has_data
+        index = pd.date_range(YEAR_START + pd.Timedelta(hours=start_hour), periods=n_hours, freq='h',
+                              name='datetime')
+        return pd.DataFrame(means[:, has_data], index=index, columns=pd.Index(self.types[has_data], name='Type'))
+
+
+def _add_reading_chunks(aggregator: _ChunkedSensorAggregator, chunks):
+    for chunk in chunks:
+        seconds = seconds_since_year_start(chunk['Month'], chunk['Day'], chunk['Hour'], chunk['Minute'], chunk['Second'])
+        aggregator.add_chunk(seconds, chunk['Sensor'].to_numpy(dtype=np.int64), chunk['Value'].to_numpy(dtype=np.float64))
+
+
+def _aggregate_sensor_readings_chunked(readings_path: str, sensor_lookup: pd.DataFrame, chunksize: int) -> pd.DataFrame:
+    """Chunked path with bounded memory: hourly per-type sum/count partials instead of merge + pivot."""
+    aggregator = _ChunkedSensorAggregator(sensor_lookup)
+    _add_reading_chunks(aggregator, read_sensor_readings(readings_path, chunksize=chunksize, value_dtype=np.float64))
+    return aggregator.result()
+
+
+def _count_accident_events(accidents: pd.DataFrame) -> np.ndarray:
+    """
+    Counts accident events per hour of the year in one np.bincount pass.
+    Returns an (HOURS_IN_YEAR, 4) int64 array with the ACCIDENT_COUNT_COLUMNS.
+    """
+    # 1. Event flags per accident; a measurement above 0 marks the event (NaN compares False)
+    events = np.column_stack([accidents[column].to_numpy(dtype=np.float64) > 0 for column in ACCIDENT_EVENTS.values()])
+    flags = np.column_stack((events.any(axis=1), events))
+
+    # 2. Hour-of-year index computed arithmetically; Hour 24 rolls over into the next day
+    hours = seconds_since_year_start(accidents['Month'], accidents['Day'], accidents['Hour'], 0,
+                                     accidents['Second']) // 3600
+
+    # 3. One histogram over (hour, event) slots
+    rows, slots = np.nonzero(flags)
+    flat = hours[rows] * flags.shape[1] + slots
+    if len(flat) and (flat.min() < 0 or flat.max() >= HOURS_IN_YEAR * flags.shape[1]):
+        raise ValueError("Accidents must fall within the processed year.")
+    return np.bincount(flat, minlength=HOURS_IN_YEAR * flags.shape[1]).reshape(HOURS_IN_YEAR, flags.shape[1])
+
+
+def _with_accident_counts(sensor_hourly: pd.DataFrame, event_counts: np.ndarray) -> pd.DataFrame:
+    """Adds the hourly accident counts aligned to the (contiguous, hourly) sensor index; 0 for hours without any."""
+    combined_data = sensor_hourly.copy()
+    if len(sensor_hourly):
+        first_hour = (sensor_hourly.index[0] - YEAR_START) // pd.Timedelta(hours=1)
+        counts = event_counts[first_hour:first_hour + len(sensor_hourly)]
+    else:
+        counts = event_counts[:0]
+    for column, values in zip(ACCIDENT_COUNT_COLUMNS, counts.T):
+        combined_data[column] = values
+    return combined_data
+
+
+def _typed_frame(data: pd.DataFrame) -> pd.DataFrame:
+    """Applies the processed-data schema: float32 features, int32 accident counts, datetime64 index."""
+    typed = data.astype({column: np.int32 if column in ACCIDENT_COUNT_COLUMNS else np.float32
+                         for column in data.columns})
+    typed.index = pd.DatetimeIndex(data.index, name='datetime')
+    typed.columns.name = None
+    return typed
+
+
+def _columnar_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def save_processed_data(data: pd.DataFrame, path: str = PROCESSED_PATH) -> str:
+    """
+    Writes the processed dataset; the format follows the extension (.parquet, .feather or .csv).
+    Columnar formats need pyarrow; without it the data is written as CSV next to `path`.
+    Returns the path actually written.
+    """
+    extension = os.path.splitext(path)[1]
+    if extension not in PROCESSED_FORMATS:
+        raise ValueError(f"Unsupported processed data format '{extension}', expected one of {PROCESSED_FORMATS}")
+    if extension != '.csv' and not _columnar_available():
+        print("Warning: pyarrow not installed. Writing the processed data as CSV instead.")
+        path, extension = os.path.splitext(path)[0] + '.csv', '.csv'
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if extension == '.parquet':
+        _typed_frame(data).to_parquet(path)
+    elif extension == '.feather':
+        _typed_frame(data).reset_index().to_feather(path)
+    else:
+        data.to_csv(path, date_format=CSV_DATE_FORMAT)
+    return path
+
+
+def processed_data_path(path: str = None) -> str:
+    """Returns `path`, or the first existing default Parquet, Feather or CSV location; raises FileNotFoundError."""
+    if path is None:
+        candidates = [os.path.splitext(PROCESSED_PATH)[0] + extension for extension in PROCESSED_FORMATS]
+        path = next((candidate for candidate in candidates if os.path.exists(candidate)), PROCESSED_PATH)
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    return path
+
+
+def load_processed_data(path: str = None, columns: list = None) -> pd.DataFrame:
+    """
+    Reads the processed dataset, selecting only `columns` (plus the datetime index).
+    Columnar files are memory-mapped; a Parquet path may also be the part-file directory
+    of an incremental store. Without `path`, the default Parquet, Feather
+    and CSV locations are tried in that order.
+    """
+    path = processed_data_path(path)
+    extension = os.path.splitext(path)[1]
+    if extension == '.parquet':
+        return pd.read_parquet(path, columns=columns, memory_map=True)
+    if extension == '.feather':
+        from pyarrow import feather
+        table = feather.read_table(path, columns=None if columns is None else ['datetime'] + list(columns),
+                                   memory_map=True)
+        return table.to_pandas().set_index('datetime')
+    usecols = None if columns is None else ['datetime'] + list(columns)
+    # round_trip parses the written floats back exactly, so a stored CSV can be extended incrementally
+    return pd.read_csv(path, index_col='datetime', parse_dates=True, usecols=usecols, float_precision='round_trip')
+
+
+def iter_processed_data(path: str = None, columns: list = None, chunk_rows: int = 65536):
+    """
+    Streams the processed dataset as DataFrames of at most `chunk_rows` rows (datetime index),
+    so a multi-year store can be consumed without materializing it.
+    """
+    path = processed_data_path(path)
+    read_columns = None if columns is None else ['datetime'] + list(columns)
+    extension = os.path.splitext(path)[1]
+    if extension == '.csv':
+        for chunk in pd.read_csv(path, index_col='datetime', parse_dates=True, usecols=read_columns,
+                                 float_precision='round_trip', chunksize=chunk_rows):
+            yield chunk
+        return
+
+    import pyarrow as pa
+    if extension == '.parquet':
+        from pyarrow import parquet
+        files = _store_parts(path) if os.path.isdir(path) else [path]
+        batches = (batch for file in files for batch in
+                   parquet.ParquetFile(file, memory_map=True).iter_batches(batch_size=chunk_rows, columns=read_columns))
+    else:
+        reader = pa.ipc.open_file(pa.memory_map(path))
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    for batch in batches:
+        if read_columns is not None:
+            batch = batch.select(read_columns)
+        for start in range(0, batch.num_rows, chunk_rows):
+            chunk = batch.slice(start, chunk_rows).to_pandas()  # applies the stored pandas index, if any
+            yield chunk.set_index('datetime') if 'datetime' in chunk.columns else chunk
+
+
+def _incremental_state_path(output_path: str) -> str:
+    return os.path.splitext(output_path)[0] + '.state.npz'
+
+
+def _fingerprint(*paths) -> str:
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _watermark_digest(path: str, offset: int) -> str:
+    """
+    Hash of the first bytes of the log and of the bytes just before `offset`, or None if the
+    file is shorter than the watermark. Edits elsewhere before the watermark go unnoticed,
+    the logs are assumed to be append-only.
+    """
+    if os.path.getsize(path) < offset:
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        digest.update(f.read(min(offset, WATERMARK_WINDOW)))
+        f.seek(max(offset - WATERMARK_WINDOW, 0))
+        digest.update(f.read(min(offset, WATERMARK_WINDOW)))
+    return digest.hexdigest()
+
+
+class _LogRange(io.RawIOBase):
+    """
+    Read-only stream of a log's header line followed by bytes [start, end) of the file, so an
+    appended range is parsed chunk by chunk instead of being read into memory first.
+    """
+
+    def __init__(self, path: str, header: bytes, start: int, end: int):
+        self._file = open(path, 'rb')
+        self._file.seek(start)
+        self._header = header
+        self._remaining = end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast('B')
+        if self._header:
+            n = min(len(view), len(self._header))
+            view[:n] = self._header[:n]
+            self._header = self._header[n:]
+            return n
+        n = self._file.readinto(view[:min(len(view), self._remaining)])
+        self._remaining -= n
+        return n
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def _appended_range(path: str, offset: int):
+    """
+    Locates the bytes of an append-only log after byte `offset` without reading them. Returns
+    (header, start, end, tail): [start, end) ends at the last newline and advances the watermark,
+    `tail` is a trailing line without newline, which is processed but re-read next time in case
+    it was still being written. A tail with fewer fields than the header is a record still being
+    written and is left out entirely until a later run.
+    """
+    with open(path, 'rb') as f:
+        header = f.readline()
+        start = max(offset, len(header))
+        size = end = f.seek(0, os.SEEK_END)
+        while end > start:
+            block_start = max(end - WATERMARK_WINDOW, start)
+            f.seek(block_start)
+            newline = f.read(end - block_start).rfind(b'\n')
+            if newline >= 0:
+                end = block_start + newline + 1
+                break
+            end = block_start
+        f.seek(end)
+        tail = f.read(size - end)
+    if tail.count(b';') != header.count(b';'):
+        tail = b''
+    return header, start, end, tail
+
+
+def _appended_stream(path: str, header: bytes, start: int, end: int):
+    return io.BufferedReader(_LogRange(path, header, start, end), buffer_size=1 << 20)
+
+
+def _add_readings(aggregator: _ChunkedSensorAggregator, stream):
+    with stream:
+        _add_reading_chunks(aggregator, read_sensor_readings(stream, chunksize=INCREMENTAL_CHUNKSIZE,
+                                                             value_dtype=np.float64))
+
+
+def _add_accident_events(event_counts: np.ndarray, stream):
+    """Adds the hourly accident event counts of the streamed accident rows to `event_counts` in place."""
+    with stream:
+        for accidents in read_accidents(stream, chunksize=INCREMENTAL_CHUNKSIZE):
+            event_counts += _count_accident_events(accidents)
+
+
+def _hour_of_year(timestamp) -> int:
+    return (pd.Timestamp(timestamp) - YEAR_START) // pd.Timedelta(hours=1)
+
+
+def _store_parts(path: str) -> list:
+    """The part files of a Parquet store directory, in chronological order."""
+    return sorted(os.path.join(path, name) for name in os.listdir(path)
+                  if name.startswith('part-') and name.endswith('.parquet'))
+
+
+def _part_hour(part: str) -> int:
+    return int(os.path.basename(part)[len('part-'):-len('.parquet')])
+
+
+def _write_part(rows: pd.DataFrame, part: str):
+    # A leading dot keeps an interrupted write out of the dataset
+    tmp_path = os.path.join(os.path.dirname(part), f".{os.path.basename(part)}.tmp")
+    _typed_frame(rows).to_parquet(tmp_path)
+    os.replace(tmp_path, part)
+
+
+def _write_parts(data: pd.DataFrame, path: str):
+    """Writes `data` into the part files of a Parquet store, one per week (STORE_PART_HOURS), replacing them."""
+    hours = np.asarray((data.index - YEAR_START) // pd.Timedelta(hours=1), dtype=np.int64)
+    weeks = hours - hours % STORE_PART_HOURS
+    for week in np.unique(weeks) if len(data) else [0]:
+        _write_part(data[weeks == week], os.path.join(path, STORE_PART.format(week)))
+
+
+def _write_store(data: pd.DataFrame, path: str) -> str:
+    """
+    Writes the whole incremental store and returns the path written. A Parquet store is a
+    directory of weekly part files, so later runs rewrite only the weeks they change (see
+    _update_store and _update_store_counts).
+    """
+    if os.path.splitext(path)[1] != '.parquet' or not _columnar_available():
+        return save_processed_data(data, path)
+    if os.path.isdir(path):
+        for part in _store_parts(path):
+            os.remove(part)
+    elif os.path.exists(path):
+        os.remove(path)  # a single-file store of a full rebuild
+    os.makedirs(path, exist_ok=True)
+    _write_parts(data, path)
+    return path
+
+
+def _update_store_counts(path: str, event_counts: np.ndarray, hours: np.ndarray):
+    """Rewrites the accident counts of the given hours in the weekly parts of a Parquet store holding them."""
+    for week in np.unique(hours - hours % STORE_PART_HOURS):
+        part = os.path.join(path, STORE_PART.format(week))
+        if os.path.exists(part):
+            rows = pd.read_parquet(part)
+            _write_part(_with_accident_counts(rows.drop(columns=ACCIDENT_COUNT_COLUMNS), event_counts), part)
+
+
+def _csv_row_offset(path: str, since: pd.Timestamp) -> int:
+    """Byte offset of the first row of a processed CSV at or after `since`, scanning back from the end."""
+    key = since.strftime(CSV_DATE_FORMAT).encode()
+    with open(path, 'rb') as f:
+        header_end = len(f.readline())
+        offset = f.seek(0, os.SEEK_END)
+        while offset > header_end:
+            # Start of the row that ends at `offset`
+            start = offset - 1
+            while True:
+                block_start = max(start - WATERMARK_WINDOW, header_end)
+                f.seek(block_start)
+                newline = f.read(start - block_start).rfind(b'\n')
+                if newline >= 0 or block_start == header_end:
+                    start = block_start + newline + 1
+                    break
+                start = block_start
+            f.seek(start)
+            if f.read(len(key)) < key:
+                break
+            offset = start
+    return offset
+
+
+def _read_store_tail(path: str, since: pd.Timestamp) -> pd.DataFrame:
+    """The stored rows from `since` on plus the row before it, read from the end of the store."""
+    seed = since - pd.Timedelta(hours=1)
+    if os.path.isdir(path):
+        parts = _store_parts(path)
+        first = max([i for i, part in enumerate(parts) if _part_hour(part) <= _hour_of_year(seed)], default=0)
+        stored = pd.concat([pd.read_parquet(part) for part in parts[first:]])
+    elif os.path.splitext(path)[1] == '.csv':
+        with open(path, 'rb') as f:
+            header = f.readline()
+            f.seek(_csv_row_offset(path, seed))
+            stored = pd.read_csv(io.BytesIO(header + f.read()), index_col='datetime', parse_dates=True,
+                                 float_precision='round_trip')
+    else:
+        stored = load_processed_data(path)
+    return stored[stored.index >= seed]
+
+
+def _update_store(data: pd.DataFrame, path: str, since: pd.Timestamp = None, rewrite: bool = False) -> str:
+    """
+    Replaces the stored rows from `since` on with `data` (the whole store if `since` is None)
+    and returns the path written. Only the end of the store is touched: the Parquet parts of
+    the weeks from `since` on are replaced and a CSV is truncated and appended to. Feather and
+    single-file Parquet stores, and a `rewrite` for a new column, rewrite the store from its
+    earlier rows.
+    """
+    if since is None:
+        return _write_store(data, path)
+    if rewrite or not (os.path.isdir(path) or os.path.splitext(path)[1] == '.csv'):
+        previous = load_processed_data(path)
+        data = pd.concat([previous[previous.index < since], data]).reindex(columns=data.columns)
+        return _write_store(data, path)
+
+    if os.path.isdir(path):
+        since_hour = _hour_of_year(since)
+        week = since_hour - since_hour % STORE_PART_HOURS
+        for part in _store_parts(path):
+            if _part_hour(part) > week:
+                os.remove(part)
+        part = os.path.join(path, STORE_PART.format(week))
+        if os.path.exists(part):
+            rows = pd.read_parquet(part)
+            data = pd.concat([rows[rows.index < since], data])
+        _write_parts(data, path)
+    else:
+        offset = _csv_row_offset(path, since)
+        with open(path, 'r+b') as f:
+            f.truncate(offset)
+        with open(path, 'a', newline='') as f:
+            data.to_csv(f, header=False, date_format=CSV_DATE_FORMAT)
+    return path
+
+
+def _save_incremental_state(path: str, aggregator: _ChunkedSensorAggregator, event_counts: np.ndarray,
+                            tail_counts: np.ndarray, meta: dict):
+    """
+    Writes the state atomically, so an interrupted run leaves the previous state intact.
+    `tail_counts` are the events of an unterminated last accident line, which the output
+    includes but `event_counts` does not.
+    """
+    arrays = aggregator.state()
+    # Accident counts are stored sparsely, only the hours with any event
+    for prefix, counts in (('accident', event_counts), ('tail', tail_counts)):
+        arrays[f'{prefix}_hours'] = np.flatnonzero(counts.any(axis=1))
+        arrays[f'{prefix}_counts'] = counts[arrays[f'{prefix}_hours']]
+    arrays['meta'] = np.array(json.dumps(meta))
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+
+def _load_incremental_state(path: str, aggregator: _ChunkedSensorAggregator):
+    """Restores the aggregator in place and returns (event_counts, tail_counts, meta)."""
+    with np.load(path) as data:
+        aggregator.load_state(data)
+        event_counts, tail_counts = _empty_event_counts(), _empty_event_counts()
+        event_counts[data['accident_hours']] = data['accident_counts']
+        tail_counts[data['tail_hours']] = data['tail_counts']
+        meta = json.loads(str(data['meta']))
+    return event_counts, tail_counts, meta
+
+
+def _empty_event_counts() -> np.ndarray:
+    return np.zeros((HOURS_IN_YEAR, len(ACCIDENT_COUNT_COLUMNS)), dtype=np.int64)
+
+
+def _reemit(sensor_hourly: pd.DataFrame, event_counts: np.ndarray, path: str, since: pd.Timestamp = None,
+            start_hour: int = None):
+    """
+    Builds the rows from `since` on for the store at `path`, exactly as the full rebuild does:
+    the stored sensor values before `start_hour` and the new hourly means from it, forward-filled
+    from the stored row before `since`, with the current accident counts. Without `since`, all
+    hours. Returns (rows, rewrite); `rewrite` is True if the store lacks a (new) sensor column.
+    """
+    rewrite = False
+    if since is not None:
+        stored = _read_store_tail(path, since)
+        rewrite = list(stored.columns) != list(sensor_hourly.columns) + ACCIDENT_COUNT_COLUMNS
+        previous = stored[stored.index < YEAR_START + pd.Timedelta(hours=start_hour)]
+        previous = previous.reindex(columns=sensor_hourly.columns)
+        sensor_hourly = pd.concat([previous.astype(np.float64), sensor_hourly])
+    combined_data = _with_accident_counts(sensor_hourly.ffill(), event_counts)
+    return (combined_data if since is None else combined_data[combined_data.index >= since]), rewrite
+
+
+def _update_incrementally(path: str, sensor_hourly: pd.DataFrame, event_counts: np.ndarray, since: pd.Timestamp,
+                          start_hour: int, changed_hours: np.ndarray) -> tuple:
+    """
+    Re-emits the hours from `since` into the store at `path` and returns (path written, rows).
+    The earlier `changed_hours` only need new accident counts: a Parquet store rewrites just
+    the weekly parts holding them, other stores are re-emitted from the first of them.
+    """
+    if len(changed_hours):
+        if os.path.isdir(path):
+            _update_store_counts(path, event_counts, changed_hours)
+        else:
+            since = YEAR_START + pd.Timedelta(hours=int(changed_hours[0]))
+    rows, rewrite = _reemit(sensor_hourly, event_counts, path, since, start_hour)
+    return _update_store(rows, path, since, rewrite), rows
+
+
+def _preprocess_incrementally(data_dir: str, output_path: str, csv_path: str = None, state_path: str = None):
+    """
+    Incremental mode for append-only logs.
+
+    The state file holds a byte watermark per log, the partial aggregates of the last
+    open hour and the hourly accident event counts. Each run streams only the bytes appended
+    since the watermark and replaces only the end of the stored output, the hours from the
+    open hour on. A Parquet store is a directory of weekly part files and a CSV store is
+    truncated and appended to (see _update_store); earlier hours whose accident counts
+    changed are updated as described in _update_incrementally. The state is rebuilt from scratch if it is missing, the sensor
+    metadata changed, a CSV export is newly requested or a log no longer matches its watermark
+    (truncated or rewritten). Returns the re-emitted hours.
+    """
+    state_path = state_path or _incremental_state_path(output_path)
+    accidents_path = os.path.join(data_dir, ACCIDENTS_FILE)
+    readings_path = os.path.join(data_dir, SENSOR_READINGS_FILE)
+    sensors_path = os.path.join(data_dir, SENSORS_FILE)
+    sensor_types_path = os.path.join(data_dir, SENSOR_TYPES_FILE)
+    try:
+        sensors = pd.read_csv(sensors_path, sep=';')
+        sensor_types = pd.read_csv(sensor_types_path, sep=';')
+        lookup_fingerprint = _fingerprint(sensors_path, sensor_types_path)
+        for path in (accidents_path, readings_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(path)
+    except FileNotFoundError as e:
+        print(f"Error loading data: {e}. Make sure the data files are in the '{data_dir}/' directory.")
+        return None
+
+    aggregator = _ChunkedSensorAggregator(_build_sensor_lookup(sensors, sensor_types))
+    event_counts, previous_tail_counts, meta = _empty_event_counts(), _empty_event_counts(), None
+    if os.path.exists(state_path):
+        try:
+            event_counts, previous_tail_counts, meta = _load_incremental_state(state_path, aggregator)
+            processed_data_path(meta['written_path'])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Warning: Could not restore incremental state from {state_path}: {e}")
+            meta = None
+    if meta is not None and (
+            meta['output_path'] != output_path or meta['lookup'] != lookup_fingerprint
+            or (csv_path and meta.get('csv_path') != csv_path)
+            or _watermark_digest(readings_path, meta['readings_offset']) != meta['readings_digest']
+            or _watermark_digest(accidents_path, meta['accidents_offset']) != meta['accidents_digest']):
+        print("Incremental state does not match the data files, rebuilding.")
+        meta = None
+    if meta is None:
+        aggregator = _ChunkedSensorAggregator(_build_sensor_lookup(sensors, sensor_types))
+        event_counts, previous_tail_counts = _empty_event_counts(), _empty_event_counts()
+        meta = {'written_path': None, 'readings_offset': 0, 'accidents_offset': 0}
+
+    # 1. Stream only the appended bytes; the hours before the open one are final
+    start_hour = None if aggregator.last_second is None else aggregator.last_second // 3600
+    readings_header, readings_start, readings_offset, readings_tail = _appended_range(readings_path,
+                                                                                      meta['readings_offset'])
+    accidents_header, accidents_start, accidents_offset, accidents_tail = _appended_range(accidents_path,
+                                                                                          meta['accidents_offset'])
+    appended_events = _empty_event_counts()
+    _add_readings(aggregator, _appended_stream(readings_path, readings_header, readings_start, readings_offset))
+    _add_accident_events(appended_events, _appended_stream(accidents_path, accidents_header, accidents_start,
+                                                           accidents_offset))
+    state = (copy.deepcopy(aggregator), event_counts + appended_events)
+    state[0].compact()
+
+    # An unterminated last line counts towards this output but not towards the saved state;
+    # one that does not parse yet stays behind the watermark for the next run
+    tail_counts = _empty_event_counts()
+    for add, target, header, tail in ((_add_readings, aggregator, readings_header, readings_tail),
+                                      (_add_accident_events, tail_counts, accidents_header, accidents_tail)):
+        try:
+            add(target, io.BytesIO(header + tail))
+        except ValueError as e:
+            print(f"Warning: Skipping the incomplete last line {tail!r}: {e}")
+    event_counts += appended_events + tail_counts
+
+    # 2. Re-emit from the open hour; earlier hours whose accident counts changed (the accident
+    #    log is not chronological) get new counts, see _update_incrementally
+    since, changed_hours = None, np.zeros(0, dtype=np.int64)
+    sensor_hourly = aggregator.result(None if meta['written_path'] is None else start_hour)
+    if meta['written_path'] is not None and start_hour is not None:
+        since = YEAR_START + pd.Timedelta(hours=start_hour)
+        changed_hours = np.flatnonzero((appended_events + tail_counts != previous_tail_counts).any(axis=1))
+        changed_hours = changed_hours[(changed_hours >= aggregator.first_hour) & (changed_hours < start_hour)]
+
+    # 3. Save the store first, then the state: re-running after a crash re-emits the same hours
+    written_path, combined_data = _update_incrementally(meta['written_path'] or output_path, sensor_hourly,
+                                                        event_counts, since, start_hour, changed_hours)
+    total_hours = 0 if aggregator.first_hour is None else aggregator.last_hour - aggregator.first_hour + 1
+    print(f"Processed data saved to {written_path} ({len(combined_data)} of {total_hours} hours re-emitted, "
+          f"{len(changed_hours)} earlier hours recounted)")
+    if csv_path:
+        _update_incrementally(csv_path, sensor_hourly, event_counts, since, start_hour, changed_hours)
+        print(f"CSV export saved to {csv_path}")
+    _save_incremental_state(state_path, *state, tail_counts, {
+        'output_path': output_path,
+        'written_path': written_path,
+        'csv_path': csv_path,
+        'lookup': lookup_fingerprint,
+        'readings_offset': readings_offset,
+        'readings_digest': _watermark_digest(readings_path, readings_offset),
+        'accidents_offset': accidents_offset,
+        'accidents_digest': _watermark_digest(accidents_path, accidents_offset),
+    })
+    return combined_data
+
+
+def load_and_preprocess_data(data_dir: str = 'data', output_path: str = OUTPUT_PATH, chunksize: int = None,
+                             csv_path: str = None, incremental: bool = False, state_path: str = None,
+                             per_sensor_path: str = None, out_of_range: str = OUT_OF_RANGE_CLAMP):
+    """
+    Loads, cleans, and preprocesses the SpeedLimit project data.
+
+    If `chunksize` is given, the sensor readings are streamed in chunks of that many rows
+    (bounded memory, readings must be chronological); otherwise they are loaded at once.
+    Both modes produce the same output. The result is written to `output_path` (Parquet by
+    default, see save_processed_data) and optionally also exported as CSV to `csv_path`.
+    With `incremental`, only data appended since the last run is parsed (see
+    _preprocess_incrementally); the output is the same as a full rebuild.
+
+    With `per_sensor_path`, the readings go into a time x sensor matrix instead (see
+    src/sensor_matrix.py): values are validated against the SensorTypes Min/Max
+    (`out_of_range` 'clamp' or 'drop'), unknown sensor IDs are counted, the per-sensor
+    dataset is written to `per_sensor_path` and its per-type view to `output_path`.
+    """
+    if incremental:
+        if per_sensor_path:
+            raise ValueError("The per-sensor mode does not support incremental runs.")
+        return _preprocess_incrementally(data_dir, output_path, csv_path, state_path)
+
+    # Load the datasets
+    readings_path = os.path.join(data_dir, SENSOR_READINGS_FILE)
+    try:
+        accidents = read_accidents(os.path.join(data_dir, ACCIDENTS_FILE))
+        sensors = pd.read_csv(os.path.join(data_dir, SENSORS_FILE), sep=';')
+        sensor_types = pd.read_csv(os.path.join(data_dir, SENSOR_TYPES_FILE), sep=';')
+        sensor_readings = None
+        if chunksize is None and not per_sensor_path:
+            sensor_readings = read_sensor_readings(readings_path, value_dtype=np.float64)
+        elif not os.path.exists(readings_path):
+            raise FileNotFoundError(readings_path)
+    except FileNotFoundError as e:
+        print(f"Error loading data: {e}. Make sure the data files are in the '{data_dir}/' directory.")
+        return None
+
+    # 1. Create a complete sensor lookup table
+    sensor_lookup = _build_sensor_lookup(sensors, sensor_types)
+
+    # 2. Clean and aggregate sensor readings to hourly means per sensor type
+    sensor_matrix = None
+    if per_sensor_path:
+        sensor_matrix = build_sensor_matrix(readings_path, sensors, sensor_types, chunksize, out_of_range)
+        print(f"Sensor validation: {sensor_matrix.report()}")
+        sensor_hourly = sensor_matrix.per_type()
+    elif chunksize is None:
+        sensor_hourly = _aggregate_sensor_readings(sensor_readings, sensor_lookup)
+    else:
+        sensor_hourly = _aggregate_sensor_readings_chunked(readings_path, sensor_lookup, chunksize)
+
+    # Forward-fill hours without readings
+    sensor_hourly = sensor_hourly.ffill()
+
+    # 3. Process accident data: near-accident, skid, close-car and close-guardrail counts per hour
+    event_counts = _count_accident_events(accidents)
+
+    # 4. Combine sensor data and accident counts
+    combined_data = _with_accident_counts(sensor_hourly, event_counts)
+    if sensor_matrix is not None:
+        per_sensor_path = save_processed_data(_with_accident_counts(sensor_matrix.per_sensor().ffill(), event_counts),
+                                              per_sensor_path)
+        print(f"Per-sensor data saved to {per_sensor_path}")
+
     # 5. Save the processed dataset
-    output_path = 'data/processed/processed_data.csv'
-    combined_data.to_csv(output_path)
+    output_path = save_processed_data(combined_data, output_path)
     print(f"Processed data saved to {output_path}")
-    
+    if csv_path:
+        save_processed_data(combined_data, csv_path)
+        print(f"CSV export saved to {csv_path}")
+
     return combined_data
 
 if __name__ == '__main__':
-    load_and_preprocess_data()
+    import argparse
+    parser = argparse.ArgumentParser(description="Preprocesses the SpeedLimit sensor and accident logs.")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help="Stream the sensor readings in chunks of this many rows (bounded memory).")
+    parser.add_argument('--output', default=OUTPUT_PATH, help="Processed data file (.parquet, .feather or .csv).")
+    parser.add_argument('--csv', nargs='?', const=CSV_EXPORT_PATH, default=None,
+                        help=f"Also export the processed data as CSV (default path: {CSV_EXPORT_PATH}).")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only process data appended since the last incremental run (append-only logs).")
+    parser.add_argument('--state', default=None,
+                        help="Incremental state file (default: next to the output, <output>.state.npz).")
+    parser.add_argument('--per-sensor', nargs='?', const=PER_SENSOR_PATH, default=None,
+                        help="Build the validated time x sensor matrix and also write the per-sensor dataset "
+                             f"(default path: {PER_SENSOR_PATH}).")
+    parser.add_argument('--out-of-range', choices=OUT_OF_RANGE_MODES, default=OUT_OF_RANGE_CLAMP,
+                        help="Per-sensor mode: clamp or drop values outside the SensorTypes Min/Max.")
+    args = parser.parse_args()
+    load_and_preprocess_data(output_path=args.output, chunksize=args.chunksize, csv_path=args.csv,
+                             incremental=args.incremental, state_path=args.state,
+                             per_sensor_path=args.per_sensor, out_of_range=args.out_of_range)
@@ -1,41 +1,159 @@
-
 import datetime
+import enum
 import numpy as np
-import joblib
 import os
-try:
-    from tensorflow.keras.models import load_model
-except ImportError:
-    print("Warning: TensorFlow not installed. NN features will be disabled.")
-    load_model = None
-
-from src.llm_integration import get_simulated_aqi, get_llm_speed_reduction_recommendation
+import time
+from typing import NamedTuple
 
-# Load model and scaler
-MODEL_PATH = 'models/nn_model.keras'
-SCALER_PATH = 'models/scaler.pkl'
+from src.aqi_cache import aqi_band
+from src.audit_log import audit_log
+from src.llm_integration import get_simulated_aqi, get_llm_speed_reduction_recommendation, last_recommendation_source
+from src.metrics import metrics
+from src.model_registry import registry, MODEL_PATH, SCALER_PATH
+from src.weather_router import WeatherRouter, MODE_GATING, SOURCE_RULE
 
+# Model and scaler are loaded lazily by src.model_registry on the first NN check
+# (or eagerly via warm_up()). Assigning these module attributes directly overrides
+# the registry, e.g. to inject a model in tests or embedded deployments.
 nn_model = None
 scaler = None
 mean_values = None
 
-try:
-    if load_model:
-        if os.path.exists(MODEL_PATH):
-            nn_model = load_model(MODEL_PATH)
-        else:
-            print(f"Warning: Model file not found at {MODEL_PATH}")
-            
-    if os.path.exists(SCALER_PATH):
-        scaler = joblib.load(SCALER_PATH)
-        # scaler.mean_ corresponds to features:
-        # ['humidity', 'light', 'noise', 'temperature', 'traffic', 'wind direction', 'wind strength', 'water']
-        mean_values = scaler.mean_
-    else:
-        print(f"Warning: Scaler file not found at {SCALER_PATH}")
+# Router mode: 'local' (default), 'advisory' or 'gating'
+router = WeatherRouter(mode=os.getenv("SPEEDLIMIT_ROUTER_MODE", "local"))
+metrics.register_collector('router', lambda: router.stats())
+
+# Audit log of every decision (NFR-11); disabled unless SPEEDLIMIT_AUDIT_DIR is set.
+# Assign an enabled src.audit_log.AuditLog here to turn it on at run time.
+metrics.register_collector('audit', lambda: audit_log.stats())
+
+
+def _get_model_components():
+    """Returns (nn_model, scaler, mean_values), loading them from the registry on first use."""
+    if nn_model is not None or scaler is not None:
+        return nn_model, scaler, mean_values
+    components = registry.get()
+    return components.model, components.scaler, components.mean_values
+
+
+def warm_up():
+    """Loads the NN model and scaler up front so the first decision does not pay for it."""
+    registry.warm_up()
+
+# Feature order used by the scaler and the NN:
+# ['humidity', 'light', 'noise', 'temperature', 'traffic', 'wind direction', 'wind strength', 'water']
+LIGHT_IDX = 1
+TEMPERATURE_IDX = 3
+WATER_IDX = 7
+
+
+class JustificationCode(enum.IntFlag):
+    """Bit flags describing which rules contributed to a speed limit decision."""
+    NONE = 0
+    DARKNESS = 1            # SPEC1
+    BLACK_ICE = 2           # SPEC2
+    NN_HIGH_RISK = 4        # REQ1: NN predicts more than one near-accident per hour
+    POOR_AIR_QUALITY = 8    # REQ2: AQI agent recommended a reduction
+
+
+_REASONS = {
+    JustificationCode.DARKNESS: "Darkness (illuminance < 500 millilux)",
+    JustificationCode.BLACK_ICE: "Danger of black ice (water > 1000 µm & temp < 0°C)",
+}
+
+
+def justification_parts(code, predicted_accidents: float = float('nan'), weather_reduction: int = 0,
+                        aqi: int = None, aqi_reduction: int = 0) -> list[str]:
+    """The human-readable reason for each rule set in `code`, in decision order."""
+    parts = [reason for flag, reason in _REASONS.items() if code & flag]
+    if code & JustificationCode.NN_HIGH_RISK:
+        parts.append(f"NN predicts {predicted_accidents:.1f} near-accidents/hr, reducing speed by {weather_reduction} km/h.")
+    if code & JustificationCode.POOR_AIR_QUALITY:
+        parts.append(f"Poor air quality (AQI: {aqi}) leading to {aqi_reduction} km/h reduction by LLM recommendation.")
+    return parts
+
+
+def render_justification(code, predicted_accidents: float = float('nan'), weather_reduction: int = 0,
+                         aqi: int = None, aqi_reduction: int = 0, speed_limit: int = None) -> str:
+    """
+    Renders the justification text of a decision from its structured fields.
+    With `speed_limit` given, notes when detected conditions left the limit at 80 km/h.
+    """
+    parts = justification_parts(code, predicted_accidents, weather_reduction, aqi, aqi_reduction)
+    if not parts:
+        return "Default speed limit (80 km/h) due to no detected risks."
+    justification = "; ".join(parts)
+    if speed_limit == 80:
+        justification += " (Speed limit maintained at 80 km/h as risk is within acceptable limits for detected conditions)."
+    return justification
+
+
+class SpeedLimitDecision(NamedTuple):
+    """
+    Structured result of one speed limit decision. The justification text is only
+    rendered when asked for, so replays and audits can keep just the numbers.
+    """
+    speed_limit: int
+    code: JustificationCode
+    predicted_accidents: float  # NaN when the router skipped the NN
+    weather_reduction: int
+    aqi: int
+    aqi_reduction: int
+
+    @property
+    def aqi_band(self) -> int:
+        """Guideline band of the AQI: 0 Good, 1 Moderate, 2 Unhealthy, 3 Hazardous."""
+        return aqi_band(self.aqi)
 
-except Exception as e:
-    print(f"Error loading model or scaler: {e}")
+    @property
+    def justification(self) -> str:
+        return render_justification(self.code, self.predicted_accidents, self.weather_reduction,
+                                    self.aqi, self.aqi_reduction, self.speed_limit)
+
+
+def _build_feature_matrix(mean_values, illuminance, water_level, temperature) -> np.ndarray:
+    """
+    Builds an (n, 8) feature matrix from the scaler means, overriding the
+    light, temperature and water columns with the given sensor readings.
+    """
+    illuminance = np.atleast_1d(np.asarray(illuminance, dtype=float))
+    features = np.tile(mean_values, (len(illuminance), 1)).astype(float)
+    features[:, LIGHT_IDX] = illuminance
+    features[:, TEMPERATURE_IDX] = temperature
+    features[:, WATER_IDX] = water_level
+    return features
+
+
+def predict_near_accidents(illuminance: float, water_level: float, temperature: float, at_risk: bool = True) -> float:
+    """
+    Predicts near-accidents per hour for one weather snapshot with the NN model.
+    Without a model, simulates the NN: 1.5 if `at_risk` (SPEC1/SPEC2 detected), else 0.2.
+    """
+    predicted_accidents = 0.0
+    nn_model, scaler, mean_values = _get_model_components()
+
+    if nn_model is not None and mean_values is not None:
+        try:
+            # Construct feature vector using means for missing values
+            features = _build_feature_matrix(mean_values, illuminance, water_level, temperature)
+            # The NumPy backend has the scaler folded into its first layer
+            with metrics.timer('scaler'):
+                features_scaled = scaler.transform(features) if scaler is not None else features
+
+            # Predict
+            with metrics.timer('nn_predict'):
+                prediction = nn_model.predict(features_scaled, verbose=0)
+            predicted_accidents = float(prediction[0][0])
+
+        except Exception as e:
+            metrics.count('errors', 'nn_predict')
+            print(f"Error during NN prediction: {e}")
+            # Fallback or keep 0.0
+    else:
+        # Fallback if model not available: Simulate behavior for safety/testing
+        metrics.count('fallbacks', 'no_model')
+        predicted_accidents = 1.5 if at_risk else 0.2
+    return predicted_accidents
 
 
 def get_weather_speed_reduction(illuminance: float, water_level: float, temperature: float) -> tuple[int, str]:
@@ -43,123 +161,74 @@ def get_weather_speed_reduction(illuminance: float, water_level: float, temperat
     Determines speed limit reduction based on weather conditions (REQ1).
     Uses a Neural Network to predict near-accident risk.
     """
+    speed_reduction, code, _, _, predicted_accidents = _weather_decision(illuminance, water_level, temperature)
+    return speed_reduction, "; ".join(justification_parts(code, predicted_accidents, speed_reduction))
+
+
+def _weather_decision(illuminance: float, water_level: float, temperature: float):
+    """
+    Weather step (REQ1) of decide_speed_limit.
+    Returns (speed_reduction, code, check_nn, router_source, predicted_accidents);
+    predicted_accidents is NaN when the router skipped the NN.
+    """
     speed_reduction = 0
-    reason = []
+    code = JustificationCode.NONE
+    predicted_accidents = float('nan')
 
     is_dark = illuminance < 500  # SPEC1
     is_black_ice_danger = (water_level > 1000 and temperature < 0) # SPEC2
 
     if is_dark:
-        reason.append("Darkness (illuminance < 500 millilux)")
+        code |= JustificationCode.DARKNESS
     if is_black_ice_danger:
-        reason.append("Danger of black ice (water > 1000 µm & temp < 0°C)")
-
-    # --- Router Component Logic (LLM Enhanced) ---
-    # Determine if we should check the NN based on an LLM's assessment of the situation
-    check_nn = False
-    
-    # Try using LLM to route
-    import os
-    import google.generativeai as genai
-    
-    api_key = os.getenv("GEMINI_API_KEY")
-    if api_key:
-        try:
-             genai.configure(api_key=api_key)
-             router_model = genai.GenerativeModel('gemini-2.5-flash')
-             router_prompt = f"""
-             You are an intelligent router for a traffic safety system.
-             
-             Sensor Data:
-             - Illuminance: {illuminance} millilux
-             - Water Level: {water_level} micrometers
-             - Temperature: {temperature} Celsius
-             
-             Rules:
-             - Darkness is defined as Illuminance < 500.
-             - Black Ice Risk is Water > 1000 AND Temperature < 0.
-             
-             Task:
-             Decide if we should run the complex Neural Network (NN) to predict accidents.
-             Answer "YES" if either Darkness OR Black Ice Risk is present.
-             Answer "NO" otherwise.
-             
-             Output:
-             YES or NO
-             """
-             response = router_model.generate_content(router_prompt)
-             llm_router_decision = response.text.strip().upper()
-             if "YES" in llm_router_decision:
-                 check_nn = True
-                 print(f"(LLM: Weather routing decision: Router said '{llm_router_decision}', so checking NN)")
-             else:
-                 print(f"(LLM: Weather routing decision: Router said '{llm_router_decision}', so skipping NN check)")
-        except Exception:
-            # Fallback to hardcoded logic on error
-            check_nn = is_dark or is_black_ice_danger
-    else:
-        # Fallback to hardcoded logic if no key
-        check_nn = is_dark or is_black_ice_danger
+        code |= JustificationCode.BLACK_ICE
+
+    # --- Router Component Logic ---
+    # Decide whether to check the NN. The local rule answers instantly; the LLM is only
+    # consulted in advisory (background) or gating (cached) mode, see src/weather_router.py
+    with metrics.timer('router'):
+        check_nn, router_source = router.route(illuminance, water_level, temperature, is_dark, is_black_ice_danger)
 
     if check_nn:
         # REQ1: reduce speed limit so at most one near-accident per hour
-        predicted_accidents = 0.0
-        
-        if nn_model and scaler is not None and mean_values is not None:
-            try:
-                # Construct feature vector using means for missing values
-                # Features: ['humidity', 'light', 'noise', 'temperature', 'traffic', 'wind direction', 'wind strength', 'water']
-                features = np.copy(mean_values) 
-                features[1] = illuminance # light
-                features[3] = temperature # temperature
-                features[7] = water_level # water
-                
-                # Reshape and scale
-                features_reshaped = features.reshape(1, -1)
-                features_scaled = scaler.transform(features_reshaped)
-                
-                # Predict
-                prediction = nn_model.predict(features_scaled, verbose=0)
-                predicted_accidents = float(prediction[0][0])
-                
-            except Exception as e:
-                print(f"Error during NN prediction: {e}")
-                # Fallback or keep 0.0
-        else:
-            # Fallback if model not available: Simulate behavior for safety/testing
-             if illuminance < 500 or (water_level > 1000 and temperature < 0):
-                predicted_accidents = 1.5 
-             else:
-                predicted_accidents = 0.2
+        predicted_accidents = predict_near_accidents(illuminance, water_level, temperature,
+                                                     is_dark or is_black_ice_danger)
 
         if predicted_accidents > 1.0:
             speed_reduction = 20 # Example reduction for exceeding target
-            reason.append(f"NN predicts {predicted_accidents:.1f} near-accidents/hr, reducing speed by {speed_reduction} km/h.")
+            code |= JustificationCode.NN_HIGH_RISK
         else:
             speed_reduction = 0 # Within target
 
-    return speed_reduction, "; ".join(reason)
+    return speed_reduction, code, check_nn, router_source, predicted_accidents
 
 def get_speed_limit(illuminance: float, water_level: float, temperature: float, current_hour: int) -> tuple[int, str]:
     """
     Determines the final speed limit based on all conditions and requirements.
     Returns the speed limit and a justification string.
     """
+    decision = decide_speed_limit(illuminance, water_level, temperature, current_hour)
+    return decision.speed_limit, decision.justification
+
+def decide_speed_limit(illuminance: float, water_level: float, temperature: float, current_hour: int) -> SpeedLimitDecision:
+    """
+    get_speed_limit as a SpeedLimitDecision: the triggered rules, the NN prediction and
+    the reductions, without rendering the justification text.
+    """
+    start = time.perf_counter()
     base_speed_limit = 80 # REQ3: Default speed limit
     final_speed_limit = base_speed_limit
-    justification_parts = [] # Collect all parts of the justification
 
     # 1. Weather-based decision (REQ1)
-    weather_reduction, weather_reasons_str = get_weather_speed_reduction(illuminance, water_level, temperature)
-    if weather_reasons_str: # If there are any weather-related reasons
-        justification_parts.append(weather_reasons_str)
+    weather_reduction, code, check_nn, router_source, predicted_accidents = \
+        _weather_decision(illuminance, water_level, temperature)
 
     # 2. Air Quality-based decision (REQ2)
-    aqi = get_simulated_aqi(current_hour)
+    with metrics.timer('aqi_source'):
+        aqi = get_simulated_aqi(current_hour)
     aqi_reduction = get_llm_speed_reduction_recommendation(aqi)
     if aqi_reduction > 0:
-        justification_parts.append(f"Poor air quality (AQI: {aqi}) leading to {aqi_reduction} km/h reduction by LLM recommendation.")
-
+        code |= JustificationCode.POOR_AIR_QUALITY
 
     # Apply reductions, prioritizing the most severe one
     if weather_reduction > 0:
@@ -168,21 +237,196 @@ def get_speed_limit(illuminance: float, water_level: float, temperature: float,
     if aqi_reduction > 0:
         final_speed_limit = min(final_speed_limit, base_speed_limit - aqi_reduction)
 
+    # Ensure speed limit does not increase above 80 km/h based on AI component decision alone (NFR-8)
+    final_speed_limit = min(final_speed_limit, 80)
+
+    latency = time.perf_counter() - start
+    metrics.observe('decision', latency)
+    if audit_log.enabled:
+        audit_log.record(illuminance, water_level, temperature, current_hour, check_nn, router_source,
+                         predicted_accidents, weather_reduction, aqi, aqi_reduction, last_recommendation_source(),
+                         int(final_speed_limit), int(code), latency)
+    return SpeedLimitDecision(int(final_speed_limit), code, predicted_accidents, weather_reduction, aqi, aqi_reduction)
+
+def get_speed_limits(illuminance, water_level=None, temperature=None, current_hour=None, aqi=None,
+                     audit_path: str = 'batch') -> tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized variant of get_speed_limit for many sensor snapshots at once.
+
+    Accepts either four equally long array-likes or a DataFrame with the columns
+    'illuminance', 'water_level', 'temperature' and 'current_hour' (and optionally 'aqi')
+    as the first argument. Routing follows the router mode like get_speed_limit (the
+    SPEC1/SPEC2 masks, or the LLM per row in gating mode), and only the routed rows are
+    sent through a single scaler/model call.
+    If `aqi` is given (a scalar or one value per row) it is used instead of querying
+    get_simulated_aqi per row.
+    Decisions are audited under `audit_path`; pass None for offline runs such as replays,
+    which are not live decisions.
+
+    Returns an int array of speed limits and a uint8 array of JustificationCode flags.
+    """
+    if hasattr(illuminance, 'columns'):
+        snapshots = illuminance
+        illuminance = snapshots['illuminance'].to_numpy()
+        water_level = snapshots['water_level'].to_numpy()
+        temperature = snapshots['temperature'].to_numpy()
+        current_hour = snapshots['current_hour'].to_numpy()
+        if aqi is None and 'aqi' in snapshots.columns:
+            aqi = snapshots['aqi'].to_numpy()
+
+    illuminance = np.atleast_1d(np.asarray(illuminance, dtype=float))
+    water_level = np.atleast_1d(np.asarray(water_level, dtype=float))
+    temperature = np.atleast_1d(np.asarray(temperature, dtype=float))
+    current_hour = np.atleast_1d(np.asarray(current_hour, dtype=int))
+    n = len(illuminance)
+    if not (len(water_level) == len(temperature) == len(current_hour) == n):
+        raise ValueError("All sensor inputs must have the same length.")
+
+    start = time.perf_counter()
+
+    # 1. Weather-based decision (REQ1)
+    codes, weather_reduction, predicted_accidents, router_sources = _assess_weather(illuminance, water_level,
+                                                                                   temperature)
+
+    # 2. Air Quality-based decision (REQ2)
+    if aqi is None:
+        with metrics.timer('batch_aqi_source'):
+            aqi = np.array([get_simulated_aqi(int(hour)) for hour in current_hour])
+    aqi = np.atleast_1d(np.asarray(aqi, dtype=int))
+    if len(aqi) == 1:
+        aqi = np.broadcast_to(aqi, (n,))
+    elif len(aqi) != n:
+        raise ValueError(f"Expected one AQI value or {n}, got {len(aqi)}.")
+    aqi_reduction, aqi_sources = _aqi_speed_reductions(aqi)
+
+    final_speed_limits, codes = combine_reductions(codes, weather_reduction, aqi_reduction)
+    latency = time.perf_counter() - start
+    metrics.observe('batch_decision', latency)
+    if audit_path is not None:
+        audit_decisions(illuminance, water_level, temperature, current_hour, codes, router_sources,
+                        predicted_accidents, weather_reduction, aqi, aqi_reduction, aqi_sources, final_speed_limits,
+                        latency, audit_path)
+    return final_speed_limits, codes
+
+
+def audit_decisions(illuminance, water_level, temperature, current_hour, codes, router_sources, predicted_accidents,
+                    weather_reduction, aqi, aqi_reduction, aqi_sources, speed_limits, latency: float, path: str):
+    """
+    Records a batch of decisions in the audit log (NFR-11), if it is enabled.
+    A row was routed to the NN exactly where it has a prediction.
+    """
+    if not audit_log.enabled:
+        return
+    n = len(speed_limits)
+    audit_log.record_batch({
+        'illuminance': illuminance, 'water_level': water_level, 'temperature': temperature,
+        'current_hour': np.broadcast_to(current_hour, (n,)), 'check_nn': ~np.isnan(predicted_accidents),
+        'router_source': router_sources, 'predicted_accidents': predicted_accidents,
+        'weather_reduction': weather_reduction, 'aqi': np.broadcast_to(aqi, (n,)),
+        'aqi_reduction': aqi_reduction, 'aqi_source': aqi_sources, 'speed_limit': speed_limits,
+        'code': codes}, latency, path)
+
+
+def assess_weather(illuminance, water_level, temperature, return_details: bool = False) -> tuple:
+    """
+    Weather step (REQ1) of get_speed_limits for float arrays: routes each row like the
+    scalar path (the SPEC1/SPEC2 masks, or the LLM in gating mode) and sends only the
+    routed rows through a single scaler/model call.
+    Returns the JustificationCode flags so far and the weather speed reduction per row;
+    with `return_details`, also the predicted near-accidents (NaN where not routed) and
+    the router source per row.
+    """
+    details = _assess_weather(illuminance, water_level, temperature)
+    return details if return_details else details[:2]
+
+
+def _assess_weather(illuminance, water_level, temperature) -> tuple:
+    """
+    assess_weather plus the predicted near-accidents per row (NaN where the NN was not
+    consulted) and the router source per row.
+    """
+    n = len(illuminance)
+    codes = np.zeros(n, dtype=int)
+    is_dark = illuminance < 500  # SPEC1
+    is_black_ice_danger = (water_level > 1000) & (temperature < 0)  # SPEC2
+    codes[is_dark] |= JustificationCode.DARKNESS
+    codes[is_black_ice_danger] |= JustificationCode.BLACK_ICE
 
-    # Construct the final justification
-    if not justification_parts and final_speed_limit == base_speed_limit:
-        justification = "Default speed limit (80 km/h) due to no detected risks."
-    elif justification_parts:
-        justification = "; ".join(justification_parts)
-        if final_speed_limit == base_speed_limit:
-            justification += " (Speed limit maintained at 80 km/h as risk is within acceptable limits for detected conditions)."
+    at_risk = is_dark | is_black_ice_danger
+    if router.mode == MODE_GATING:
+        # The LLM decides per row, as in the scalar path (its answers are cached on quantized inputs)
+        with metrics.timer('batch_router'):
+            routes = [router.route(*row) for row in zip(illuminance.tolist(), water_level.tolist(),
+                                                        temperature.tolist(), is_dark.tolist(),
+                                                        is_black_ice_danger.tolist())]
+        check_nn = np.array([decision for decision, _ in routes], dtype=bool).reshape(n)
+        router_sources = np.array([source for _, source in routes], dtype=object).reshape(n)
     else:
-        justification = "Default speed limit (80 km/h) due to no detected risks." # Fallback, should ideally be covered by previous conditions
+        # Local and advisory mode post the rule's decision; advisory's background LLM
+        # comparison is a scalar-path diagnostic and is not repeated per row here
+        check_nn = at_risk
+        router_sources = np.full(n, SOURCE_RULE, dtype=object)
+    predicted_accidents = np.full(n, np.nan)
+    routed = np.flatnonzero(check_nn)
+    if len(routed):
+        nn_model, scaler, mean_values = _get_model_components()
+        if nn_model is not None and mean_values is not None:
+            try:
+                features = _build_feature_matrix(mean_values, illuminance[routed], water_level[routed], temperature[routed])
+                with metrics.timer('batch_scaler'):
+                    features_scaled = scaler.transform(features) if scaler is not None else features
+                with metrics.timer('batch_nn_predict'):
+                    prediction = nn_model.predict(features_scaled, verbose=0)
+                predicted_accidents[routed] = np.asarray(prediction, dtype=float).reshape(-1)
+            except Exception as e:
+                metrics.count('errors', 'nn_predict')
+                print(f"Error during batched NN prediction: {e}")
+                predicted_accidents[routed] = 0.0
+        else:
+            # Same simulated behavior as the scalar path when no model is available
+            metrics.count('fallbacks', 'no_model', len(routed))
+            predicted_accidents[routed] = np.where(at_risk[routed], 1.5, 0.2)
 
-    # Ensure speed limit does not increase above 80 km/h based on AI component decision alone (NFR-8)
-    final_speed_limit = min(final_speed_limit, 80)
+    nn_high_risk = predicted_accidents > 1.0
+    codes[nn_high_risk] |= JustificationCode.NN_HIGH_RISK
+    return codes, np.where(nn_high_risk, 20, 0), predicted_accidents, router_sources
+
+
+def aqi_speed_reductions(aqi, map_values=map, return_sources: bool = False):
+    """
+    AQI step (REQ2): the agent's speed reduction per AQI value. The recommendation only
+    depends on the AQI value, so each distinct value is queried once; `map_values` runs
+    the queries (e.g. a thread pool's map to overlap them). With `return_sources`, also
+    returns where each recommendation came from ('llm', 'rule' or 'fallback').
+    """
+    reductions, sources = _aqi_speed_reductions(aqi, map_values)
+    return (reductions, sources) if return_sources else reductions
 
-    return int(final_speed_limit), justification
+
+def _recommendation_with_source(aqi: int) -> tuple[int, str]:
+    # Read in the thread that ran the query, as the source is kept per thread
+    return get_llm_speed_reduction_recommendation(aqi), last_recommendation_source()
+
+
+def _aqi_speed_reductions(aqi, map_values=map) -> tuple[np.ndarray, np.ndarray]:
+    """aqi_speed_reductions plus the source of each recommendation ('llm', 'rule' or 'fallback')."""
+    aqi = np.atleast_1d(np.asarray(aqi, dtype=int))
+    unique_aqi, inverse = np.unique(aqi, return_inverse=True)
+    answers = list(map_values(_recommendation_with_source, [int(value) for value in unique_aqi]))
+    unique_reductions = np.array([reduction for reduction, _ in answers], dtype=int)
+    unique_sources = np.array([source for _, source in answers], dtype=object)
+    inverse = inverse.reshape(-1)
+    return unique_reductions[inverse], unique_sources[inverse]
+
+
+def combine_reductions(codes, weather_reduction, aqi_reduction) -> tuple[np.ndarray, np.ndarray]:
+    """Applies the most severe reduction (NFR-8: never above 80 km/h); returns (speed limits, uint8 codes)."""
+    base_speed_limit = 80 # REQ3: Default speed limit
+    codes = np.array(codes, dtype=int)
+    codes[np.asarray(aqi_reduction) > 0] |= JustificationCode.POOR_AIR_QUALITY
+    final_speed_limits = base_speed_limit - np.maximum(np.maximum(weather_reduction, aqi_reduction), 0)
+    final_speed_limits = np.minimum(final_speed_limits, 80).astype(int)
+    return final_speed_limits, codes.astype(np.uint8)
 
 if __name__ == '__main__':
     print("Testing Decision Logic Component:")
@@ -0,0 +1,191 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from src import decision_logic
+from src.decision_logic import aqi_speed_reductions, assess_weather, audit_decisions, combine_reductions
+from src.llm_integration import get_simulated_aqi
+from src.model_registry import ModelRegistry
+from src.runtime_utils import available_cores, pin_worker
+
+# SensorTypeCodes of the sensors a segment's decision needs
+SEGMENT_SENSOR_TYPES = {'light': 'L', 'water': 'W', 'temperature': 'T'}
+MIN_SHARD_ROWS = 1024   # Smaller shards cost more in inter-process transfer than they save
+LLM_THREADS = 8         # Concurrent AQI source/agent calls
+
+
+class Segment(NamedTuple):
+    """A road segment and the SensorIDs of its light, water and temperature sensors."""
+    segment_id: int
+    light_sensor: int
+    water_sensor: int
+    temperature_sensor: int
+
+
+def segments_from_sensors(sensors: pd.DataFrame) -> list:
+    """Groups a Sensors table into segments: the k-th light, water and temperature sensors form segment k."""
+    codes = sensors['SensorTypeCode'].str.strip()
+    ids = {kind: sensors.loc[codes == code, 'SensorID'].to_numpy()
+           for kind, code in SEGMENT_SENSOR_TYPES.items()}
+    count = min(len(sensor_ids) for sensor_ids in ids.values())
+    return [Segment(k, int(ids['light'][k]), int(ids['water'][k]), int(ids['temperature'][k]))
+            for k in range(count)]
+
+
+def synthetic_sensors(segments: int) -> pd.DataFrame:
+    """A Sensors table with one light, water and temperature sensor per segment, for benchmarks."""
+    codes = np.tile(list(SEGMENT_SENSOR_TYPES.values()), segments)
+    return pd.DataFrame({'SensorID': np.arange(1, len(codes) + 1), 'SensorTypeCode': codes})
+
+
+def _init_worker(registry_options: dict, cores: list, next_worker):
+    """Pins the worker to its own core and loads the model once, before the first shard."""
+    pin_worker(cores, next_worker)
+    decision_logic.registry = ModelRegistry(**registry_options)
+    decision_logic.warm_up()
+
+
+def _simulated_aqi(hours: list) -> list:
+    return [get_simulated_aqi(hour) for hour in hours]
+
+
+def _ready() -> int:
+    return os.getpid()
+
+
+class FleetEvaluator:
+    """
+    Evaluates one snapshot for every segment of a fleet at once.
+
+    The CPU-bound weather/NN step (assess_weather) is sharded over a pool of `workers`
+    processes that each load the model once at start-up; with workers=0 it runs in the
+    calling process. Meanwhile the I/O-bound AQI source and agent calls run on a thread
+    pool, one call per distinct AQI value. The pools are kept until close().
+
+    Workers hold their own registry, so a swap in this process (registry.reload(), the
+    service's SIGHUP) does not reach them. evaluate() restarts the workers when this
+    process's registry swapped since they started; reload_models() does so explicitly,
+    e.g. when another process replaced the artifacts.
+    """
+
+    def __init__(self, segments, workers: int = None, llm_threads: int = LLM_THREADS,
+                 min_shard_rows: int = MIN_SHARD_ROWS, registry_options: dict = None):
+        self.segments = list(segments)
+        self.sensor_ids = np.array([[segment.light_sensor, segment.water_sensor, segment.temperature_sensor]
+                                    for segment in self.segments], dtype=np.int64).reshape(-1, 3)
+        self.workers = len(available_cores()) if workers is None else workers
+        self.llm_threads = llm_threads
+        self.min_shard_rows = min_shard_rows
+        if registry_options is None:
+            # Same artifacts and backend as this process's registry
+            registry = decision_logic.registry
+            registry_options = {name: getattr(registry, name) for name in (
+                'model_path', 'scaler_path', 'numpy_model_path', 'risk_table_path', 'tflite_model_path', 'backend')}
+        self.registry_options = dict(registry_options)
+        self._threads = ThreadPoolExecutor(max_workers=llm_threads, thread_name_prefix='fleet-llm')
+        self._processes = None
+        self._model_version = None
+
+    def start(self) -> 'FleetEvaluator':
+        """Starts the worker processes and waits until every one of them has loaded the model."""
+        if self.workers and self._processes is None:
+            self._model_version = decision_logic.registry.version
+            context = multiprocessing.get_context('spawn')
+            cores = available_cores()
+            self._processes = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=context, initializer=_init_worker,
+                initargs=(self.registry_options, cores, context.Value('i', 0)))
+            for future in [self._processes.submit(_ready) for _ in range(self.workers)]:
+                future.result()
+        return self
+
+    def reload_models(self) -> 'FleetEvaluator':
+        """
+        Replaces the worker processes with new ones that load the artifacts again. The new
+        workers are ready before the old ones are shut down, after their in-flight shards.
+        """
+        previous, self._processes = self._processes, None
+        self.start()
+        if previous is not None:
+            previous.shutdown(wait=True)
+        return self
+
+    def close(self):
+        self._threads.shutdown(wait=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=True)
+            self._processes = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def segment_inputs(self, readings) -> tuple:
+        """
+        Returns (illuminance, water_level, temperature) arrays in segment order from
+        `readings`, a mapping or Series of SensorID -> latest value.
+        """
+        values = pd.Series(readings, dtype=np.float64).reindex(self.sensor_ids.reshape(-1)).to_numpy()
+        if np.isnan(values).any():
+            missing = np.unique(self.sensor_ids.reshape(-1)[np.isnan(values)])
+            raise ValueError(f"No reading for {len(missing)} segment sensor(s), e.g. SensorID {missing[0]}.")
+        values = values.reshape(-1, 3)
+        return values[:, 0], values[:, 1], values[:, 2]
+
+    def _llm_chunk(self, rows: int) -> int:
+        return max(1, -(-rows // self.llm_threads))
+
+    def _shards(self, rows: int) -> list:
+        count = max(1, min(self.workers, -(-rows // self.min_shard_rows)))
+        bounds = np.linspace(0, rows, count + 1).astype(int)
+        return [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+    def evaluate(self, readings, current_hour, aqi=None) -> tuple:
+        """
+        Decides the speed limit of every segment. `current_hour` and `aqi` are scalars or
+        per-segment arrays; without `aqi` it is simulated per segment. Returns arrays of
+        speed limits and JustificationCode flags in segment order, like get_speed_limits.
+        Decisions are audited under the path 'fleet'.
+        """
+        illuminance, water_level, temperature = self.segment_inputs(readings)
+        rows = len(illuminance)
+        start = time.perf_counter()
+
+        # 1. Weather/NN step on the worker processes (or inline without workers)
+        if self.workers:
+            if self._processes is not None and decision_logic.registry.version != self._model_version:
+                self.reload_models()
+            self.start()
+            futures = [self._processes.submit(assess_weather, illuminance[shard], water_level[shard], temperature[shard],
+                                              return_details=True)
+                       for shard in self._shards(rows)]
+        else:
+            futures = None
+            weather = [assess_weather(illuminance, water_level, temperature, return_details=True)]
+
+        # 2. AQI source and agent on the thread pool while the workers compute
+        if aqi is None:
+            hours = np.broadcast_to(np.asarray(current_hour, dtype=int), (rows,)).tolist()
+            # One task per thread: a task per segment would cost more in hand-offs than the queries
+            chunk = self._llm_chunk(rows)
+            chunks = [hours[start:start + chunk] for start in range(0, rows, chunk)]
+            aqi = np.array([value for chunk in self._threads.map(_simulated_aqi, chunks) for value in chunk], dtype=int)
+        aqi = np.broadcast_to(np.asarray(aqi, dtype=int), (rows,))
+        aqi_reduction, aqi_sources = aqi_speed_reductions(aqi, self._threads.map, return_sources=True)
+
+        # 3. Most severe reduction per segment
+        if futures is not None:
+            weather = [future.result() for future in futures]
+        codes, weather_reduction, predicted_accidents, router_sources = (np.concatenate(parts) for parts in zip(*weather))
+        speed_limits, codes = combine_reductions(codes, weather_reduction, aqi_reduction)
+        audit_decisions(illuminance, water_level, temperature, np.asarray(current_hour, dtype=int), codes,
+                        router_sources, predicted_accidents, weather_reduction, aqi, aqi_reduction, aqi_sources, speed_limits,
+                        time.perf_counter() - start, 'fleet')
+        return speed_limits, codes
@@ -0,0 +1,187 @@
+import asyncio
+import inspect
+import os
+import threading
+import time
+import weakref
+from typing import Optional
+
+# google.generativeai is imported on first use; it is slow to import and
+# not needed when the system runs without an API key.
+genai = None
+
+
+def _import_genai():
+    global genai
+    if genai is None:
+        import google.generativeai
+        genai = google.generativeai
+    return genai
+
+MODEL_NAME = 'gemini-2.5-flash'
+
+
+def env_number(name: str, default, cast=float):
+    """Reads a numeric environment variable, warning and using `default` if it is malformed."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        print(f"Warning: Ignoring invalid {name}={value!r}, using {default}")
+        return default
+
+
+# Defaults, overridable through the environment
+DEFAULT_MAX_CONCURRENCY = env_number("SPEEDLIMIT_LLM_MAX_CONCURRENCY", 8, int)
+DEFAULT_RATE_PER_SECOND = env_number("SPEEDLIMIT_LLM_RATE_PER_SECOND", 10.0)
+DEFAULT_TIMEOUT = env_number("SPEEDLIMIT_LLM_TIMEOUT", 10.0)
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter shared by threads and event loops.
+    `rate` tokens are added per second up to `capacity`; a rate of 0 disables limiting.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _take(self) -> float:
+        """Takes one token if available and returns 0, otherwise returns the seconds to wait."""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        while (wait := self._take()) > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        while (wait := self._take()) > 0:
+            await asyncio.sleep(wait)
+
+
+class GeminiClient:
+    """
+    One shared connection to the Gemini API.
+
+    `genai.configure` and the `GenerativeModel` are created once, on first use.
+    Async calls are capped at `max_concurrency` in-flight requests per event loop,
+    all calls go through one token bucket, and every request is given up after `timeout`
+    seconds (the SDK's request timeout), raising so callers fall back to rules.
+    """
+
+    def __init__(self, api_key: str, model_name: str = MODEL_NAME, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 rate_per_second: float = DEFAULT_RATE_PER_SECOND, timeout: float = DEFAULT_TIMEOUT, model=None):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.rate_limiter = TokenBucket(rate_per_second)
+        self._model = model
+        self._model_lock = threading.Lock()
+        self._sync_slots = threading.BoundedSemaphore(max_concurrency)
+        self._loop_slots = weakref.WeakKeyDictionary()  # event loop -> asyncio.Semaphore
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    sdk = _import_genai()
+                    sdk.configure(api_key=self.api_key)
+                    self._model = sdk.GenerativeModel(self.model_name)
+        return self._model
+
+    def _async_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        slots = self._loop_slots.get(loop)
+        if slots is None:
+            slots = self._loop_slots[loop] = asyncio.Semaphore(self.max_concurrency)
+        return slots
+
+    def generate(self, prompt: str) -> str:
+        """Sends a prompt and blocks until the response text is available, at most `timeout` seconds."""
+        model = self.model
+        self.rate_limiter.acquire()
+        with self._sync_slots:
+            return model.generate_content(prompt, request_options={'timeout': self.timeout}).text
+
+    async def generate_async(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """
+        Sends a prompt without blocking the event loop.
+        Raises asyncio.TimeoutError if no response arrives within `timeout` seconds.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        model = self.model
+        slots = self._async_slots()
+        await slots.acquire()
+        release = True
+        try:
+            await self.rate_limiter.acquire_async()
+            options = {'timeout': timeout}
+            if inspect.iscoroutinefunction(getattr(model, 'generate_content_async', None)):
+                response = await asyncio.wait_for(model.generate_content_async(prompt, request_options=options),
+                                                  timeout)
+            else:
+                request = asyncio.ensure_future(asyncio.to_thread(model.generate_content, prompt,
+                                                                  request_options=options))
+                try:
+                    response = await asyncio.wait_for(asyncio.shield(request), timeout)
+                except (asyncio.TimeoutError, asyncio.CancelledError):
+                    # A thread cannot be cancelled: its slot is only freed once the request returns
+                    release = False
+                    request.add_done_callback(lambda done: _release_slot(done, slots))
+                    raise
+        finally:
+            if release:
+                slots.release()
+        return response.text
+
+
+def _release_slot(request: asyncio.Future, slots: asyncio.Semaphore):
+    if not request.cancelled():
+        request.exception()  # retrieved here, so an abandoned request's error is not reported as unhandled
+    slots.release()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> Optional[GeminiClient]:
+    """Returns the shared client, creating it lazily. Returns None if GEMINI_API_KEY is not set."""
+    global _client
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        return None
+    with _client_lock:
+        if _client is None:
+            _client = GeminiClient(api_key)
+        return _client
+
+
+def set_client(client: Optional[GeminiClient]):
+    """Installs a preconfigured client (e.g. with custom limits or a stub model)."""
+    global _client
+    with _client_lock:
+        _client = client
+
+
+def reset_client():
+    """Drops the shared client so the next call creates a fresh one."""
+    set_client(None)
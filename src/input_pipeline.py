@@ -0,0 +1,164 @@
+import resource
+import time
+
+import numpy as np
+import tensorflow as tf
+from sklearn.preprocessing import StandardScaler
+
+from src.data_preprocessing import iter_processed_data, processed_data_path, FEATURE_COLUMNS, TARGET_COLUMN
+
+# Chronological split: the oldest hours train, the next ones validate, the most recent ones test
+VALIDATION_FRACTION = 0.1
+TEST_FRACTION = 0.2
+CHUNK_ROWS = 65536          # Rows read from the processed store at a time
+SHUFFLE_BUFFER = 10000      # Rows shuffled together, within the training period only
+CACHE_IN_MEMORY = ''        # tf.data cache() argument: '' keeps the scaled splits in memory
+
+
+def chronological_bounds(path: str = None, validation_fraction: float = VALIDATION_FRACTION,
+                         test_fraction: float = TEST_FRACTION, chunk_rows: int = CHUNK_ROWS):
+    """
+    Returns (validation_start, test_start, rows per split); rows before validation_start train.
+    Only the datetime index is collected, never the feature columns.
+    """
+    times = np.sort(np.concatenate([chunk.index.to_numpy()
+                                    for chunk in iter_processed_data(path, [TARGET_COLUMN], chunk_rows)]))
+    if len(times) < 3:
+        raise ValueError("At least three processed hours are needed for a train/validation/test split.")
+    test_row = min(max(int(len(times) * (1 - test_fraction)), 2), len(times) - 1)
+    validation_row = min(max(int(len(times) * (1 - test_fraction - validation_fraction)), 1), test_row - 1)
+    rows = {'train': validation_row, 'validation': test_row - validation_row, 'test': len(times) - test_row}
+    return times[validation_row], times[test_row], rows
+
+
+def _split_bounds(validation_start, test_start) -> dict:
+    """(start, stop) datetime bounds of each split; None leaves a side open."""
+    return {'train': (None, validation_start), 'validation': (validation_start, test_start),
+            'test': (test_start, None)}
+
+
+def _split_chunks(path: str, start=None, stop=None, chunk_rows: int = CHUNK_ROWS):
+    """Yields (features, target) float32 arrays of the rows with start <= datetime < stop."""
+    for chunk in iter_processed_data(path, FEATURE_COLUMNS + [TARGET_COLUMN], chunk_rows):
+        times = chunk.index.to_numpy()
+        in_split = np.ones(len(chunk), dtype=bool)
+        if start is not None:
+            in_split &= times >= start
+        if stop is not None:
+            in_split &= times < stop
+        if in_split.any():
+            rows = chunk[in_split]
+            yield (rows[FEATURE_COLUMNS].to_numpy(dtype=np.float32), rows[TARGET_COLUMN].to_numpy(dtype=np.float32))
+
+
+def _load_arrays(path: str, start=None, stop=None, chunk_rows: int = CHUNK_ROWS):
+    """Concatenates the (features, target) chunks of the rows with start <= datetime < stop."""
+    chunks = list(_split_chunks(path, start, stop, chunk_rows))
+    return np.concatenate([features for features, _ in chunks]), np.concatenate([target for _, target in chunks])
+
+
+def load_split(path: str = None, split: str = 'test', chunk_rows: int = CHUNK_ROWS):
+    """Returns the unscaled (features, target) float32 arrays of one chronological split."""
+    path = processed_data_path(path)
+    validation_start, test_start, _ = chronological_bounds(path, chunk_rows=chunk_rows)
+    start, stop = _split_bounds(validation_start, test_start)[split]
+    return _load_arrays(path, start, stop, chunk_rows)
+
+
+def load_scaled_splits(path: str = None, chunk_rows: int = CHUNK_ROWS):
+    """
+    Returns ({'train', 'validation', 'test'}: (features, target) float32 arrays, scaler) for
+    in-memory training: the chronological splits, scaled by a scaler fitted on the training rows.
+    """
+    path = processed_data_path(path)
+    validation_start, test_start, _ = chronological_bounds(path, chunk_rows=chunk_rows)
+    scaler = fit_scaler(path, validation_start, chunk_rows)
+    splits = {}
+    for split, (start, stop) in _split_bounds(validation_start, test_start).items():
+        features, target = _load_arrays(path, start, stop, chunk_rows)
+        splits[split] = (scaler.transform(features).astype(np.float32), target)
+    return splits, scaler
+
+
+def fit_scaler(path: str, stop, chunk_rows: int = CHUNK_ROWS) -> StandardScaler:
+    """Fits a StandardScaler on the training period in one streaming pass (partial_fit per chunk)."""
+    scaler = StandardScaler()
+    for features, _ in _split_chunks(path, stop=stop, chunk_rows=chunk_rows):
+        scaler.partial_fit(features)
+    return scaler
+
+
+def make_dataset(path: str, scaler: StandardScaler, start=None, stop=None, batch_size: int = 32,
+                 shuffle: bool = False, cache=None, parallel_calls=tf.data.AUTOTUNE, threads: int = None,
+                 chunk_rows: int = CHUNK_ROWS, rows: int = None, seed: int = 42) -> tf.data.Dataset:
+    """
+    Streams one chronological split from the processed store as scaled (features, target) batches.
+
+    Chunks are scaled with the scaler's mean/scale inside the pipeline (`parallel_calls` maps in
+    flight), optionally cached (None: off, '': memory, otherwise a cache file prefix), shuffled
+    within `SHUFFLE_BUFFER` rows for training, batched and prefetched. `threads` sizes a private
+    thread pool for this dataset. Passing the split's `rows` declares its length to Keras.
+    """
+    signature = (tf.TensorSpec(shape=(None, len(FEATURE_COLUMNS)), dtype=tf.float32),
+                 tf.TensorSpec(shape=(None,), dtype=tf.float32))
+    dataset = tf.data.Dataset.from_generator(lambda: _split_chunks(path, start, stop, chunk_rows),
+                                             output_signature=signature)
+    mean = tf.constant(scaler.mean_, dtype=tf.float32)
+    scale = tf.constant(scaler.scale_, dtype=tf.float32)
+    dataset = dataset.map(lambda features, target: ((features - mean) / scale, target),
+                          num_parallel_calls=parallel_calls)
+    if cache is not None:
+        dataset = dataset.cache(cache)
+    dataset = dataset.unbatch()
+    if shuffle:
+        dataset = dataset.shuffle(SHUFFLE_BUFFER, seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size)
+    if rows is not None:
+        dataset = dataset.apply(tf.data.experimental.assert_cardinality(-(-rows // batch_size)))
+    dataset = dataset.prefetch(tf.data.AUTOTUNE)
+    if threads:
+        options = tf.data.Options()
+        options.threading.private_threadpool_size = threads
+        dataset = dataset.with_options(options)
+    return dataset
+
+
+def build_datasets(path: str = None, batch_size: int = 32, cache=CACHE_IN_MEMORY, parallel_calls=tf.data.AUTOTUNE,
+                   threads: int = None, chunk_rows: int = CHUNK_ROWS):
+    """
+    Returns ({'train', 'validation', 'test'} datasets, scaler fitted on the training rows, rows per split).
+    With a file `cache`, each split caches to '<cache>_<split>'. The test split is read once
+    and never cached.
+    """
+    path = processed_data_path(path)
+    validation_start, test_start, rows = chronological_bounds(path, chunk_rows=chunk_rows)
+    scaler = fit_scaler(path, validation_start, chunk_rows)
+    datasets = {}
+    for split, (start, stop) in _split_bounds(validation_start, test_start).items():
+        split_cache = cache if cache in (None, CACHE_IN_MEMORY) else f'{cache}_{split}'
+        datasets[split] = make_dataset(path, scaler, start, stop, batch_size, shuffle=split == 'train',
+                                       cache=None if split == 'test' else split_cache,
+                                       parallel_calls=parallel_calls, threads=threads, chunk_rows=chunk_rows,
+                                       rows=rows[split])
+    return datasets, scaler, rows
+
+
+class ThroughputCallback(tf.keras.callbacks.Callback):
+    """Records training rows per second for every epoch."""
+
+    def __init__(self, rows: int):
+        super().__init__()
+        self.rows = rows
+        self.rows_per_second = []
+        self._start = None
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.rows_per_second.append(self.rows / (time.perf_counter() - self._start))
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (Linux reports ru_maxrss in KiB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
@@ -1,7 +1,28 @@
 
-import random
+import asyncio
 import os
-import google.generativeai as genai
+import random
+import threading
+
+from src.aqi_cache import AQIRecommendationCache
+from src.gemini_client import get_client, env_number
+from src.metrics import metrics
+
+# Recommendations are memoized per AQI value (or band) so a district-wide reading
+# shared by many segments only reaches the agent once per TTL.
+recommendation_cache = AQIRecommendationCache(
+    key_mode=os.getenv("SPEEDLIMIT_AQI_CACHE_KEY", "value"),
+    ttl=env_number("SPEEDLIMIT_AQI_CACHE_TTL", 600.0),
+    maxsize=env_number("SPEEDLIMIT_AQI_CACHE_SIZE", 256, int),
+    persist_path=os.getenv("SPEEDLIMIT_AQI_CACHE_PATH"),
+)
+
+# Where a recommendation came from: the agent (possibly cached), the rules without an
+# API key, or the rules after the agent failed. Kept per thread, see last_recommendation_source
+SOURCE_LLM = 'llm'
+SOURCE_RULE = 'rule'
+SOURCE_FALLBACK = 'fallback'
+_last_source = threading.local()
 
 # --- SIMULATION (DATA SOURCE) ---
 def get_simulated_aqi(hour_of_day: int) -> int:
@@ -20,62 +41,107 @@ def get_simulated_aqi(hour_of_day: int) -> int:
 # --- HARDCODED LOGIC (FALLBACK) ---
 def _fallback_rule_based_logic(aqi: int) -> int:
     """Fallback logic if the AI Agent is unavailable."""
+    metrics.count('fallbacks', 'aqi_rule')
     if aqi > 150: return 30
     elif aqi > 100: return 20
     elif aqi > 50: return 10
     return 0
 
 # --- AI AGENT INTERACTION ---
+# Defines the Agent's Persona and Task via Prompt Engineering
+AQI_PROMPT = """
+You are an AI Traffic Safety Agent responsible for public health.
+
+Context:
+- The current Air Quality Index (AQI) is {aqi}.
+- The base speed limit is 80 km/h.
+- High speeds stir up dust and pollutants, worsening local air quality.
+
+Task:
+Determine the necessary speed limit reduction (in km/h) to mitigate health risks.
+
+Guidelines:
+- If AQI < 50 (Good), reduction is 0.
+- If AQI is Moderate (50-100), consider a small reduction (e.g., 10).
+- If AQI is Unhealthy (100-150), consider a moderate reduction (e.g., 20).
+- If AQI is Hazardous (>150), consider a significant reduction (e.g., 30).
+
+Output:
+Return ONLY the integer number of the reduction (e.g., 10). Do not write any other text.
+"""
+
+def _parse_reduction(text: str) -> int:
+    reduction_val = int(text.strip())
+    print(f"(LLM: AQI reduction decision -> -{reduction_val} km/h)")
+    return reduction_val
+
+def last_recommendation_source() -> str:
+    """Source ('llm', 'rule' or 'fallback') of this thread's latest recommendation, None before the first."""
+    return getattr(_last_source, 'value', None)
+
 def get_llm_speed_reduction_recommendation(aqi: int) -> int:
     """
-    The 'Agent' function. It attempts to consult a real LLM.
+    The 'Agent' function. It attempts to consult a real LLM through the shared Gemini client,
+    reusing cached recommendations for the same AQI.
     If no API key is found or the API fails, it falls back to rules.
     """
-    api_key = os.getenv("GEMINI_API_KEY")
-    
-    if not api_key:
+    client = get_client()
+    if client is None:
+        _last_source.value = SOURCE_RULE
         return _fallback_rule_based_logic(aqi)
 
     try:
-        # 1. Configure the Agent
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.5-flash')
-
-        # 2. Define the Agent's Persona and Task via Prompt Engineering
-        prompt = f"""
-        You are an AI Traffic Safety Agent responsible for public health.
-        
-        Context:
-        - The current Air Quality Index (AQI) is {aqi}.
-        - The base speed limit is 80 km/h.
-        - High speeds stir up dust and pollutants, worsening local air quality.
-        
-        Task:
-        Determine the necessary speed limit reduction (in km/h) to mitigate health risks.
-        
-        Guidelines:
-        - If AQI < 50 (Good), reduction is 0.
-        - If AQI is Moderate (50-100), consider a small reduction (e.g., 10).
-        - If AQI is Unhealthy (100-150), consider a moderate reduction (e.g., 20).
-        - If AQI is Hazardous (>150), consider a significant reduction (e.g., 30).
-        
-        Output:
-        Return ONLY the integer number of the reduction (e.g., 10). Do not write any other text.
-        """
-
-        # 3. Get the decision
-        response = model.generate_content(prompt)
-        
-        # 4. Parse the result
-        reduction_str = response.text.strip()
-        reduction_val = int(reduction_str)
-        print(f"(LLM: AQI reduction decision -> -{reduction_val} km/h)")
-        return reduction_val
+        with metrics.timer('aqi_agent'):
+            reduction = recommendation_cache.get_or_compute(
+                aqi, lambda: _parse_reduction(client.generate(AQI_PROMPT.format(aqi=aqi))))
+        _last_source.value = SOURCE_LLM
+        return reduction
 
     except Exception as e:
+        metrics.count('errors', 'aqi_agent')
         print(f"AI Agent Error (using fallback): {e}")
+        _last_source.value = SOURCE_FALLBACK
         return _fallback_rule_based_logic(aqi)
 
+async def async_get_llm_speed_reduction_recommendation(aqi: int, timeout: float = None) -> int:
+    """
+    Async variant of get_llm_speed_reduction_recommendation.
+    Falls back to rules on errors or if the agent does not answer within `timeout` seconds.
+    """
+    client = get_client()
+    if client is None:
+        _last_source.value = SOURCE_RULE
+        return _fallback_rule_based_logic(aqi)
+
+    async def query_agent():
+        return _parse_reduction(await client.generate_async(AQI_PROMPT.format(aqi=aqi), timeout=timeout))
+
+    try:
+        with metrics.timer('aqi_agent'):
+            reduction = await recommendation_cache.get_or_compute_async(aqi, query_agent)
+        _last_source.value = SOURCE_LLM
+        return reduction
+
+    except asyncio.TimeoutError:
+        metrics.count('errors', 'aqi_agent_timeout')
+        print(f"AI Agent timed out for AQI {aqi} (using fallback)")
+        _last_source.value = SOURCE_FALLBACK
+        return _fallback_rule_based_logic(aqi)
+    except Exception as e:
+        metrics.count('errors', 'aqi_agent')
+        print(f"AI Agent Error (using fallback): {e}")
+        _last_source.value = SOURCE_FALLBACK
+        return _fallback_rule_based_logic(aqi)
+
+async def async_get_llm_speed_reduction_recommendations(aqi_values, timeout: float = None) -> list[int]:
+    """
+    Queries the agent for many segments concurrently through the shared client.
+    Concurrency and request rate are bounded by the client's limits.
+    """
+    return await asyncio.gather(*(
+        async_get_llm_speed_reduction_recommendation(int(aqi), timeout=timeout) for aqi in aqi_values
+    ))
+
 if __name__ == '__main__':
     print("Simulating LLM Integration Component:")
     # Test cases...
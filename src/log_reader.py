@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+YEAR = 2023
+YEAR_START = pd.Timestamp(year=YEAR, month=1, day=1)
+# Hour-of-year slots of a (leap) year, plus one for the hour-24 rollover of December 31st
+HOURS_IN_YEAR = 366 * 24 + 1
+# Day of year (0-based) on which each month starts, indexed by month number
+_MONTH_START_DAY = np.concatenate(([0], np.cumsum([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])))
+
+# Compact schemas of the V100 logs (';' separated, ',' as decimal point)
+SENSOR_READINGS_DTYPES = {
+    'Month': np.uint8, 'Day': np.uint8, 'Hour': np.uint8, 'Minute': np.uint8, 'Second': np.uint8,
+    'Sensor': np.int16,  # -1 marks readings without a sensor
+    'Value': np.float32,
+}
+ACCIDENTS_DTYPES = {
+    'Month': np.uint8, 'Day': np.uint8, 'Hour': np.uint8, 'Second': np.uint8,  # Hour can be 24
+    'Damage': np.float32, 'Injured': np.float32,
+    'CloseCarCm': np.float32, 'CloseGuardrailCm': np.float32, 'SkidAngle': np.float32,
+}
+
+ENGINE_PANDAS = 'pandas'    # pandas' C parser
+ENGINE_PYARROW = 'pyarrow'  # pyarrow.csv, multi-threaded
+ENGINE_AUTO = 'auto'        # pyarrow if installed, otherwise pandas
+ENGINES = (ENGINE_PANDAS, ENGINE_PYARROW, ENGINE_AUTO)
+
+# Average bytes per reading line, used to turn a row chunksize into a pyarrow block size
+_BYTES_PER_ROW = 24
+
+
+def _pyarrow_csv():
+    try:
+        from pyarrow import csv
+    except ImportError:
+        return None
+    return csv
+
+
+def _resolve_engine(engine: str) -> str:
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown CSV engine '{engine}', expected one of {ENGINES}")
+    if engine == ENGINE_AUTO:
+        return ENGINE_PYARROW if _pyarrow_csv() is not None else ENGINE_PANDAS
+    if engine == ENGINE_PYARROW and _pyarrow_csv() is None:
+        raise ImportError("The pyarrow CSV engine requires pyarrow.")
+    return engine
+
+
+def _read(source, dtypes: dict, engine: str, chunksize: int = None):
+    """Reads a V100 log with the given column dtypes; with `chunksize`, returns an iterator of DataFrames."""
+    engine = _resolve_engine(engine)
+    if engine == ENGINE_PANDAS:
+        return pd.read_csv(source, sep=';', decimal=',', dtype=dtypes, chunksize=chunksize)
+
+    import pyarrow as pa
+    csv = _pyarrow_csv()
+    parse_options = csv.ParseOptions(delimiter=';')
+    convert_options = csv.ConvertOptions(
+        column_types={column: pa.from_numpy_dtype(np.dtype(dtype)) for column, dtype in dtypes.items()},
+        decimal_point=',')
+    if chunksize is None:
+        return csv.read_csv(source, parse_options=parse_options, convert_options=convert_options).to_pandas()
+    # pyarrow streams fixed-size byte blocks, so chunks hold about `chunksize` rows
+    read_options = csv.ReadOptions(block_size=max(chunksize * _BYTES_PER_ROW, 1 << 16))
+    reader = csv.open_csv(source, read_options=read_options, parse_options=parse_options,
+                          convert_options=convert_options)
+    return (batch.to_pandas() for batch in reader)
+
+
+def read_sensor_readings(source, engine: str = ENGINE_AUTO, chunksize: int = None, value_dtype=np.float32):
+    """
+    Reads a SensorReadings log (path or binary file object) with narrow dtypes:
+    uint8 for the date parts, int16 for Sensor and `value_dtype` for Value (about 11 bytes per
+    row instead of 56). Pass value_dtype=np.float64 where results must match a float64 parse.
+    """
+    return _read(source, dict(SENSOR_READINGS_DTYPES, Value=value_dtype), engine, chunksize)
+
+
+def read_accidents(source, engine: str = ENGINE_AUTO, chunksize: int = None):
+    """Reads an Accidents log with narrow dtypes (uint8 date parts, float32 measurements); see read_sensor_readings."""
+    return _read(source, ACCIDENTS_DTYPES, engine, chunksize)
+
+
+def seconds_since_year_start(month, day, hour, minute, second) -> np.ndarray:
+    """Computes timestamps arithmetically; out-of-range hours roll over like pd.to_datetime assembly."""
+    day_of_year = _MONTH_START_DAY[np.asarray(month)] + np.asarray(day) - 1
+    return (day_of_year.astype(np.int64) * 86400 + np.asarray(hour, dtype=np.int64) * 3600
+            + np.asarray(minute, dtype=np.int64) * 60 + np.asarray(second, dtype=np.int64))
+
+
+def to_datetime(seconds) -> pd.DatetimeIndex:
+    """Seconds since the start of YEAR as datetime64[ns], without parsing or assembling columns."""
+    return pd.DatetimeIndex(np.datetime64(YEAR_START, 'ns') + np.asarray(seconds).astype('timedelta64[s]'))
+
+
+def reading_times(readings: pd.DataFrame) -> pd.DatetimeIndex:
+    """Timestamps of SensorReadings rows, equal to pd.to_datetime(readings[[Month..Second]].assign(Year=YEAR))."""
+    return to_datetime(seconds_since_year_start(readings['Month'], readings['Day'], readings['Hour'],
+                                                readings['Minute'], readings['Second']))
+
+
+def accident_times(accidents: pd.DataFrame) -> pd.DatetimeIndex:
+    """Timestamps of Accidents rows (the log has no Minute column)."""
+    return to_datetime(seconds_since_year_start(accidents['Month'], accidents['Day'], accidents['Hour'], 0,
+                                                accidents['Second']))
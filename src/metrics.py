@@ -0,0 +1,219 @@
+import bisect
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram bucket upper bounds in seconds, 1 µs to 10 s (1-2.5-5 steps)
+LATENCY_BUCKETS = tuple(step * 10.0 ** exponent for exponent in range(-6, 1) for step in (1, 2.5, 5)) + (10.0,)
+METRICS_PORT = 9108
+PROMETHEUS_PREFIX = 'speedlimit'
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram (Prometheus style) with count, sum and max."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot: above the largest bucket
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += seconds
+            if seconds > self._max:
+                self._max = seconds
+
+    def _quantile(self, counts, count, q) -> float:
+        """Upper bound of the bucket holding the q-quantile (the largest value for the overflow bucket)."""
+        rank, seen = q * count, 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return self._max
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts, total, largest = list(self._counts), self._sum, self._max
+        count = sum(counts)
+        return {
+            'count': count,
+            'sum_seconds': total,
+            'mean_us': total / count * 1e6 if count else 0.0,
+            'p50_us': self._quantile(counts, count, 0.5) * 1e6 if count else 0.0,
+            'p99_us': self._quantile(counts, count, 0.99) * 1e6 if count else 0.0,
+            'max_us': largest * 1e6,
+            'buckets': dict(zip([str(bound) for bound in self.buckets] + ['+Inf'], counts)),
+        }
+
+
+class _StageTimer:
+    __slots__ = ('_histogram', '_start')
+
+    def __init__(self, histogram: Histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._histogram.observe(time.perf_counter() - self._start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """
+    Per-stage latency histograms and event counters for the decision path.
+
+    `timer(stage)` is a context manager that records the stage's wall time; `count(name, kind)`
+    increments a counter such as ('fallbacks', 'aqi_rule') or ('errors', 'nn_predict').
+    Collectors registered with `register_collector` (e.g. router.stats) are polled on export.
+    A disabled instance turns every call into a no-op.
+    """
+
+    def __init__(self, enabled: bool = True, buckets=LATENCY_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._histograms = {}
+        self._counters = {}
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    def _histogram(self, stage: str) -> Histogram:
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(stage, Histogram(self.buckets))
+        return histogram
+
+    def timer(self, stage: str):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _StageTimer(self._histogram(stage))
+
+    def observe(self, stage: str, seconds: float):
+        if self.enabled:
+            self._histogram(stage).observe(seconds)
+
+    def count(self, name: str, kind: str = '', amount: int = 1):
+        if self.enabled:
+            with self._lock:
+                self._counters[(name, kind)] = self._counters.get((name, kind), 0) + amount
+
+    def register_collector(self, name: str, collect):
+        """Adds a callable returning a dict of numbers, exported as gauges under `name`."""
+        with self._lock:
+            self._collectors[name] = collect
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def _collect(self) -> dict:
+        collected = {}
+        for name, collect in list(self._collectors.items()):
+            try:
+                values = collect()
+            except Exception as e:
+                print(f"Warning: Metrics collector '{name}' failed: {e}")
+                continue
+            collected[name] = {key: value for key, value in values.items()
+                               if isinstance(value, (int, float)) and not isinstance(value, bool)}
+        return collected
+
+    def snapshot(self) -> dict:
+        """Returns {'stages': {stage: histogram summary}, 'counters': {name: {kind: n}}, 'collectors': {...}}."""
+        with self._lock:
+            histograms = dict(self._histograms)
+            counters = dict(self._counters)
+        grouped = {}
+        for (name, kind), value in sorted(counters.items()):
+            grouped.setdefault(name, {})[kind] = value
+        return {
+            'stages': {stage: histogram.snapshot() for stage, histogram in sorted(histograms.items())},
+            'counters': grouped,
+            'collectors': self._collect(),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix: str = PROMETHEUS_PREFIX) -> str:
+        """Renders the snapshot in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = [f'# HELP {prefix}_stage_seconds Wall time of each decision stage.',
+                 f'# TYPE {prefix}_stage_seconds histogram']
+        for stage, summary in snapshot['stages'].items():
+            cumulative = 0
+            for bound, bucket_count in summary['buckets'].items():
+                cumulative += bucket_count
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {summary["sum_seconds"]}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {summary["count"]}')
+        for name, kinds in snapshot['counters'].items():
+            lines.append(f'# TYPE {prefix}_{name}_total counter')
+            for kind, value in kinds.items():
+                labels = f'{{kind="{kind}"}}' if kind else ''
+                lines.append(f'{prefix}_{name}_total{labels} {value}')
+        for name, values in snapshot['collectors'].items():
+            for key, value in values.items():
+                lines.append(f'# TYPE {prefix}_{name}_{key} gauge')
+                lines.append(f'{prefix}_{name}_{key} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics(enabled=os.getenv("SPEEDLIMIT_METRICS", "1") != "0")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    metrics = metrics
+
+    def do_GET(self):
+        if self.path in ('/metrics', '/'):
+            body, content_type = self.metrics.to_prometheus().encode(), 'text/plain; version=0.0.4'
+        elif self.path == '/metrics.json':
+            body, content_type = self.metrics.to_json().encode(), 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes are not worth a log line each
+
+
+def serve_metrics(host: str = '127.0.0.1', port: int = METRICS_PORT, source: Metrics = None) -> ThreadingHTTPServer:
+    """
+    Serves /metrics (Prometheus text) and /metrics.json from a daemon thread.
+    Returns the server; call shutdown() to stop it. Port 0 picks a free port (see server_address).
+    """
+    handler = type('MetricsHandler', (_MetricsHandler,), {'metrics': source or metrics})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-exporter', daemon=True).start()
+    return server
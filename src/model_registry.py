@@ -0,0 +1,192 @@
+import os
+import threading
+from typing import NamedTuple
+
+from src.metrics import metrics
+
+# Default artifact locations written by src/nn_training.py
+MODEL_PATH = 'models/nn_model.keras'
+SCALER_PATH = 'models/scaler.pkl'
+NUMPY_MODEL_PATH = 'models/nn_model.npz'
+RISK_TABLE_PATH = 'models/risk_table.npy'
+TFLITE_MODEL_PATH = 'models/nn_model.tflite'
+
+# Inference backends
+BACKEND_KERAS = 'keras'  # TensorFlow model + joblib scaler
+BACKEND_NUMPY = 'numpy'  # Pure NumPy forward pass with the scaler folded in (src/numpy_inference.py)
+BACKEND_TABLE = 'table'  # Memory-mapped risk lookup table with trilinear interpolation (src/risk_table.py)
+BACKEND_TFLITE = 'tflite'  # Quantized TFLite model + scaler stats (src/quantized_model.py)
+BACKEND_AUTO = 'auto'    # NumPy if its artifact exists, otherwise Keras
+BACKENDS = (BACKEND_KERAS, BACKEND_NUMPY, BACKEND_TABLE, BACKEND_TFLITE, BACKEND_AUTO)
+
+
+class ModelComponents(NamedTuple):
+    """
+    The inference artifacts used by the decision logic.
+    `scaler` is None when the model takes unscaled features (NumPy, table and TFLite backends).
+    """
+    model: object = None
+    scaler: object = None
+    # scaler.mean_ corresponds to features:
+    # ['humidity', 'light', 'noise', 'temperature', 'traffic', 'wind direction', 'wind strength', 'water']
+    mean_values: object = None
+
+
+class ModelRegistry:
+    """
+    Loads the NN model and scaler lazily, once, on first use.
+
+    TensorFlow and joblib are only imported when the artifacts are actually needed, so
+    processes that stay on the rule-based path never pay for them. Access is thread-safe;
+    `warm_up()` loads everything eagerly and runs one prediction to build the graph.
+    `version` counts swaps and resets, so holders of copies (fleet workers) can tell
+    that the served components changed.
+    """
+
+    def __init__(self, model_path: str = MODEL_PATH, scaler_path: str = SCALER_PATH,
+                 numpy_model_path: str = NUMPY_MODEL_PATH, risk_table_path: str = RISK_TABLE_PATH,
+                 tflite_model_path: str = TFLITE_MODEL_PATH, backend: str = BACKEND_AUTO):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown inference backend '{backend}', expected one of {BACKENDS}")
+        self.model_path = model_path
+        self.scaler_path = scaler_path
+        self.numpy_model_path = numpy_model_path
+        self.risk_table_path = risk_table_path
+        self.tflite_model_path = tflite_model_path
+        self.backend = backend
+        self._components = None
+        self._lock = threading.Lock()
+        self.version = 0
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._components is not None
+
+    def get(self) -> ModelComponents:
+        """Returns the loaded components, loading them on first call."""
+        components = self._components
+        if components is None:
+            with self._lock:
+                if self._components is None:
+                    with metrics.timer('model_load'):
+                        self._components = self._load()
+                components = self._components
+        return components
+
+    def warm_up(self) -> ModelComponents:
+        """Loads the artifacts and runs a single prediction so the first real call is fast."""
+        components = self.get()
+        _predict_once(components)
+        return components
+
+    def reset(self):
+        """Forgets the loaded components; the next get() reloads them from disk."""
+        with self._lock:
+            self._components = None
+            self.version += 1
+
+    def reload(self) -> bool:
+        """
+        Loads the artifacts from disk again, warms them up and swaps them in, without
+        restarting. get() never waits for this: callers already holding the old components
+        finish on them. A failed load keeps the current components. Returns True if swapped.
+        """
+        with metrics.timer('model_load'):
+            components = self._load()
+        if components.model is None:
+            print("Warning: Reloaded model is not available, keeping the current one.")
+            return False
+        _predict_once(components)
+        self.swap(components)
+        return True
+
+    def swap(self, components: ModelComponents):
+        """Replaces the served components; a single reference assignment, so readers see the old or the new set."""
+        with self._lock:
+            self._components = components
+            self.version += 1
+        metrics.count('model_swaps')
+
+    def _load(self) -> ModelComponents:
+        if self.backend == BACKEND_TABLE:
+            return self._load_table()
+        if self.backend == BACKEND_TFLITE:
+            return self._load_tflite()
+        if self.backend == BACKEND_NUMPY or (
+                self.backend == BACKEND_AUTO and os.path.exists(self.numpy_model_path)):
+            return self._load_numpy()
+        return self._load_keras()
+
+    def _load_numpy(self) -> ModelComponents:
+        from src.numpy_inference import NumpyMLP
+        try:
+            engine = NumpyMLP.load(self.numpy_model_path)
+        except Exception as e:
+            metrics.count('errors', 'model_load')
+            print(f"Error loading NumPy model from {self.numpy_model_path}: {e}")
+            return ModelComponents()
+        return ModelComponents(engine, None, engine.mean_values)
+
+    def _load_table(self) -> ModelComponents:
+        from src.risk_table import RiskTable
+        try:
+            table = RiskTable.load(self.risk_table_path)
+        except Exception as e:
+            metrics.count('errors', 'model_load')
+            print(f"Error loading risk table from {self.risk_table_path}: {e}")
+            return ModelComponents()
+        return ModelComponents(table, None, table.mean_values)
+
+    def _load_tflite(self) -> ModelComponents:
+        from src.quantized_model import QuantizedModel
+        try:
+            engine = QuantizedModel.load(self.tflite_model_path)
+        except Exception as e:
+            metrics.count('errors', 'model_load')
+            print(f"Error loading quantized model from {self.tflite_model_path}: {e}")
+            return ModelComponents()
+        return ModelComponents(engine, None, engine.mean_values)
+
+    def _load_keras(self) -> ModelComponents:
+        nn_model = None
+        scaler = None
+        mean_values = None
+        try:
+            if os.path.exists(self.scaler_path):
+                import joblib
+                scaler = joblib.load(self.scaler_path)
+                mean_values = scaler.mean_
+            else:
+                print(f"Warning: Scaler file not found at {self.scaler_path}")
+
+            if os.path.exists(self.model_path):
+                try:
+                    from tensorflow.keras.models import load_model
+                except ImportError:
+                    print("Warning: TensorFlow not installed. NN features will be disabled.")
+                else:
+                    nn_model = load_model(self.model_path)
+            else:
+                print(f"Warning: Model file not found at {self.model_path}")
+
+        except Exception as e:
+            metrics.count('errors', 'model_load')
+            print(f"Error loading model or scaler: {e}")
+
+        return ModelComponents(nn_model, scaler, mean_values)
+
+
+def _predict_once(components: ModelComponents):
+    if components.model is not None and components.mean_values is not None:
+        features = components.mean_values.reshape(1, -1)
+        if components.scaler is not None:
+            features = components.scaler.transform(features)
+        components.model.predict(features, verbose=0)
+
+
+registry = ModelRegistry(backend=os.getenv("SPEEDLIMIT_NN_BACKEND", BACKEND_AUTO))
+
+
+def warm_up() -> ModelComponents:
+    """Eagerly loads the shared registry (call at service start-up)."""
+    return registry.warm_up()
@@ -0,0 +1,168 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from src.input_pipeline import load_scaled_splits
+from src.runtime_utils import LATENCY_ROWS, available_cores, per_row_latency_us, pin_worker
+
+SWEEP_RESULTS_PATH = 'models/sweep_results.csv'
+
+# Every combination of these values is trained; early_stopping is the patience in epochs (None disables it)
+DEFAULT_SEARCH_SPACE = {
+    'hidden_layers': [[32, 16], [64, 32], [128, 64, 32]],
+    'learning_rate': [0.001, 0.003],
+    'batch_size': [32, 128],
+    'epochs': [50],
+    'early_stopping': [5],
+}
+SEARCH_SPACE_KEYS = tuple(DEFAULT_SEARCH_SPACE)
+
+_SHARED_ARRAYS = ('X_train', 'y_train', 'X_validation', 'y_validation', 'X_test', 'y_test', 'scaler_mean',
+                  'scaler_scale')
+
+# Per-worker state, set by _init_worker
+_data = {}
+
+
+def expand_search_space(space: dict) -> list:
+    """Returns one candidate dict per combination of the search space values."""
+    unknown = set(space) - set(SEARCH_SPACE_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown search space keys {sorted(unknown)}, expected {SEARCH_SPACE_KEYS}")
+    space = dict(DEFAULT_SEARCH_SPACE, **space)
+    values = [[tuple(v) if key == 'hidden_layers' else v for v in space[key]] for key in SEARCH_SPACE_KEYS]
+    return [dict(zip(SEARCH_SPACE_KEYS, combination)) for combination in itertools.product(*values)]
+
+
+def rank_results(results: list) -> pd.DataFrame:
+    """Ranks candidates by test MAE, then by per-row inference latency."""
+    table = pd.DataFrame(results).sort_values(['test_mae', 'latency_us_per_row'], kind='stable')
+    table.insert(0, 'rank', np.arange(1, len(table) + 1))
+    return table.reset_index(drop=True)
+
+
+def share_arrays(arrays: dict, directory: str) -> dict:
+    """Writes each array to an .npy file that workers open read-only with np.load(mmap_mode='r')."""
+    paths = {}
+    for name, array in arrays.items():
+        paths[name] = os.path.join(directory, f'{name}.npy')
+        np.save(paths[name], np.ascontiguousarray(array))
+    return paths
+
+
+def open_shared_arrays(paths: dict) -> dict:
+    """Maps the shared arrays into this process; the pages are backed by one copy in the page cache."""
+    return {name: np.load(path, mmap_mode='r') for name, path in paths.items()}
+
+
+def _init_worker(paths: dict, cores: list, next_worker):
+    """Pins the worker to its own core, limits TensorFlow to one thread and maps the shared data."""
+    pin_worker(cores, next_worker)
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(1)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+    _data.update(open_shared_arrays(paths))
+
+
+def _train_candidate(candidate: dict, seed: int = 42) -> dict:
+    import tensorflow as tf
+    from src.nn_training import build_model
+    from src.numpy_inference import NumpyMLP
+
+    # 1. Train on the shared, already scaled training split; the following hours validate
+    tf.keras.utils.set_random_seed(seed)
+    X_train, X_test = _data['X_train'], _data['X_test']
+    model = build_model(X_train.shape[1], candidate['hidden_layers'], candidate['learning_rate'])
+    callbacks = []
+    if candidate['early_stopping'] is not None:
+        callbacks.append(tf.keras.callbacks.EarlyStopping(patience=candidate['early_stopping'],
+                                                          restore_best_weights=True))
+    start = time.perf_counter()
+    history = model.fit(X_train, _data['y_train'], epochs=candidate['epochs'], batch_size=candidate['batch_size'],
+                        validation_data=(_data['X_validation'], _data['y_validation']), callbacks=callbacks,
+                        verbose=0)
+    train_seconds = time.perf_counter() - start
+
+    # 2. Evaluate and time single-row inference on the NumPy backend that serves the model
+    _, test_mae = model.evaluate(X_test, _data['y_test'], verbose=0)
+    dense = [layer for layer in model.layers if layer.get_weights()]
+    engine = NumpyMLP([layer.get_weights()[0] for layer in dense], [layer.get_weights()[1] for layer in dense],
+                      ['relu'] * len(dense), _data['scaler_mean'], _data['scaler_scale'])
+    unscaled = np.asarray(X_test[:LATENCY_ROWS]) * _data['scaler_scale'] + _data['scaler_mean']
+    return dict(
+        candidate,
+        hidden_layers='-'.join(map(str, candidate['hidden_layers'])),
+        test_mae=float(test_mae),
+        val_mae=float(min(history.history['val_mae'])),
+        epochs_trained=len(history.history['loss']),
+        parameters=int(model.count_params()),
+        train_seconds=train_seconds,
+        latency_us_per_row=per_row_latency_us(engine.predict, unscaled),
+    )
+
+
+def run_sweep(space: dict = None, workers: int = None, output_path: str = SWEEP_RESULTS_PATH,
+              data_path: str = None) -> pd.DataFrame:
+    """
+    Trains every candidate of the search space in a process pool and writes a ranked table.
+
+    The processed dataset is loaded, split chronologically (oldest hours train, the next ones
+    validate, the most recent ones test) and scaled once; workers map the arrays from .npy
+    files instead of each receiving a pickled copy. Each worker is pinned to one core and runs
+    TensorFlow single-threaded, so candidates do not compete for the same cores.
+    """
+    candidates = expand_search_space(space or {})
+    splits, scaler = load_scaled_splits(data_path)
+    cores = available_cores()
+    workers = min(workers or len(cores), len(candidates))
+    print(f"Sweeping {len(candidates)} candidates on {workers} worker(s), cores {cores}")
+
+    results = []
+    with tempfile.TemporaryDirectory() as shared_dir:
+        arrays = {f'{name}_{split}': array for split, (X, y) in splits.items() for name, array in (('X', X), ('y', y))}
+        paths = share_arrays(dict(arrays, scaler_mean=scaler.mean_, scaler_scale=scaler.scale_), shared_dir)
+        # spawn: forking a parent that has imported TensorFlow is not safe
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(paths, cores, context.Value('i', 0))) as executor:
+            futures = {executor.submit(_train_candidate, candidate): candidate for candidate in candidates}
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                print(f"[{len(results)}/{len(candidates)}] {result['hidden_layers']} lr={result['learning_rate']} "
+                      f"batch={result['batch_size']}: MAE = {result['test_mae']:.4f}")
+
+    table = rank_results(results)
+    if output_path:
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        table.to_csv(output_path, index=False)
+        print(f"Sweep results saved to {output_path}")
+    return table
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Parallel hyperparameter sweep for the near-accident network.')
+    parser.add_argument('--space', default=None,
+                        help=f'JSON file with lists of values for {", ".join(SEARCH_SPACE_KEYS)} '
+                             '(missing keys use the defaults)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: one per core)')
+    parser.add_argument('--output', default=SWEEP_RESULTS_PATH, help='Ranked results table (CSV)')
+    args = parser.parse_args()
+    search_space = None
+    if args.space:
+        with open(args.space) as f:
+            search_space = json.load(f)
+    try:
+        ranked = run_sweep(search_space, args.workers, args.output)
+    except FileNotFoundError:
+        print("Error: Processed data not found. Please run data_preprocessing.py first.")
+    else:
+        print(ranked.to_string(index=False))
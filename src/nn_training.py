@@ -5,39 +5,109 @@ from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 import tensorflow as tf
 from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Dense
+from tensorflow.keras.layers import Dense, Input
 import joblib
+import argparse
 import os
 
-def train_nn_model():
+from src.data_preprocessing import load_processed_data, FEATURE_COLUMNS, TARGET_COLUMN
+from src.numpy_inference import export_numpy_model, NUMPY_MODEL_PATH
+from src.input_pipeline import build_datasets, ThroughputCallback, peak_rss_mb
+
+HIDDEN_LAYERS = (64, 32)
+PIPELINE_TFDATA = 'tfdata'  # Chronological splits streamed through tf.data
+PIPELINE_ARRAYS = 'arrays'  # Shuffled train_test_split on in-memory arrays
+PIPELINES = (PIPELINE_TFDATA, PIPELINE_ARRAYS)
+
+
+def split_and_scale(X, y):
+    """
+    Legacy: 80/20 shuffled train/test split (fixed seed) and a StandardScaler fitted on the training rows.
+    Only the 'arrays' pipeline uses it; later hours leak into training, so new code uses the
+    chronological helpers in src/input_pipeline.py (build_datasets, load_scaled_splits).
+    """
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+    return X_train_scaled, X_test_scaled, y_train, y_test, scaler
+
+
+def build_model(input_dim: int, hidden_layers=HIDDEN_LAYERS, learning_rate: float = None) -> Sequential:
+    """Dense ReLU network with a non-negative single output, compiled with Adam/MSE."""
+    model = Sequential(
+        [Input(shape=(input_dim,))] +
+        [Dense(width, activation='relu') for width in hidden_layers] +
+        [Dense(1, activation='relu')]  # Output layer for near_accidents count (non-negative)
+    )
+    optimizer = 'adam' if learning_rate is None else tf.keras.optimizers.Adam(learning_rate=learning_rate)
+    model.compile(optimizer=optimizer, loss='mse', metrics=['mae'])
+    return model
+
+
+def _train_on_arrays(epochs: int, batch_size: int):
+    """Original path: in-memory arrays with a shuffled train/test split."""
+    # Load processed data (columnar artifact if available, reading only the needed columns)
+    data = load_processed_data(columns=FEATURE_COLUMNS + [TARGET_COLUMN])
+    X_train_scaled, X_test_scaled, y_train, y_test, scaler = split_and_scale(data[FEATURE_COLUMNS].values,
+                                                                             data[TARGET_COLUMN].values)
+    print("Data prepared and scaled.")
+
+    model = build_model(X_train_scaled.shape[1])
+    print("Neural Network model compiled.")
+    model.fit(X_train_scaled, y_train, epochs=epochs, batch_size=batch_size, validation_split=0.1, verbose=2)
+    print("Neural Network model trained.")
+    _, mae = model.evaluate(X_test_scaled, y_test, verbose=0)
+    return model, scaler, mae
+
+
+def _train_on_pipeline(epochs: int, batch_size: int, cache, parallel_calls, threads):
+    """tf.data path: chronological splits streamed from the processed store, scaled in the pipeline."""
+    datasets, scaler, rows = build_datasets(batch_size=batch_size, cache=cache, parallel_calls=parallel_calls,
+                                            threads=threads)
+    print(f"Chronological splits ready: {rows['train']} train, {rows['validation']} validation, {rows['test']} test "
+          f"hours (scaler fitted on the training period).")
+
+    model = build_model(len(FEATURE_COLUMNS))
+    print("Neural Network model compiled.")
+    throughput = ThroughputCallback(rows['train'])
+    model.fit(datasets['train'], validation_data=datasets['validation'], epochs=epochs, callbacks=[throughput],
+              shuffle=False, verbose=2)  # the training split is shuffled in the pipeline
+    print("Neural Network model trained.")
+    _, mae = model.evaluate(datasets['test'], verbose=0)
+
+    rates = throughput.rows_per_second
+    print(f"Epoch throughput: first {rates[0]:,.0f} rows/s, median {np.median(rates):,.0f} rows/s; "
+          f"peak memory {peak_rss_mb():.1f} MB")
+    return model, scaler, mae
+
+
+def train_nn_model(input_pipeline: str = PIPELINE_TFDATA, epochs: int = 50, batch_size: int = 32,
+                   cache: str = '', parallel_calls: int = None, threads: int = None):
     """
     Loads processed data, trains a neural network to predict near-accidents,
     and saves the trained model.
+
+    With the default 'tfdata' pipeline, the oldest hours train, the following ones validate
+    and the most recent ones test, so no future hour leaks into training. `cache` is None
+    (off), '' (memory) or a file prefix; `parallel_calls` (default AUTOTUNE) and `threads`
+    tune the pipeline. 'arrays' keeps the original shuffled split on in-memory arrays.
     """
-    # Load processed data
+    # Features: humidity, light, noise, temperature, traffic, wind direction, wind strength, water
+    # Target: near_accidents
+    if input_pipeline not in PIPELINES:
+        raise ValueError(f"Unknown input pipeline '{input_pipeline}', expected one of {PIPELINES}")
     try:
-        data = pd.read_csv('data/processed/processed_data.csv', index_col='datetime', parse_dates=True)
+        if input_pipeline == PIPELINE_ARRAYS:
+            model, scaler, mae = _train_on_arrays(epochs, batch_size)
+        else:
+            model, scaler, mae = _train_on_pipeline(epochs, batch_size, cache,
+                                                    parallel_calls or tf.data.AUTOTUNE, threads)
     except FileNotFoundError:
         print("Error: Processed data not found. Please run data_preprocessing.py first.")
         return
+    print(f"Model Evaluation: MAE = {mae:.4f}")
 
-    # Prepare features (X) and target (y)
-    # Features: humidity, light, noise, temperature, traffic, wind direction, wind strength, water
-    # Target: near_accidents
-    features = ['humidity', 'light', 'noise', 'temperature', 'traffic', 'wind direction', 'wind strength', 'water']
-    X = data[features].values
-    y = data['near_accidents'].values
-
-    # Split data into training and testing sets
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-    # Scale features
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
-
-    print("Data prepared and scaled.")
-    
     # Create models directory if it doesn't exist
     os.makedirs('models', exist_ok=True)
 
@@ -46,29 +116,27 @@ def train_nn_model():
     joblib.dump(scaler, scaler_path)
     print(f"Scaler saved to {scaler_path}")
 
-    # --- Neural Network Model Definition and Training ---
-    model = Sequential([
-        Dense(64, activation='relu', input_shape=(X_train_scaled.shape[1],)),
-        Dense(32, activation='relu'),
-        Dense(1, activation='relu') # Output layer for near_accidents count (non-negative)
-    ])
-
-    model.compile(optimizer='adam', loss='mse', metrics=['mae'])
-    print("Neural Network model compiled.")
-
-    # Train the model
-    history = model.fit(X_train_scaled, y_train, epochs=50, batch_size=32, validation_split=0.1, verbose=2)
-    print("Neural Network model trained.")
-
-    # Evaluate the model
-    loss, mae = model.evaluate(X_test_scaled, y_test, verbose=0)
-    print(f"Model Evaluation: MAE = {mae:.4f}")
-
     # Save the trained model
     model_path = 'models/nn_model.keras'
     model.save(model_path)
     print(f"Trained Neural Network model saved to {model_path}")
 
+    # Export a TensorFlow-free copy (weights + scaler) for the NumPy inference backend
+    export_numpy_model(model, scaler, NUMPY_MODEL_PATH)
+
 
 if __name__ == '__main__':
-    train_nn_model()
+    parser = argparse.ArgumentParser(description='Train the near-accident neural network.')
+    parser.add_argument('--input-pipeline', choices=PIPELINES, default=PIPELINE_TFDATA,
+                        help="'tfdata': chronological splits streamed with tf.data (default); "
+                             "'arrays': shuffled split on in-memory arrays")
+    parser.add_argument('--epochs', type=int, default=50)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--cache', default='',
+                        help="tf.data cache: '' keeps splits in memory, a path prefix caches them on disk")
+    parser.add_argument('--no-cache', action='store_true', help='Re-read the processed store every epoch')
+    parser.add_argument('--parallel-calls', type=int, default=None, help='Parallel scaling calls (default: AUTOTUNE)')
+    parser.add_argument('--threads', type=int, default=None, help='Private tf.data thread pool size')
+    args = parser.parse_args()
+    train_nn_model(args.input_pipeline, args.epochs, args.batch_size, None if args.no_cache else args.cache,
+                   args.parallel_calls, args.threads)
@@ -0,0 +1,80 @@
+import numpy as np
+
+NUMPY_MODEL_PATH = 'models/nn_model.npz'
+
+_ACTIVATIONS = {
+    'relu': lambda x: np.maximum(x, 0.0),
+    'linear': lambda x: x,
+    'sigmoid': lambda x: 1.0 / (1.0 + np.exp(-x)),
+    'tanh': np.tanh,
+}
+
+
+def export_numpy_model(model, scaler, path: str = NUMPY_MODEL_PATH) -> str:
+    """
+    Writes the Dense layer weights of a trained Keras model and the StandardScaler
+    mean/scale into one compressed .npz file that NumpyMLP can serve without TensorFlow.
+    """
+    arrays = {
+        'scaler_mean': np.asarray(scaler.mean_, dtype=np.float64),
+        'scaler_scale': np.asarray(scaler.scale_, dtype=np.float64),
+    }
+    activations = []
+    for i, layer in enumerate(layer for layer in model.layers if layer.get_weights()):
+        activation = layer.get_config().get('activation', 'linear')
+        if activation not in _ACTIVATIONS:
+            raise ValueError(f"Unsupported activation '{activation}' in layer {layer.name}")
+        kernel, bias = layer.get_weights()
+        arrays[f'kernel_{i}'] = kernel
+        arrays[f'bias_{i}'] = bias
+        activations.append(activation)
+    arrays['activations'] = np.array(activations)
+    np.savez_compressed(path, **arrays)
+    print(f"NumPy inference model saved to {path}")
+    return path
+
+
+class NumpyMLP:
+    """
+    TensorFlow-free forward pass for the Dense near-accident network.
+
+    The StandardScaler is folded into the first layer, so `predict` takes *unscaled*
+    feature rows: x_scaled @ W = ((x - mean) / scale) @ W = x @ (W / scale[:, None]) - (mean / scale) @ W.
+    """
+
+    def __init__(self, kernels, biases, activations, scaler_mean, scaler_scale):
+        scaler_mean = np.asarray(scaler_mean, dtype=np.float64)
+        scaler_scale = np.asarray(scaler_scale, dtype=np.float64)
+        kernels = [np.asarray(k, dtype=np.float64) for k in kernels]
+        biases = [np.asarray(b, dtype=np.float64) for b in biases]
+        first_kernel = kernels[0] / scaler_scale[:, None]
+        first_bias = biases[0] - (scaler_mean / scaler_scale) @ kernels[0]
+        self.kernels = [first_kernel] + kernels[1:]
+        self.biases = [first_bias] + biases[1:]
+        self.activations = [_ACTIVATIONS[name] for name in activations]
+        self.mean_values = scaler_mean  # Feature defaults, same as scaler.mean_
+
+    @classmethod
+    def load(cls, path: str = NUMPY_MODEL_PATH) -> 'NumpyMLP':
+        with np.load(path) as data:
+            activations = [str(name) for name in data['activations']]
+            kernels = [data[f'kernel_{i}'] for i in range(len(activations))]
+            biases = [data[f'bias_{i}'] for i in range(len(activations))]
+            return cls(kernels, biases, activations, data['scaler_mean'], data['scaler_scale'])
+
+    def predict(self, features, verbose=0) -> np.ndarray:
+        """Returns an (n, 1) array of predicted near-accidents for (n, 8) unscaled feature rows."""
+        x = np.asarray(features, dtype=np.float64)
+        if x.ndim == 1:
+            x = x.reshape(1, -1)
+        for kernel, bias, activation in zip(self.kernels, self.biases, self.activations):
+            x = activation(x @ kernel + bias)
+        return x
+
+
+if __name__ == '__main__':
+    import joblib
+    from tensorflow.keras.models import load_model
+    from src.model_registry import MODEL_PATH, SCALER_PATH
+
+    export_numpy_model(load_model(MODEL_PATH), joblib.load(SCALER_PATH))
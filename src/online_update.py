@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from src.data_preprocessing import load_processed_data, FEATURE_COLUMNS, TARGET_COLUMN
+from src.metrics import metrics
+from src.model_registry import registry as default_registry, BACKEND_NUMPY, BACKEND_TABLE, BACKEND_TFLITE
+
+REPLAY_BUFFER_HOURS = 2048   # Past hours mixed into every fine-tuning step
+HOLDOUT_HOURS = 168          # Most recent hours held out to validate a candidate (one week)
+FINE_TUNE_EPOCHS = 5
+FINE_TUNE_BATCH_SIZE = 32
+FINE_TUNE_LEARNING_RATE = 1e-4  # A tenth of Adam's default, so a few new hours nudge rather than overwrite
+MAX_RELATIVE_MAE_INCREASE = 0.0  # Holdout MAE increase over the current model a candidate may have, as a fraction
+
+STATUS_ACCEPTED = 'accepted'
+STATUS_REJECTED = 'rejected'
+STATUS_SKIPPED = 'skipped'
+
+
+class ReplayBuffer:
+    """
+    Fixed-size uniform sample of all hours ever added (reservoir sampling), so fine-tuning
+    on a few new hours keeps seeing older seasons and conditions.
+    """
+
+    def __init__(self, capacity: int = REPLAY_BUFFER_HOURS, seed: int = 0):
+        self.capacity = capacity
+        self.seen = 0
+        self._features = np.empty((capacity, len(FEATURE_COLUMNS)), dtype=np.float32)
+        self._targets = np.empty(capacity, dtype=np.float32)
+        self._rng = np.random.default_rng(seed)
+
+    def __len__(self) -> int:
+        return min(self.seen, self.capacity)
+
+    def add(self, features, targets):
+        for row, target in zip(np.asarray(features, dtype=np.float32), np.asarray(targets, dtype=np.float32)):
+            slot = self.seen if self.seen < self.capacity else self._rng.integers(0, self.seen + 1)
+            if slot < self.capacity:
+                self._features[slot], self._targets[slot] = row, target
+            self.seen += 1
+
+    def arrays(self) -> tuple[np.ndarray, np.ndarray]:
+        return self._features[:len(self)].copy(), self._targets[:len(self)].copy()
+
+
+class OnlineUpdater:
+    """
+    Fine-tunes the saved Keras model on newly completed hours and swaps it into the
+    decision logic without a restart.
+
+    Hours arrive chronologically via add_hours(). The most recent `holdout_hours` are held
+    out; hours older than that are fresh training data. An update fine-tunes the model at
+    `registry.model_path` on the fresh hours plus the replay buffer, keeping the scaler,
+    and compares its holdout MAE with the current model's. An accepted candidate replaces
+    the .keras artifact (and an existing .npz) atomically (os.replace), and registry.reload()
+    swaps it in while in-flight predictions finish on the old model. Fresh hours then join the
+    buffer. `max_relative_mae_increase` is a fraction of the current holdout MAE.
+    """
+
+    def __init__(self, registry=None, holdout_hours: int = HOLDOUT_HOURS, buffer_hours: int = REPLAY_BUFFER_HOURS,
+                 epochs: int = FINE_TUNE_EPOCHS, batch_size: int = FINE_TUNE_BATCH_SIZE,
+                 learning_rate: float = FINE_TUNE_LEARNING_RATE,
+                 max_relative_mae_increase: float = MAX_RELATIVE_MAE_INCREASE, seed: int = 0):
+        self.registry = registry or default_registry
+        self.holdout_hours = holdout_hours
+        self.epochs = epochs
+        self.batch_size = batch_size
+        self.learning_rate = learning_rate
+        self.max_relative_mae_increase = max_relative_mae_increase
+        self.seed = seed
+        self.replay_buffer = ReplayBuffer(buffer_hours, seed)
+        self._recent = pd.DataFrame(columns=FEATURE_COLUMNS + [TARGET_COLUMN], dtype=np.float32)
+        self._lock = threading.Lock()          # guards the hour queues and counters
+        self._update_lock = threading.Lock()   # one update at a time
+        self._thread = None
+        self._counters = dict.fromkeys(('hours_added', 'updates', STATUS_ACCEPTED, STATUS_REJECTED, STATUS_SKIPPED), 0)
+        self.last_result = None
+
+    def stats(self) -> dict:
+        """Returns a snapshot of the update counters and buffer sizes."""
+        with self._lock:
+            return dict(self._counters, pending_hours=len(self._recent), buffer_hours=len(self.replay_buffer))
+
+    def seed_history(self, hours: pd.DataFrame):
+        """Fills the replay buffer with already trained-on hours (FEATURE_COLUMNS and TARGET_COLUMN)."""
+        with self._lock:
+            self.replay_buffer.add(hours[FEATURE_COLUMNS].to_numpy(), hours[TARGET_COLUMN].to_numpy())
+
+    def add_hours(self, hours: pd.DataFrame):
+        """Queues newly completed hours: sensor features plus the observed near-accidents, in time order."""
+        hours = hours[FEATURE_COLUMNS + [TARGET_COLUMN]].astype(np.float32)
+        with self._lock:
+            self._recent = pd.concat([self._recent, hours]) if len(self._recent) else hours
+            self._counters['hours_added'] += len(hours)
+
+    def update_in_background(self) -> bool:
+        """Runs update() on a daemon thread unless one is already running; returns True if started."""
+        if self._thread is not None and self._thread.is_alive():
+            return False
+        self._thread = threading.Thread(target=self.update, name='online-update', daemon=True)
+        self._thread.start()
+        return True
+
+    def update(self) -> dict:
+        """Fine-tunes, validates and, if accepted, swaps the model. Returns a summary dict."""
+        with self._update_lock:
+            # 1. Split the queue: the newest hours validate, older ones are fresh training data
+            with self._lock:
+                fresh = self._recent.iloc[:max(len(self._recent) - self.holdout_hours, 0)]
+                holdout = self._recent.iloc[len(fresh):]
+            if self.registry.backend in (BACKEND_TABLE, BACKEND_TFLITE):
+                result = self._skip(f"the {self.registry.backend} backend is built offline from the trained model")
+            elif not len(fresh) or len(holdout) < self.holdout_hours:
+                result = self._skip(f"{len(fresh)} fresh and {len(holdout)}/{self.holdout_hours} holdout hours")
+            else:
+                with metrics.timer('online_update'):
+                    result = self._fine_tune(fresh, holdout)
+                # 2. Fresh hours are now part of the history the replay buffer samples from
+                with self._lock:
+                    self.replay_buffer.add(fresh[FEATURE_COLUMNS].to_numpy(), fresh[TARGET_COLUMN].to_numpy())
+                    self._recent = self._recent.iloc[len(fresh):]
+            with self._lock:
+                self._counters['updates'] += 1
+                self._counters[result['status']] += 1
+            metrics.count('online_updates', result['status'])
+            self.last_result = result
+            return result
+
+    def _skip(self, reason: str) -> dict:
+        return {'status': STATUS_SKIPPED, 'reason': reason}
+
+    def _fine_tune(self, fresh: pd.DataFrame, holdout: pd.DataFrame) -> dict:
+        import joblib
+        import tensorflow as tf
+        from tensorflow.keras.models import load_model
+        from src.numpy_inference import export_numpy_model
+
+        model_path = self.registry.model_path
+        if not os.path.exists(model_path) or not os.path.exists(self.registry.scaler_path):
+            return self._skip(f"no trained model at {model_path}; run nn_training.py first")
+        scaler = joblib.load(self.registry.scaler_path)
+        # A private copy: the served model object is never trained on
+        model = load_model(model_path, compile=False)
+        model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=self.learning_rate), loss='mse', metrics=['mae'])
+
+        X_holdout = scaler.transform(holdout[FEATURE_COLUMNS].to_numpy())
+        y_holdout = holdout[TARGET_COLUMN].to_numpy()
+        _, current_mae = model.evaluate(X_holdout, y_holdout, verbose=0)
+
+        buffer_features, buffer_targets = self.replay_buffer.arrays()
+        X_train = scaler.transform(np.concatenate([fresh[FEATURE_COLUMNS].to_numpy(), buffer_features]))
+        y_train = np.concatenate([fresh[TARGET_COLUMN].to_numpy(), buffer_targets])
+        tf.keras.utils.set_random_seed(self.seed)
+        model.fit(X_train, y_train, epochs=self.epochs, batch_size=self.batch_size, shuffle=True, verbose=0)
+        _, candidate_mae = model.evaluate(X_holdout, y_holdout, verbose=0)
+
+        result = {'fresh_hours': len(fresh), 'replayed_hours': len(buffer_targets), 'holdout_hours': len(holdout),
+                  'current_mae': float(current_mae), 'candidate_mae': float(candidate_mae)}
+        if not np.isfinite(candidate_mae) or candidate_mae > current_mae * (1 + self.max_relative_mae_increase):
+            return dict(result, status=STATUS_REJECTED)
+
+        # 3. Write next to the artifacts, then rename over them, so no reader sees a partial file
+        root, extension = os.path.splitext(model_path)
+        temporary = f"{root}.{os.getpid()}.tmp{extension}"
+        model.save(temporary)
+        os.replace(temporary, model_path)
+        numpy_model_path = self.registry.numpy_model_path
+        # Only refresh an existing .npz: a new one would switch an 'auto' registry from Keras to NumPy
+        if os.path.exists(numpy_model_path) or self.registry.backend == BACKEND_NUMPY:
+            root, extension = os.path.splitext(numpy_model_path)
+            temporary = export_numpy_model(model, scaler, f"{root}.{os.getpid()}.tmp{extension}")
+            os.replace(temporary, numpy_model_path)
+
+        # 4. Load, warm up and swap; a reload failure keeps serving the previous model
+        swapped = self.registry.reload()
+        return dict(result, status=STATUS_ACCEPTED, swapped=swapped)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Fine-tunes models/nn_model.keras on the hours of the processed dataset from --since on, '
+                    'seeding the replay buffer with the hours before it.')
+    parser.add_argument('--since', required=True, help='First new hour, e.g. 2024-12-01')
+    parser.add_argument('--data', default=None, help='Processed dataset (default: the data_preprocessing output)')
+    parser.add_argument('--holdout-hours', type=int, default=HOLDOUT_HOURS)
+    parser.add_argument('--buffer-hours', type=int, default=REPLAY_BUFFER_HOURS)
+    parser.add_argument('--epochs', type=int, default=FINE_TUNE_EPOCHS)
+    parser.add_argument('--learning-rate', type=float, default=FINE_TUNE_LEARNING_RATE)
+    parser.add_argument('--max-relative-mae-increase', type=float, default=MAX_RELATIVE_MAE_INCREASE,
+                        help='Holdout MAE increase over the current model a candidate may have, as a fraction '
+                             '(0.05 allows 5%%)')
+    args = parser.parse_args()
+
+    data = load_processed_data(args.data, columns=FEATURE_COLUMNS + [TARGET_COLUMN]).sort_index()
+    since = pd.Timestamp(args.since)
+    updater = OnlineUpdater(holdout_hours=args.holdout_hours, buffer_hours=args.buffer_hours, epochs=args.epochs,
+                            learning_rate=args.learning_rate, max_relative_mae_increase=args.max_relative_mae_increase)
+    updater.seed_history(data[data.index < since])
+    updater.add_hours(data[data.index >= since])
+    print(json.dumps(updater.update(), indent=2))
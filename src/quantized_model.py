@@ -0,0 +1,206 @@
+import importlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from src.model_registry import TFLITE_MODEL_PATH
+
+QUANTIZATION_INT8 = 'int8'        # Full integer: int8 weights, activations and input/output
+QUANTIZATION_FLOAT16 = 'float16'  # float16 weights, float32 compute
+QUANTIZATION_DYNAMIC = 'dynamic'  # int8 weights, activations quantized on the fly
+QUANTIZATIONS = (QUANTIZATION_INT8, QUANTIZATION_FLOAT16, QUANTIZATION_DYNAMIC)
+
+# Largest accepted increase of the test-split MAE over the float model, in near-accidents/hr
+MAX_MAE_INCREASE = 0.05
+_REPRESENTATIVE_ROWS = 500
+
+
+def _metadata_path(model_path: str) -> str:
+    return os.path.splitext(model_path)[0] + '.json'
+
+
+def _interpreter_class():
+    """The lightest available TFLite interpreter: LiteRT, tflite_runtime, then TensorFlow's own."""
+    for module in ('ai_edge_litert.interpreter', 'tflite_runtime.interpreter'):
+        try:
+            return importlib.import_module(module).Interpreter
+        except ImportError:
+            pass
+    import tensorflow as tf
+    return tf.lite.Interpreter
+
+
+def convert(model, quantization: str = QUANTIZATION_INT8, representative_features=None) -> bytes:
+    """
+    Converts a Keras model that takes scaled features to a TFLite flatbuffer.
+    int8 calibrates activation ranges on `representative_features` (scaled rows).
+    """
+    import tensorflow as tf
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization '{quantization}', expected one of {QUANTIZATIONS}")
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == QUANTIZATION_FLOAT16:
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == QUANTIZATION_INT8:
+        if representative_features is None:
+            raise ValueError("int8 quantization needs representative feature rows for calibration.")
+        rows = np.asarray(representative_features, dtype=np.float32)
+        converter.representative_dataset = lambda: ([row.reshape(1, -1)] for row in rows)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    return converter.convert()
+
+
+class QuantizedModel:
+    """
+    TFLite near-accident model plus the StandardScaler mean/scale, for small CPU boxes.
+
+    `predict` takes *unscaled* feature rows like the NumPy backend, scales them, quantizes
+    the input if the model is integer-only and dequantizes the output. The interpreter is
+    resized for the batch size and guarded by a lock, since it is not thread-safe.
+    """
+
+    def __init__(self, model_content: bytes, scaler_mean, scaler_scale, quantization: str = None,
+                 report: dict = None):
+        self.model_content = model_content
+        self.scaler_mean = np.asarray(scaler_mean, dtype=np.float64)
+        self.scaler_scale = np.asarray(scaler_scale, dtype=np.float64)
+        self.mean_values = self.scaler_mean  # Feature defaults, same as scaler.mean_
+        self.quantization = quantization
+        self.report = report or {}
+        self._interpreter = _interpreter_class()(model_content=model_content)
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._rows = int(self._input['shape'][0])
+        self._lock = threading.Lock()
+
+    def predict(self, features, verbose=0) -> np.ndarray:
+        """Returns an (n, 1) array of predicted near-accidents for (n, 8) unscaled feature rows."""
+        x = np.asarray(features, dtype=np.float64)
+        if x.ndim == 1:
+            x = x.reshape(1, -1)
+        x = (x - self.scaler_mean) / self.scaler_scale
+        input_scale, input_zero_point = self._input['quantization']
+        if input_scale:
+            info = np.iinfo(self._input['dtype'])
+            x = np.clip(np.round(x / input_scale) + input_zero_point, info.min, info.max)
+        x = x.astype(self._input['dtype'])
+
+        with self._lock:
+            if len(x) != self._rows:
+                self._interpreter.resize_tensor_input(self._input['index'], [len(x), x.shape[1]])
+                self._interpreter.allocate_tensors()
+                self._output = self._interpreter.get_output_details()[0]
+                self._rows = len(x)
+            self._interpreter.set_tensor(self._input['index'], x)
+            self._interpreter.invoke()
+            y = self._interpreter.get_tensor(self._output['index']).astype(np.float64)
+
+        output_scale, output_zero_point = self._output['quantization']
+        if output_scale:
+            y = (y - output_zero_point) * output_scale
+        return y.reshape(-1, 1)
+
+    def save(self, path: str = TFLITE_MODEL_PATH):
+        with open(path, 'wb') as f:
+            f.write(self.model_content)
+        metadata = {
+            'quantization': self.quantization,
+            'scaler_mean': self.scaler_mean.tolist(),
+            'scaler_scale': self.scaler_scale.tolist(),
+            'report': self.report,
+        }
+        with open(_metadata_path(path), 'w') as f:
+            json.dump(metadata, f, indent=2)
+        print(f"Quantized model saved to {path}")
+
+    @classmethod
+    def load(cls, path: str = TFLITE_MODEL_PATH) -> 'QuantizedModel':
+        with open(path, 'rb') as f:
+            model_content = f.read()
+        with open(_metadata_path(path)) as f:
+            metadata = json.load(f)
+        return cls(model_content, metadata['scaler_mean'], metadata['scaler_scale'], metadata.get('quantization'),
+                   metadata.get('report'))
+
+
+def check_accuracy(float_predictions: np.ndarray, quantized_predictions: np.ndarray, target: np.ndarray,
+                   max_mae_increase: float = MAX_MAE_INCREASE) -> dict:
+    """Compares the quantized model to the float model on held-out rows; `passed` is the regression gate."""
+    float_predictions = np.asarray(float_predictions, dtype=np.float64).reshape(-1)
+    quantized_predictions = np.asarray(quantized_predictions, dtype=np.float64).reshape(-1)
+    target = np.asarray(target, dtype=np.float64).reshape(-1)
+    float_mae = float(np.mean(np.abs(float_predictions - target)))
+    quantized_mae = float(np.mean(np.abs(quantized_predictions - target)))
+    deviation = np.abs(quantized_predictions - float_predictions)
+    return {
+        'rows': len(target),
+        'float_mae': float_mae,
+        'quantized_mae': quantized_mae,
+        'mae_increase': quantized_mae - float_mae,
+        'max_abs_deviation': float(deviation.max()) if len(deviation) else 0.0,
+        'mean_abs_deviation': float(deviation.mean()) if len(deviation) else 0.0,
+        'max_mae_increase': max_mae_increase,
+        'passed': bool(quantized_mae - float_mae <= max_mae_increase),
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    import joblib
+    from tensorflow.keras.models import load_model
+    from src.input_pipeline import load_split
+    from src.model_registry import MODEL_PATH, SCALER_PATH, NUMPY_MODEL_PATH
+    from src.numpy_inference import NumpyMLP
+    from src.runtime_utils import per_row_latency_us
+
+    parser = argparse.ArgumentParser(description="Exports a quantized TFLite copy of the trained NN model.")
+    parser.add_argument('--quantization', choices=QUANTIZATIONS, default=QUANTIZATION_INT8)
+    parser.add_argument('--output', default=TFLITE_MODEL_PATH)
+    parser.add_argument('--data', default=None, help='Processed dataset (default: data/processed/processed_data.*)')
+    parser.add_argument('--max-mae-increase', type=float, default=MAX_MAE_INCREASE,
+                        help='Largest accepted test MAE increase over the float model')
+    args = parser.parse_args()
+
+    if not (os.path.exists(MODEL_PATH) and os.path.exists(SCALER_PATH)):
+        raise SystemExit("No trained model available. Please run nn_training.py first.")
+    float_model, scaler = load_model(MODEL_PATH), joblib.load(SCALER_PATH)
+    try:
+        train_features, _ = load_split(args.data, 'train')
+        test_features, test_target = load_split(args.data, 'test')
+    except FileNotFoundError:
+        raise SystemExit("Error: Processed data not found. Please run data_preprocessing.py first.")
+
+    # 1. Convert, calibrating int8 ranges on (scaled) training rows
+    representative = scaler.transform(train_features[:_REPRESENTATIVE_ROWS])
+    quantized = QuantizedModel(convert(float_model, args.quantization, representative), scaler.mean_, scaler.scale_,
+                               args.quantization)
+
+    # 2. Accuracy regression check on the held-out (most recent) test split
+    float_predictions = float_model.predict(scaler.transform(test_features), verbose=0)
+    accuracy = check_accuracy(float_predictions, quantized.predict(test_features), test_target,
+                              args.max_mae_increase)
+
+    # 3. Artifact size and single-row latency against the float backends
+    sizes = {'keras': os.path.getsize(MODEL_PATH), 'tflite': len(quantized.model_content)}
+    latency = {'keras': per_row_latency_us(lambda row: float_model(scaler.transform(row), training=False),
+                                           test_features),
+               'tflite': per_row_latency_us(quantized.predict, test_features)}
+    if os.path.exists(NUMPY_MODEL_PATH):
+        sizes['numpy'] = os.path.getsize(NUMPY_MODEL_PATH)
+        latency['numpy'] = per_row_latency_us(NumpyMLP.load(NUMPY_MODEL_PATH).predict, test_features)
+    quantized.report = {'accuracy': accuracy, 'size_bytes': sizes, 'latency_us_per_row': latency,
+                        'interpreter': _interpreter_class().__module__}
+    print(json.dumps(quantized.report, indent=2))
+
+    if not accuracy['passed']:
+        print(f"Accuracy regression: test MAE rose by {accuracy['mae_increase']:.4f} "
+              f"(limit {args.max_mae_increase}); the quantized model was not saved.")
+        sys.exit(1)
+    quantized.save(args.output)
@@ -0,0 +1,197 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.data_preprocessing import (ACCIDENTS_FILE, SENSOR_READINGS_FILE, SENSORS_FILE, SENSOR_TYPES_FILE,
+                                    TARGET_COLUMN, INCREMENTAL_CHUNKSIZE, _count_accident_events,
+                                    _with_accident_counts, load_processed_data)
+from src.decision_logic import get_speed_limits, JustificationCode
+from src.log_reader import read_accidents
+from src.sensor_matrix import build_sensor_matrix
+
+REPLAY_PATH = 'data/processed/replay.parquet'
+BATCH_HOURS = 24 * 31       # Hours evaluated per get_speed_limits call
+REQ1_MAX_NEAR_ACCIDENTS = 1.0  # REQ1: at most one near-accident per hour on average
+# Timeline columns fed to the decision logic, and the processed columns they come from
+SENSOR_COLUMNS = {'illuminance': 'light', 'water_level': 'water', 'temperature': 'temperature'}
+
+# Hour-of-day AQI ranges of get_simulated_aqi: (first hour, end hour, low, high); end exclusive, high inclusive
+_AQI_BANDS = ((6, 10, 70, 120), (16, 20, 80, 150))
+_AQI_DEFAULT_BAND = (30, 90)
+
+
+def _splitmix64(keys: np.ndarray) -> np.ndarray:
+    """SplitMix64 finalizer: well-mixed uint64 values from consecutive keys (wrapping arithmetic)."""
+    z = keys + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+class SeededAQISource:
+    """
+    Simulated AQI in the get_simulated_aqi ranges, reproducible for a seed. Each value is a
+    hash of (seed, hour), so replaying in any batch size yields the same series.
+    """
+
+    def __init__(self, seed: int = 0):
+        self.seed = seed
+
+    def __call__(self, times: pd.DatetimeIndex) -> np.ndarray:
+        hours = np.asarray(times.hour)
+        low = np.full(len(hours), _AQI_DEFAULT_BAND[0])
+        high = np.full(len(hours), _AQI_DEFAULT_BAND[1])
+        for first, end, band_low, band_high in _AQI_BANDS:
+            in_band = (hours >= first) & (hours < end)
+            low[in_band], high[in_band] = band_low, band_high
+        keys = (times.asi8 // 3_600_000_000_000).astype(np.uint64) ^ np.uint64((self.seed << 40) & (2**64 - 1))
+        return low + (_splitmix64(keys) % (high - low + 1).astype(np.uint64)).astype(np.int64)
+
+
+class RecordedAQISource:
+    """AQI values recorded per hour: a CSV or Parquet file with 'datetime' and 'aqi' columns."""
+
+    def __init__(self, path: str):
+        if os.path.splitext(path)[1] == '.parquet':
+            recorded = pd.read_parquet(path)
+        else:
+            recorded = pd.read_csv(path, parse_dates=['datetime'])
+        if 'datetime' in recorded.columns:
+            recorded = recorded.set_index('datetime')
+        self.aqi = recorded['aqi'].sort_index()
+        self.aqi.index = self.aqi.index.floor('h')
+
+    def __call__(self, times: pd.DatetimeIndex) -> np.ndarray:
+        aqi = self.aqi[~self.aqi.index.duplicated(keep='last')].reindex(times)
+        if aqi.isna().any():
+            raise ValueError(f"No recorded AQI for {int(aqi.isna().sum())} replayed hours (first: "
+                             f"{aqi.index[aqi.isna()][0]}).")
+        return aqi.to_numpy(dtype=int)
+
+
+def processed_timeline(path: str = None) -> pd.DataFrame:
+    """Hourly replay input from the processed dataset: sensor columns plus actual near-accidents."""
+    data = load_processed_data(path, columns=list(SENSOR_COLUMNS.values()) + [TARGET_COLUMN])
+    return _timeline(data)
+
+
+def raw_timeline(data_dir: str = 'data', chunksize: int = INCREMENTAL_CHUNKSIZE) -> pd.DataFrame:
+    """
+    Hourly replay input built straight from the V100 logs: readings are streamed in chunks
+    into the sensor matrix (per-type hourly means) and accidents counted per hour.
+    """
+    sensors = pd.read_csv(os.path.join(data_dir, SENSORS_FILE), sep=';')
+    sensor_types = pd.read_csv(os.path.join(data_dir, SENSOR_TYPES_FILE), sep=';')
+    matrix = build_sensor_matrix(os.path.join(data_dir, SENSOR_READINGS_FILE), sensors, sensor_types, chunksize)
+    event_counts = _count_accident_events(read_accidents(os.path.join(data_dir, ACCIDENTS_FILE)))
+    return _timeline(_with_accident_counts(matrix.per_type().ffill(), event_counts))
+
+
+def _timeline(data: pd.DataFrame) -> pd.DataFrame:
+    timeline = pd.DataFrame({column: data[source].to_numpy(dtype=np.float64)
+                             for column, source in SENSOR_COLUMNS.items()}, index=data.index)
+    timeline[TARGET_COLUMN] = data[TARGET_COLUMN].to_numpy()
+    return timeline.sort_index()
+
+
+def reason_names(codes: np.ndarray) -> pd.Categorical:
+    """
+    Names of the triggered JustificationCode flags per code (e.g. 'DARKNESS, NN_HIGH_RISK'),
+    the `reasons` of the streaming service, joined once per distinct code and kept as a
+    categorical, so a million-row replay stores one small integer per row.
+    """
+    unique_codes, inverse = np.unique(codes, return_inverse=True)
+    texts = [', '.join(flag.name for flag in JustificationCode if flag and code & flag) or 'NONE'
+             for code in unique_codes]
+    return pd.Categorical.from_codes(inverse.reshape(-1), categories=texts)
+
+
+def replay(timeline: pd.DataFrame, aqi_source=None, batch_hours: int = BATCH_HOURS) -> pd.DataFrame:
+    """
+    Streams the hourly timeline through get_speed_limits in batches of `batch_hours`.
+    Returns the timeline with aqi, speed_limit, code and reasons columns.
+    """
+    aqi_source = aqi_source or SeededAQISource()
+    results = []
+    for start in range(0, len(timeline), batch_hours):
+        batch = timeline.iloc[start:start + batch_hours]
+        aqi = aqi_source(batch.index)
+        speed_limits, codes = get_speed_limits(batch['illuminance'].to_numpy(), batch['water_level'].to_numpy(),
+                                               batch['temperature'].to_numpy(), batch.index.hour.to_numpy(), aqi=aqi,
+                                               audit_path=None)  # backtests are not live decisions
+        results.append(batch.assign(aqi=aqi, speed_limit=speed_limits, code=codes))
+    replayed = pd.concat(results) if results else timeline.assign(aqi=[], speed_limit=[], code=[])
+    replayed['reasons'] = reason_names(replayed['code'].to_numpy())
+    return replayed
+
+
+def score_req1(replayed: pd.DataFrame, max_near_accidents: float = REQ1_MAX_NEAR_ACCIDENTS) -> dict:
+    """
+    Scores REQ1 against the actual near-accident counts of the replayed hours.
+
+    REQ1 hours are dark (SPEC1) or at risk of black ice (SPEC2). The log was recorded at the
+    speed limits of the time, so only hours the system would have left unreduced can be held
+    to the target: their mean near-accident count must stay at or below `max_near_accidents`.
+    Recall and precision compare the reductions with the hours whose count exceeded it.
+    """
+    codes = replayed['code'].to_numpy()
+    near_accidents = replayed[TARGET_COLUMN].to_numpy(dtype=np.float64)
+    req1 = (codes & (JustificationCode.DARKNESS | JustificationCode.BLACK_ICE)) > 0
+    reduced = (codes & JustificationCode.NN_HIGH_RISK) > 0
+    risky = near_accidents > max_near_accidents
+    unreduced = req1 & ~reduced
+    unreduced_mean = float(near_accidents[unreduced].mean()) if unreduced.any() else 0.0
+    caught = int(np.count_nonzero(req1 & reduced & risky))
+    return {
+        'hours': len(replayed),
+        'req1_hours': int(np.count_nonzero(req1)),
+        'reduced_hours': int(np.count_nonzero(req1 & reduced)),
+        'unreduced_mean_near_accidents': unreduced_mean,
+        'compliant': bool(unreduced_mean <= max_near_accidents),
+        'risky_req1_hours': int(np.count_nonzero(req1 & risky)),
+        'missed_risky_hours': int(np.count_nonzero(unreduced & risky)),
+        'recall': caught / max(int(np.count_nonzero(req1 & risky)), 1),
+        'precision': caught / max(int(np.count_nonzero(req1 & reduced)), 1),
+        'speed_limit_hours': {int(limit): int(count)
+                              for limit, count in zip(*np.unique(replayed['speed_limit'], return_counts=True))},
+    }
+
+
+def save_replay(replayed: pd.DataFrame, path: str = REPLAY_PATH) -> str:
+    """Writes the replayed time series; the format follows the extension (.parquet or .csv)."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if os.path.splitext(path)[1] == '.parquet':
+        replayed.to_parquet(path)
+    else:
+        replayed.to_csv(path)
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replays the historical sensor timeline through the decision logic.')
+    parser.add_argument('--source', choices=('processed', 'raw'), default='processed',
+                        help="'processed': hourly dataset from data_preprocessing.py; 'raw': the V100 logs in --data-dir")
+    parser.add_argument('--data', default=None, help='Processed dataset (default: data/processed/processed_data.*)')
+    parser.add_argument('--data-dir', default='data')
+    aqi = parser.add_mutually_exclusive_group()
+    aqi.add_argument('--aqi-seed', type=int, default=0, help='Seed of the simulated AQI (default 0)')
+    aqi.add_argument('--aqi-file', default=None, help="Recorded AQI per hour (columns 'datetime', 'aqi')")
+    parser.add_argument('--batch-hours', type=int, default=BATCH_HOURS)
+    parser.add_argument('--output', default=REPLAY_PATH, help='Replayed time series (.parquet or .csv)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        timeline = raw_timeline(args.data_dir) if args.source == 'raw' else processed_timeline(args.data)
+    except FileNotFoundError as e:
+        raise SystemExit(f"Error loading data: {e}. Run data_preprocessing.py first or use --source raw.")
+    source = RecordedAQISource(args.aqi_file) if args.aqi_file else SeededAQISource(args.aqi_seed)
+    replayed = replay(timeline, source, args.batch_hours)
+    score = score_req1(replayed)
+    score['seconds'] = time.perf_counter() - start
+    print(f"Replay saved to {save_replay(replayed, args.output)}")
+    print(json.dumps(score, indent=2))
@@ -0,0 +1,210 @@
+import bisect
+import json
+import os
+
+import numpy as np
+
+from src.model_registry import RISK_TABLE_PATH
+
+SENSOR_TYPES_PATH = 'data/Case_Study_Speed_Limit_SensorTypes_V100.csv'
+
+# Feature positions of the three inputs that vary in get_weather_speed_reduction
+LIGHT_IDX = 1
+TEMPERATURE_IDX = 3
+WATER_IDX = 7
+
+
+def _metadata_path(table_path: str) -> str:
+    return os.path.splitext(table_path)[0] + '.json'
+
+
+def sensor_ranges(path: str = SENSOR_TYPES_PATH) -> dict:
+    """Returns {type: (min, max)} from the SensorTypes table."""
+    import pandas as pd
+    sensor_types = pd.read_csv(path, sep=';')
+    sensor_types['Type'] = sensor_types['Type'].str.strip()
+    return {row.Type: (float(row.Min), float(row.Max)) for row in sensor_types.itertuples()}
+
+
+def default_axes(light_points: int = 97, temperature_points: int = 101, water_points: int = 101,
+                 ranges: dict = None) -> tuple:
+    """
+    Builds the grid axes over the operating range from SensorTypes.
+    The light axis is log-spaced, since the interesting range sits near the SPEC1 threshold
+    while the sensor range goes up to 1,000,000.
+    """
+    ranges = ranges or sensor_ranges()
+    light_min, light_max = ranges['light']
+    light = np.concatenate(([light_min], np.geomspace(max(light_min, 1.0), light_max, light_points - 1)))
+    temperature = np.linspace(*ranges['temperature'], temperature_points)
+    water = np.linspace(*ranges['water'], water_points)
+    return np.unique(light), temperature, water
+
+
+def _model_predict_fn(model, scaler):
+    def predict(features):
+        if scaler is not None:
+            features = scaler.transform(features)
+        return np.asarray(model.predict(features, verbose=0), dtype=np.float64).reshape(-1)
+    return predict
+
+
+def _evaluate(predict, mean_values, light, temperature, water, batch_size: int = 65536) -> np.ndarray:
+    """Evaluates the model at the given points, filling the other features from mean_values."""
+    out = np.empty(len(light))
+    for start in range(0, len(light), batch_size):
+        stop = start + batch_size
+        features = np.tile(mean_values, (len(light[start:stop]), 1)).astype(np.float64)
+        features[:, LIGHT_IDX] = light[start:stop]
+        features[:, TEMPERATURE_IDX] = temperature[start:stop]
+        features[:, WATER_IDX] = water[start:stop]
+        out[start:stop] = predict(features)
+    return out
+
+
+# Offsets of the 8 corners of a grid cell
+_CORNERS = np.array([(di, dj, dk) for di in (0, 1) for dj in (0, 1) for dk in (0, 1)])
+
+
+def _locate_one(axis: list, value: float):
+    """Scalar variant of _locate on a Python list, avoiding NumPy call overhead."""
+    value = min(max(value, axis[0]), axis[-1])
+    index = min(bisect.bisect_right(axis, value) - 1, len(axis) - 2)
+    return index, (value - axis[index]) / (axis[index + 1] - axis[index])
+
+
+def _locate(axis: np.ndarray, values: np.ndarray):
+    """Returns the lower cell index and the fractional position of each value (clamped to the axis)."""
+    values = np.minimum(np.maximum(values, axis[0]), axis[-1])
+    index = np.minimum(np.searchsorted(axis, values, side='right') - 1, len(axis) - 2)
+    fraction = (values - axis[index]) / (axis[index + 1] - axis[index])
+    return index, fraction
+
+
+class RiskTable:
+    """
+    Precomputed near-accident predictions over a (light, temperature, water) grid.
+
+    Lookups use trilinear interpolation and inputs outside the grid are clamped to its edges.
+    The table is a plain .npy file, so it can be memory-mapped and shared between processes.
+    """
+
+    def __init__(self, values: np.ndarray, light: np.ndarray, temperature: np.ndarray, water: np.ndarray,
+                 mean_values: np.ndarray, max_error: float = None):
+        self.values = values
+        self.light = np.asarray(light, dtype=np.float64)
+        self.temperature = np.asarray(temperature, dtype=np.float64)
+        self.water = np.asarray(water, dtype=np.float64)
+        self.mean_values = np.asarray(mean_values, dtype=np.float64)
+        self.max_error = max_error
+        self._axis_lists = (self.light.tolist(), self.temperature.tolist(), self.water.tolist())
+
+    @classmethod
+    def build(cls, model, scaler, mean_values, axes: tuple = None) -> 'RiskTable':
+        """Evaluates the model on every grid point. `scaler` may be None for the NumPy backend."""
+        light, temperature, water = axes if axes is not None else default_axes()
+        grid_light, grid_temperature, grid_water = np.meshgrid(light, temperature, water, indexing='ij')
+        predictions = _evaluate(_model_predict_fn(model, scaler), np.asarray(mean_values),
+                                grid_light.ravel(), grid_temperature.ravel(), grid_water.ravel())
+        values = predictions.reshape(grid_light.shape).astype(np.float32)
+        return cls(values, light, temperature, water, mean_values)
+
+    def lookup(self, light, temperature, water) -> np.ndarray:
+        """Interpolated predictions for array-likes of light, temperature and water."""
+        light = np.atleast_1d(np.asarray(light, dtype=np.float64))
+        temperature = np.atleast_1d(np.asarray(temperature, dtype=np.float64))
+        water = np.atleast_1d(np.asarray(water, dtype=np.float64))
+        i, fi = _locate(self.light, light)
+        j, fj = _locate(self.temperature, temperature)
+        k, fk = _locate(self.water, water)
+        # Gather the 8 cell corners at once: (n, 8) values and weights
+        values = self.values[i[:, None] + _CORNERS[:, 0], j[:, None] + _CORNERS[:, 1], k[:, None] + _CORNERS[:, 2]]
+        weights = (np.where(_CORNERS[:, 0], fi[:, None], 1 - fi[:, None])
+                   * np.where(_CORNERS[:, 1], fj[:, None], 1 - fj[:, None])
+                   * np.where(_CORNERS[:, 2], fk[:, None], 1 - fk[:, None]))
+        return np.einsum('ij,ij->i', weights, values)
+
+    def lookup_one(self, light: float, temperature: float, water: float) -> float:
+        """Interpolated prediction for a single snapshot (pure Python, a few microseconds)."""
+        light_axis, temperature_axis, water_axis = self._axis_lists
+        i, fi = _locate_one(light_axis, light)
+        j, fj = _locate_one(temperature_axis, temperature)
+        k, fk = _locate_one(water_axis, water)
+        (c000, c001), (c010, c011) = self.values[i, j:j + 2, k:k + 2].tolist()
+        (c100, c101), (c110, c111) = self.values[i + 1, j:j + 2, k:k + 2].tolist()
+        c00 = c000 + (c001 - c000) * fk
+        c01 = c010 + (c011 - c010) * fk
+        c10 = c100 + (c101 - c100) * fk
+        c11 = c110 + (c111 - c110) * fk
+        c0 = c00 + (c01 - c00) * fj
+        c1 = c10 + (c11 - c10) * fj
+        return c0 + (c1 - c0) * fi
+
+    def predict(self, features, verbose=0) -> np.ndarray:
+        """Model-compatible interface: (n, 8) unscaled feature rows -> (n, 1) predictions."""
+        features = np.asarray(features, dtype=np.float64)
+        if features.ndim == 1:
+            features = features.reshape(1, -1)
+        if len(features) == 1:
+            row = features[0]
+            return np.array([[self.lookup_one(row[LIGHT_IDX], row[TEMPERATURE_IDX], row[WATER_IDX])]])
+        return self.lookup(features[:, LIGHT_IDX], features[:, TEMPERATURE_IDX],
+                           features[:, WATER_IDX]).reshape(-1, 1)
+
+    def estimate_max_error(self, model, scaler, random_points: int = 20000, seed: int = 0) -> float:
+        """
+        Maximum absolute difference to the live model, measured at every cell centre
+        (where interpolation error is largest for smooth regions) plus random points.
+        """
+        centres = [(axis[:-1] + axis[1:]) / 2 for axis in (self.light, self.temperature, self.water)]
+        grid = [g.ravel() for g in np.meshgrid(*centres, indexing='ij')]
+        rng = np.random.default_rng(seed)
+        random = [rng.uniform(axis[0], axis[-1], random_points) for axis in (self.light, self.temperature, self.water)]
+        light, temperature, water = (np.concatenate(parts) for parts in zip(grid, random))
+        live = _evaluate(_model_predict_fn(model, scaler), self.mean_values, light, temperature, water)
+        self.max_error = float(np.max(np.abs(self.lookup(light, temperature, water) - live)))
+        return self.max_error
+
+    def save(self, path: str = RISK_TABLE_PATH):
+        np.save(path, self.values)
+        metadata = {
+            'light': self.light.tolist(),
+            'temperature': self.temperature.tolist(),
+            'water': self.water.tolist(),
+            'mean_values': self.mean_values.tolist(),
+            'max_error': self.max_error,
+        }
+        with open(_metadata_path(path), 'w') as f:
+            json.dump(metadata, f)
+        print(f"Risk table saved to {path}")
+
+    @classmethod
+    def load(cls, path: str = RISK_TABLE_PATH, mmap: bool = True) -> 'RiskTable':
+        values = np.load(path, mmap_mode='r' if mmap else None)
+        with open(_metadata_path(path)) as f:
+            metadata = json.load(f)
+        return cls(values, metadata['light'], metadata['temperature'], metadata['water'],
+                   metadata['mean_values'], metadata.get('max_error'))
+
+
+if __name__ == '__main__':
+    import argparse
+    from src.model_registry import registry, BACKEND_TABLE
+
+    parser = argparse.ArgumentParser(description="Tabulates the NN risk over (light, temperature, water).")
+    parser.add_argument('--light-points', type=int, default=97)
+    parser.add_argument('--temperature-points', type=int, default=101)
+    parser.add_argument('--water-points', type=int, default=101)
+    parser.add_argument('--output', default=RISK_TABLE_PATH)
+    args = parser.parse_args()
+
+    if registry.backend == BACKEND_TABLE:
+        raise SystemExit("Build the risk table from a model backend (set SPEEDLIMIT_NN_BACKEND to keras or numpy).")
+    components = registry.get()
+    if components.model is None or components.mean_values is None:
+        raise SystemExit("No trained model available. Please run nn_training.py first.")
+    axes = default_axes(args.light_points, args.temperature_points, args.water_points)
+    table = RiskTable.build(components.model, components.scaler, components.mean_values, axes)
+    max_error = table.estimate_max_error(components.model, components.scaler)
+    print(f"Grid {table.values.shape}, maximum interpolation error vs. live model: {max_error:.4f} near-accidents/hr")
+    table.save(args.output)
@@ -0,0 +1,35 @@
+import os
+import time
+
+import numpy as np
+
+LATENCY_ROWS = 200  # Single-row predictions timed per latency measurement
+
+
+def available_cores() -> list:
+    """The CPU cores this process may run on: its affinity mask where the OS has one, else all cores."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def pin_worker(cores: list, next_worker):
+    """
+    Pins a pool worker to its own core. Call from the pool initializer; `next_worker` is a shared
+    multiprocessing Value('i', 0), so the n-th worker to start gets cores[n % len(cores)].
+    """
+    with next_worker.get_lock():
+        worker = next_worker.value
+        next_worker.value += 1
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, {cores[worker % len(cores)]})
+
+
+def per_row_latency_us(predict, features: np.ndarray, rows: int = LATENCY_ROWS) -> float:
+    """Median microseconds of single-row predictions on the first `rows` rows, as the speed limit service calls the model."""
+    timings = []
+    for row in np.asarray(features)[:rows]:
+        start = time.perf_counter()
+        predict(row.reshape(1, -1))
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1e6)
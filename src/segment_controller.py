@@ -0,0 +1,212 @@
+import threading
+import time
+
+from src import decision_logic
+from src.aqi_cache import aqi_band
+from src.decision_logic import JustificationCode, render_justification
+from src.llm_integration import recommendation_cache
+
+BASE_SPEED_LIMIT = 80        # REQ3
+NN_SPEED_REDUCTION = 20      # Reduction when the NN predicts more than one near-accident per hour
+# SPEC1/SPEC2 thresholds: dark below 500 millilux, black ice above 1000 µm of water below 0°C
+DARKNESS_ILLUMINANCE = 500.0
+BLACK_ICE_WATER_LEVEL = 1000.0
+BLACK_ICE_TEMPERATURE = 0.0
+
+
+class SegmentController:
+    """
+    Stateful speed limit decisions for one road segment, built on the decision_logic functions.
+
+    - Hysteresis: a SPEC1/SPEC2 condition is entered at the specified threshold, but only
+      cleared once the reading is `*_band` past it on the safe side and the condition has
+      been active for `hold_seconds`.
+    - Hold time: reductions are posted at once; raising the limit again waits until the
+      current limit has been posted for `hold_seconds`.
+    - Delta skipping: the router/NN and the AQI agent are only re-run when the conditions
+      changed or an input moved by at least its `*_delta` since the last evaluation
+      (a delta of 0 re-evaluates every update). The agent is also re-run whenever the AQI
+      enters another guideline band, so a required reduction is never held back.
+
+    Every update is recorded in the decision_logic audit log under the path 'segment'.
+
+    `stats()` counts evaluations skipped and limit changes avoided, i.e. updates where a
+    stateless get_speed_limit would have posted a different limit than the one kept. That
+    counterfactual never queries the agent: it uses a cached agent answer for the AQI, or
+    else the guideline band (10 km/h per band, as the rule-based fallback).
+    """
+
+    def __init__(self, segment_id=None, illuminance_band: float = 50.0, water_band: float = 50.0,
+                 temperature_band: float = 0.5, hold_seconds: float = 300.0, illuminance_delta: float = 10.0,
+                 water_delta: float = 10.0, temperature_delta: float = 0.25, aqi_delta: int = 5, clock=time.monotonic):
+        self.segment_id = segment_id
+        self.illuminance_band = illuminance_band
+        self.water_band = water_band
+        self.temperature_band = temperature_band
+        self.hold_seconds = hold_seconds
+        self.illuminance_delta = illuminance_delta
+        self.water_delta = water_delta
+        self.temperature_delta = temperature_delta
+        self.aqi_delta = aqi_delta
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forgets the last decision; the next update evaluates everything."""
+        self.is_dark = False
+        self.is_black_ice_danger = False
+        self.speed_limit = None
+        self.code = JustificationCode.NONE
+        self.justification = None
+        self._posted = None             # (predicted_accidents, aqi, aqi_reduction) behind the posted code
+        self._condition_since = {'dark': None, 'black_ice': None}
+        self._limit_since = None
+        self._weather_inputs = None     # (illuminance, water, temperature, conditions) at the last NN evaluation
+        self._predicted_accidents = 0.0
+        self._check_nn, self._router_source = False, None
+        self._aqi = None                # AQI at the last agent evaluation
+        self._aqi_reduction = 0
+        self._aqi_source = None
+        self._counters = dict.fromkeys(
+            ('updates', 'weather_evaluations', 'weather_evaluations_skipped', 'aqi_evaluations',
+             'aqi_evaluations_skipped', 'conditions_held', 'limit_changes', 'limit_changes_avoided'), 0)
+
+    def stats(self) -> dict:
+        """Returns a snapshot of the controller counters and its posted limit."""
+        with self._lock:
+            return dict(self._counters, segment_id=self.segment_id, speed_limit=self.speed_limit)
+
+    def _held(self, since, now) -> bool:
+        return since is not None and now - since < self.hold_seconds
+
+    def _update_conditions(self, illuminance, water_level, temperature, now):
+        """Applies the hysteresis bands and hold time to SPEC1/SPEC2; returns the raw (stateless) flags."""
+        raw_dark = illuminance < DARKNESS_ILLUMINANCE
+        raw_black_ice = water_level > BLACK_ICE_WATER_LEVEL and temperature < BLACK_ICE_TEMPERATURE
+
+        if raw_dark and not self.is_dark:
+            self.is_dark, self._condition_since['dark'] = True, now
+        elif self.is_dark and not raw_dark:
+            released = illuminance >= DARKNESS_ILLUMINANCE + self.illuminance_band
+            if released and not self._held(self._condition_since['dark'], now):
+                self.is_dark, self._condition_since['dark'] = False, None
+
+        if raw_black_ice and not self.is_black_ice_danger:
+            self.is_black_ice_danger, self._condition_since['black_ice'] = True, now
+        elif self.is_black_ice_danger and not raw_black_ice:
+            released = (water_level <= BLACK_ICE_WATER_LEVEL - self.water_band
+                        or temperature >= BLACK_ICE_TEMPERATURE + self.temperature_band)
+            if released and not self._held(self._condition_since['black_ice'], now):
+                self.is_black_ice_danger, self._condition_since['black_ice'] = False, None
+
+        if (self.is_dark, self.is_black_ice_danger) != (raw_dark, raw_black_ice):
+            self._counters['conditions_held'] += 1
+        return raw_dark, raw_black_ice
+
+    def _weather_moved(self, illuminance, water_level, temperature, conditions) -> bool:
+        if self._weather_inputs is None:
+            return True
+        last_illuminance, last_water, last_temperature, last_conditions = self._weather_inputs
+        return (conditions != last_conditions
+                or abs(illuminance - last_illuminance) >= self.illuminance_delta
+                or abs(water_level - last_water) >= self.water_delta
+                or abs(temperature - last_temperature) >= self.temperature_delta)
+
+    def _predict(self, illuminance, water_level, temperature) -> float:
+        """Predicted near-accidents/hr, re-running the router and NN only if the weather moved."""
+        conditions = (self.is_dark, self.is_black_ice_danger)
+        if not self._weather_moved(illuminance, water_level, temperature, conditions):
+            self._counters['weather_evaluations_skipped'] += 1
+            return self._predicted_accidents
+
+        self._counters['weather_evaluations'] += 1
+        predicted_accidents = 0.0
+        self._check_nn, self._router_source = decision_logic.router.route(illuminance, water_level, temperature,
+                                                                          *conditions)
+        if self._check_nn:
+            predicted_accidents = decision_logic.predict_near_accidents(illuminance, water_level, temperature,
+                                                                        any(conditions))
+        self._weather_inputs = (illuminance, water_level, temperature, conditions)
+        self._predicted_accidents = predicted_accidents
+        return predicted_accidents
+
+    def _aqi_speed_reduction(self, aqi: int) -> int:
+        """AQI agent recommendation, reused while the AQI stays in its band and within `aqi_delta` of the last query."""
+        if self._aqi is not None and abs(aqi - self._aqi) < self.aqi_delta and aqi_band(aqi) == aqi_band(self._aqi):
+            self._counters['aqi_evaluations_skipped'] += 1
+            return self._aqi_reduction
+        self._counters['aqi_evaluations'] += 1
+        self._aqi, self._aqi_reduction = aqi, decision_logic.get_llm_speed_reduction_recommendation(aqi)
+        self._aqi_source = decision_logic.last_recommendation_source()
+        return self._aqi_reduction
+
+    def _stateless_aqi_reduction(self, aqi: int) -> int:
+        """The AQI reduction a stateless decision would apply, without calling the agent."""
+        if aqi == self._aqi:
+            return self._aqi_reduction
+        cached = recommendation_cache.peek(aqi)
+        return 10 * aqi_band(aqi) if cached is None else cached
+
+    def _justify(self, code, predicted_accidents, aqi, aqi_reduction) -> str:
+        return render_justification(code, predicted_accidents, NN_SPEED_REDUCTION, aqi, aqi_reduction)
+
+    def update(self, illuminance: float, water_level: float, temperature: float, current_hour: int,
+               aqi: int = None, now: float = None) -> tuple[int, str]:
+        """
+        Feeds one sensor snapshot to the segment. Returns the posted speed limit and its
+        justification, like get_speed_limit. `aqi` defaults to get_simulated_aqi(current_hour)
+        and `now` to the controller clock (seconds).
+        """
+        with self._lock:
+            start = time.perf_counter()
+            now = self._clock() if now is None else now
+            self._counters['updates'] += 1
+
+            # 1. Weather-based decision (REQ1) on the hysteresis-stabilized conditions
+            raw_dark, raw_black_ice = self._update_conditions(illuminance, water_level, temperature, now)
+            predicted_accidents = self._predict(illuminance, water_level, temperature)
+            nn_high_risk = (self.is_dark or self.is_black_ice_danger) and predicted_accidents > 1.0
+            weather_reduction = NN_SPEED_REDUCTION if nn_high_risk else 0
+
+            # 2. Air Quality-based decision (REQ2)
+            if aqi is None:
+                aqi = decision_logic.get_simulated_aqi(current_hour)
+            aqi_reduction = self._aqi_speed_reduction(aqi)
+
+            # 3. Most severe reduction; reductions post at once, increases wait for the hold time
+            speed_limit = min(BASE_SPEED_LIMIT - max(weather_reduction, aqi_reduction, 0), BASE_SPEED_LIMIT)
+            code = JustificationCode.NONE
+            code |= JustificationCode.DARKNESS if self.is_dark else JustificationCode.NONE
+            code |= JustificationCode.BLACK_ICE if self.is_black_ice_danger else JustificationCode.NONE
+            code |= JustificationCode.NN_HIGH_RISK if nn_high_risk else JustificationCode.NONE
+            code |= JustificationCode.POOR_AIR_QUALITY if aqi_reduction > 0 else JustificationCode.NONE
+            posted = (predicted_accidents, aqi, aqi_reduction)
+
+            previous_limit = self.speed_limit
+            hold_note = ''
+            if previous_limit is not None and speed_limit > previous_limit and self._held(self._limit_since, now):
+                remaining = self.hold_seconds - (now - self._limit_since)
+                hold_note = f" (Holding {previous_limit} km/h for another {remaining:.0f} s before raising it.)"
+                speed_limit, code, posted = previous_limit, self.code, self._posted
+            justification = self._justify(code, *posted) + hold_note
+
+            # A stateless decision sees the raw conditions, the current AQI and no hold time
+            stateless_reduction = weather_reduction if (raw_dark or raw_black_ice) else 0
+            stateless_aqi_reduction = self._stateless_aqi_reduction(aqi)
+            stateless_limit = BASE_SPEED_LIMIT - max(stateless_reduction, stateless_aqi_reduction, 0)
+            if previous_limit is not None:
+                if speed_limit != previous_limit:
+                    self._counters['limit_changes'] += 1
+                    self._limit_since = now
+                elif stateless_limit != previous_limit:
+                    self._counters['limit_changes_avoided'] += 1
+            else:
+                self._limit_since = now
+            self.speed_limit, self.code, self.justification, self._posted = int(speed_limit), code, justification, posted
+            if decision_logic.audit_log.enabled:
+                decision_logic.audit_log.record(
+                    illuminance, water_level, temperature, current_hour, self._check_nn, self._router_source,
+                    predicted_accidents if self._check_nn else float('nan'), weather_reduction, aqi, aqi_reduction,
+                    self._aqi_source, self.speed_limit, int(code), time.perf_counter() - start, path='segment')
+            return self.speed_limit, self.justification
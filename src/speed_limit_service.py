@@ -0,0 +1,357 @@
+import warnings
+# Suppress urllib3 NotOpenSSLWarning before any other imports
+warnings.filterwarnings("ignore", module='urllib3')
+
+import argparse
+import asyncio
+import datetime
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from src.decision_logic import get_speed_limits, JustificationCode
+from src.llm_integration import get_simulated_aqi
+from src.metrics import metrics
+
+DEFAULT_MAX_BATCH_SIZE = 256
+DEFAULT_MAX_LATENCY_MS = 5.0   # Longest a snapshot waits for others to join its batch
+DEFAULT_MAX_PENDING = 4096     # Snapshots queued for evaluation before readers stop reading
+DEFAULT_MAX_IN_FLIGHT = 1024   # Decisions per connection awaiting their turn to be written
+
+_REASONS = [flag for flag in JustificationCode if flag]
+
+
+class SnapshotError(ValueError):
+    """A line that is not a valid sensor snapshot; answered with an error line, in order."""
+
+    def __init__(self, message: str, snapshot_id=None):
+        super().__init__(message)
+        self.snapshot_id = snapshot_id
+
+
+def parse_snapshot(line: bytes) -> dict:
+    """
+    Parses one NDJSON sensor snapshot:
+    {"id": ..., "illuminance": 800, "water_level": 500, "temperature": 15, "hour": 7, "aqi": 60}
+
+    `id` and `aqi` are optional. The hour comes from `hour`, else from an ISO `timestamp`,
+    else from the wall clock, so recorded streams can be replayed with their own times.
+    """
+    try:
+        message = json.loads(line)
+    except ValueError as e:
+        raise SnapshotError(f"Invalid JSON: {e}")
+    if not isinstance(message, dict):
+        raise SnapshotError("A snapshot must be a JSON object.")
+    snapshot_id = message.get('id')
+    try:
+        snapshot = {field: float(message[field]) for field in ('illuminance', 'water_level', 'temperature')}
+        if message.get('hour') is not None:
+            hour = int(message['hour'])
+        elif message.get('timestamp') is not None:
+            hour = datetime.datetime.fromisoformat(message['timestamp']).hour
+        else:
+            hour = datetime.datetime.now().hour
+        if not 0 <= hour <= 23:
+            raise ValueError(f"hour {hour} is outside 0-23")
+        snapshot['current_hour'] = hour
+        snapshot['aqi'] = None if message.get('aqi') is None else int(message['aqi'])
+    except KeyError as e:
+        raise SnapshotError(f"Missing field {e}", snapshot_id)
+    except (TypeError, ValueError) as e:
+        raise SnapshotError(f"Invalid field value: {e}", snapshot_id)
+    snapshot['id'] = snapshot_id
+    return snapshot
+
+
+def _with_id(response: dict, snapshot_id) -> bytes:
+    if snapshot_id is not None:
+        response = dict(id=snapshot_id, **response)
+    return json.dumps(response).encode() + b'\n'
+
+
+def format_decision(snapshot_id, speed_limit: int, code: int) -> bytes:
+    reasons = [flag.name for flag in _REASONS if code & flag]
+    return _with_id({'speed_limit': int(speed_limit), 'code': int(code), 'reasons': reasons}, snapshot_id)
+
+
+def format_error(snapshot_id, message: str) -> bytes:
+    return _with_id({'error': message}, snapshot_id)
+
+
+def evaluate_snapshots(snapshots: list):
+    """Runs one batch through get_speed_limits; missing AQI values are simulated per hour."""
+    hours = np.array([snapshot['current_hour'] for snapshot in snapshots], dtype=int)
+    aqi = np.array([get_simulated_aqi(int(hour)) if snapshot['aqi'] is None else snapshot['aqi']
+                    for snapshot, hour in zip(snapshots, hours)], dtype=int)
+    return get_speed_limits(np.array([snapshot['illuminance'] for snapshot in snapshots]),
+                            np.array([snapshot['water_level'] for snapshot in snapshots]),
+                            np.array([snapshot['temperature'] for snapshot in snapshots]),
+                            hours, aqi=aqi)
+
+
+class MicroBatcher:
+    """
+    Collects snapshots from all connections into batches for the decision engine.
+
+    A batch closes when it reaches `max_batch_size` or when its first snapshot has waited
+    `max_latency` seconds. Batches are evaluated one at a time in a worker thread, so the
+    event loop keeps reading meanwhile. `submit` blocks while `max_pending` snapshots are
+    queued, which stops the callers from reading their input (back-pressure).
+    """
+
+    def __init__(self, evaluate=evaluate_snapshots, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_latency: float = DEFAULT_MAX_LATENCY_MS / 1000, max_pending: int = DEFAULT_MAX_PENDING):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.evaluate = evaluate
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.max_pending = max_pending
+        self.batches = 0
+        self.decisions = 0
+        self.largest_batch = 0
+        self._queue = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='speed-limit-batch')
+
+    async def submit(self, snapshot: dict) -> asyncio.Future:
+        """Queues a snapshot and returns a future for its (speed_limit, code)."""
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.max_pending)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((snapshot, future))
+        return future
+
+    async def _next_batch(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_latency
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def run(self):
+        """Evaluates batches until cancelled."""
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.max_pending)
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            snapshots = [snapshot for snapshot, _ in batch]
+            try:
+                speed_limits, codes = await loop.run_in_executor(self._executor, self.evaluate, snapshots)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), speed_limit, code in zip(batch, speed_limits, codes):
+                if not future.done():
+                    future.set_result((int(speed_limit), int(code)))
+            self.batches += 1
+            self.decisions += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+
+    def stats(self) -> dict:
+        return {
+            'decisions': self.decisions,
+            'batches': self.batches,
+            'mean_batch_size': self.decisions / self.batches if self.batches else 0.0,
+            'largest_batch': self.largest_batch,
+        }
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+async def _response(item) -> bytes:
+    if isinstance(item, bytes):
+        return item
+    snapshot_id, future = item
+    try:
+        speed_limit, code = await future
+    except Exception as e:
+        return format_error(snapshot_id, f"Decision failed: {e}")
+    return format_decision(snapshot_id, speed_limit, code)
+
+
+async def serve_lines(lines, writer, batcher: MicroBatcher, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT):
+    """
+    Answers every line of the async iterator `lines` through `writer` (write() + drain()),
+    in input order. At most `max_in_flight` answers wait for writing, so a slow reader of
+    the responses eventually stops this connection from reading more input.
+    """
+    pending = asyncio.Queue(max_in_flight)
+
+    async def write_responses():
+        writable = True
+        while True:
+            item = await pending.get()
+            if item is None:
+                break
+            response = await _response(item)
+            if not writable:
+                continue  # keep consuming so the reader never blocks on a closed peer
+            try:
+                writer.write(response)
+                if pending.empty():
+                    await writer.drain()
+            except (ConnectionError, BrokenPipeError):
+                writable = False
+        if writable:
+            try:
+                await writer.drain()
+            except (ConnectionError, BrokenPipeError):
+                pass
+
+    writer_task = asyncio.ensure_future(write_responses())
+    try:
+        async for line in lines:
+            if not line.strip():
+                continue
+            try:
+                snapshot = parse_snapshot(line)
+            except SnapshotError as e:
+                await pending.put(format_error(e.snapshot_id, str(e)))
+                continue
+            await pending.put((snapshot['id'], await batcher.submit(snapshot)))
+    finally:
+        await pending.put(None)
+        await writer_task
+
+
+async def _stream_lines(reader: asyncio.StreamReader):
+    while True:
+        line = await reader.readline()
+        if not line:
+            return
+        yield line
+
+
+async def _stdin_lines(stream, chunk_size: int = 65536):
+    """Lines of a blocking binary stream (pipe or file), read in chunks on a worker thread."""
+    loop = asyncio.get_running_loop()
+    buffered = b''
+    while True:
+        chunk = await loop.run_in_executor(None, stream.read1, chunk_size)
+        if not chunk:
+            if buffered:
+                yield buffered
+            return
+        lines = (buffered + chunk).split(b'\n')
+        buffered = lines.pop()
+        for line in lines:
+            yield line
+
+
+class _BlockingWriter:
+    """write()/drain() over a blocking binary stream such as stdout."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, data: bytes):
+        self.stream.write(data)
+
+    async def drain(self):
+        self.stream.flush()
+
+
+async def run_service(stdio: bool = True, unix_path: str = None, host: str = None, port: int = None,
+                      input_stream=None, output_stream=None, max_batch_size: int = DEFAULT_MAX_BATCH_SIZE, max_latency_ms: float = DEFAULT_MAX_LATENCY_MS,
+                      max_pending: int = DEFAULT_MAX_PENDING, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                      evaluate=evaluate_snapshots, started: asyncio.Event = None) -> MicroBatcher:
+    """
+    Serves NDJSON snapshots on stdin/stdout (until EOF) or on a Unix or TCP socket (until
+    cancelled). `input_stream`/`output_stream` replace stdin/stdout with other binary streams.
+    Returns the batcher, whose stats() summarise the run.
+    """
+    batcher = MicroBatcher(evaluate, max_batch_size, max_latency_ms / 1000, max_pending)
+    metrics.register_collector('service', batcher.stats)
+    batch_task = asyncio.ensure_future(batcher.run())
+    try:
+        if stdio:
+            if started is not None:
+                started.set()
+            await serve_lines(_stdin_lines(input_stream or sys.stdin.buffer),
+                              _BlockingWriter(output_stream or sys.stdout.buffer), batcher, max_in_flight)
+            return batcher
+
+        async def handle(reader, writer):
+            try:
+                await serve_lines(_stream_lines(reader), writer, batcher, max_in_flight)
+            finally:
+                writer.close()
+
+        if unix_path is not None:
+            server = await asyncio.start_unix_server(handle, path=unix_path)
+        else:
+            server = await asyncio.start_server(handle, host=host, port=port)
+        async with server:
+            print(f"Speed limit service listening on {unix_path or f'{host}:{port}'}", file=sys.stderr)
+            if started is not None:
+                started.set()
+            await server.serve_forever()
+    finally:
+        batch_task.cancel()
+        batcher.close()
+    return batcher
+
+
+if __name__ == '__main__':
+    import signal
+    import threading
+    from src.decision_logic import warm_up
+    from src.metrics import serve_metrics, METRICS_PORT
+    from src.model_registry import registry
+
+    parser = argparse.ArgumentParser(
+        description='Long-running speed limit service: NDJSON sensor snapshots in, NDJSON decisions out, in order.')
+    transport = parser.add_mutually_exclusive_group()
+    transport.add_argument('--unix', metavar='PATH', help='Listen on a Unix socket instead of stdin/stdout')
+    transport.add_argument('--tcp', metavar='HOST:PORT', help='Listen on a TCP socket instead of stdin/stdout')
+    parser.add_argument('--max-batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE)
+    parser.add_argument('--max-latency-ms', type=float, default=DEFAULT_MAX_LATENCY_MS,
+                        help='Longest a snapshot waits for a batch to fill')
+    parser.add_argument('--max-pending', type=int, default=DEFAULT_MAX_PENDING,
+                        help='Queued snapshots before input reading pauses (back-pressure)')
+    parser.add_argument('--max-in-flight', type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                        help='Unwritten decisions per connection before its input reading pauses')
+    parser.add_argument('--metrics-port', type=int, nargs='?', const=METRICS_PORT, default=None,
+                        help=f'Serve /metrics (Prometheus) and /metrics.json on 127.0.0.1 (default port {METRICS_PORT})')
+    args = parser.parse_args()
+
+    host, port, output = None, None, None
+    if args.tcp:
+        host, _, port = args.tcp.rpartition(':')
+        host, port = host or '127.0.0.1', int(port)
+    stdio = not (args.unix or args.tcp)
+    if stdio:
+        output = sys.stdout.buffer
+        sys.stdout = sys.stderr  # keep component log lines out of the response stream
+    if args.metrics_port is not None:
+        metrics_server = serve_metrics(port=args.metrics_port)
+        print(f"Metrics on http://127.0.0.1:{metrics_server.server_address[1]}/metrics", file=sys.stderr)
+    warm_up()  # load the model before the first snapshot arrives
+    # SIGHUP reloads the model artifacts (e.g. after src/online_update.py) without a restart
+    signal.signal(signal.SIGHUP, lambda *_: threading.Thread(target=registry.reload, daemon=True).start())
+    try:
+        result = asyncio.run(run_service(stdio=stdio, unix_path=args.unix, host=host, port=port, output_stream=output,
+                                         max_batch_size=args.max_batch_size, max_latency_ms=args.max_latency_ms,
+                                         max_pending=args.max_pending, max_in_flight=args.max_in_flight))
+        print(json.dumps(result.stats()), file=sys.stderr)
+    except KeyboardInterrupt:
+        pass
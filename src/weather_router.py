@@ -0,0 +1,209 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.cache import TTLCache
+from src.gemini_client import get_client
+from src.metrics import metrics
+
+# Routing modes
+MODE_LOCAL = 'local'        # Deterministic SPEC1/SPEC2 rule only, never touches the network
+MODE_ADVISORY = 'advisory'  # Rule decides; the LLM is consulted in the background for comparison
+MODE_GATING = 'gating'      # The LLM decides (cached); the rule is used on errors or without API key
+ROUTER_MODES = (MODE_LOCAL, MODE_ADVISORY, MODE_GATING)
+# Where a routing decision came from (see WeatherRouter.route)
+SOURCE_RULE = 'rule'
+SOURCE_CACHE = 'cache'
+SOURCE_LLM = 'llm'
+SOURCE_FALLBACK = 'fallback'
+
+ROUTER_PROMPT = """
+You are an intelligent router for a traffic safety system.
+
+Sensor Data:
+- Illuminance: {illuminance} millilux
+- Water Level: {water_level} micrometers
+- Temperature: {temperature} Celsius
+
+Rules:
+- Darkness is defined as Illuminance < 500.
+- Black Ice Risk is Water > 1000 AND Temperature < 0.
+
+Task:
+Decide if we should run the complex Neural Network (NN) to predict accidents.
+Answer "YES" if either Darkness OR Black Ice Risk is present.
+Answer "NO" otherwise.
+
+Output:
+YES or NO
+"""
+
+
+class WeatherRouter:
+    """
+    Router Component: decides whether the NN risk assessment should run for a weather snapshot.
+
+    The deterministic rule (darkness OR black ice) is always available, so the hot path
+    only waits on the LLM in gating mode, and then only on a cache miss. Decisions are
+    cached on quantized inputs together with the rule outcome, so quantization never
+    merges snapshots that fall on different sides of a SPEC threshold.
+    """
+
+    def __init__(self, mode: str = MODE_LOCAL, cache_size: int = 4096, cache_ttl: float = 600.0,
+                 illuminance_step: float = 10.0, water_step: float = 10.0, temperature_step: float = 0.5):
+        if mode not in ROUTER_MODES:
+            raise ValueError(f"Unknown router mode '{mode}', expected one of {ROUTER_MODES}")
+        self.mode = mode
+        self.illuminance_step = illuminance_step
+        self.water_step = water_step
+        self.temperature_step = temperature_step
+        self._cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._in_flight = set()
+        self._counters = dict.fromkeys(
+            ('decisions', 'cache_hits', 'cache_misses', 'llm_calls', 'llm_calls_avoided',
+             'llm_errors', 'llm_disagreements'), 0)
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def stats(self) -> dict:
+        """Returns a snapshot of the router counters."""
+        with self._lock:
+            return dict(self._counters, mode=self.mode, cache_entries=len(self._cache))
+
+    def clear_cache(self):
+        self._cache.clear()
+
+    def cache_key(self, illuminance: float, water_level: float, temperature: float, rule_decision: bool) -> tuple:
+        return (
+            round(illuminance / self.illuminance_step),
+            round(water_level / self.water_step),
+            round(temperature / self.temperature_step),
+            rule_decision,
+        )
+
+    def _route_locally(self, illuminance, water_level, temperature, is_dark, is_black_ice_danger):
+        """
+        Resolves a decision without waiting on the network.
+        Returns (decision, None, None, source) when done, or (rule_decision, key, client, None) when the LLM must decide.
+        """
+        self._count('decisions')
+        rule_decision = bool(is_dark or is_black_ice_danger)
+        client = get_client()
+        if self.mode == MODE_LOCAL or client is None:
+            self._count('llm_calls_avoided')
+            return rule_decision, None, None, SOURCE_RULE
+
+        key = self.cache_key(illuminance, water_level, temperature, rule_decision)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._count('cache_hits')
+            self._count('llm_calls_avoided')
+            if self.mode == MODE_GATING:
+                return cached, None, None, SOURCE_CACHE
+            return rule_decision, None, None, SOURCE_RULE
+        self._count('cache_misses')
+
+        if self.mode == MODE_ADVISORY:
+            self._submit_advisory(key, client, illuminance, water_level, temperature, rule_decision)
+            return rule_decision, None, None, SOURCE_RULE
+        return rule_decision, key, client, None
+
+    def _record_gated(self, key, decision, rule_decision) -> bool:
+        if decision is None:
+            return rule_decision
+        self._cache.set(key, decision)
+        if decision != rule_decision:
+            self._count('llm_disagreements')
+        return decision
+
+    def should_check_nn(self, illuminance: float, water_level: float, temperature: float,
+                        is_dark: bool, is_black_ice_danger: bool) -> bool:
+        """Returns True if the NN should be consulted for this snapshot."""
+        return self.route(illuminance, water_level, temperature, is_dark, is_black_ice_danger)[0]
+
+    def route(self, illuminance: float, water_level: float, temperature: float,
+              is_dark: bool, is_black_ice_danger: bool) -> tuple[bool, str]:
+        """
+        should_check_nn, plus where the decision came from: 'rule', 'cache' (a cached LLM
+        decision), 'llm' or 'fallback' (the rule, after a failed LLM call).
+        """
+        decision, key, client, source = self._route_locally(
+            illuminance, water_level, temperature, is_dark, is_black_ice_danger)
+        if key is None:
+            return decision, source
+        # Gating mode: the LLM decides, the rule is the fallback
+        llm_decision = self._ask_llm(client, illuminance, water_level, temperature)
+        return self._record_gated(key, llm_decision, decision), SOURCE_FALLBACK if llm_decision is None else SOURCE_LLM
+
+    async def async_should_check_nn(self, illuminance: float, water_level: float, temperature: float,
+                                    is_dark: bool, is_black_ice_danger: bool, timeout: float = None) -> bool:
+        """Async variant of should_check_nn; a gating LLM call that times out falls back to the rule."""
+        rule_decision, key, client, _ = self._route_locally(
+            illuminance, water_level, temperature, is_dark, is_black_ice_danger)
+        if key is None:
+            return rule_decision
+        self._count('llm_calls')
+        try:
+            with metrics.timer('router_llm'):
+                text = await client.generate_async(
+                    ROUTER_PROMPT.format(illuminance=illuminance, water_level=water_level, temperature=temperature),
+                    timeout=timeout)
+            decision = self._parse_decision(text)
+        except Exception:
+            self._count('llm_errors')
+            metrics.count('errors', 'router_llm')
+            decision = None
+        return self._record_gated(key, decision, rule_decision)
+
+    def _submit_advisory(self, key, client, illuminance, water_level, temperature, rule_decision):
+        with self._lock:
+            if key in self._in_flight:
+                self._counters['llm_calls_avoided'] += 1
+                return
+            self._in_flight.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='weather-router')
+        self._executor.submit(self._advise, key, client, illuminance, water_level, temperature, rule_decision)
+
+    def _advise(self, key, client, illuminance, water_level, temperature, rule_decision):
+        try:
+            decision = self._ask_llm(client, illuminance, water_level, temperature)
+            if decision is not None:
+                self._cache.set(key, decision)
+                if decision != rule_decision:
+                    self._count('llm_disagreements')
+                    print(f"(LLM: Advisory router disagrees with rule: LLM={decision}, rule={rule_decision})")
+        finally:
+            with self._lock:
+                self._in_flight.discard(key)
+
+    def wait_for_advisories(self):
+        """Blocks until all queued advisory LLM calls are finished (used by tests and shutdown)."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _ask_llm(self, client, illuminance: float, water_level: float, temperature: float):
+        """Queries the LLM router. Returns True/False, or None if the call failed."""
+        self._count('llm_calls')
+        try:
+            with metrics.timer('router_llm'):
+                text = client.generate(
+                    ROUTER_PROMPT.format(illuminance=illuminance, water_level=water_level, temperature=temperature))
+        except Exception:
+            self._count('llm_errors')
+            metrics.count('errors', 'router_llm')
+            return None
+        return self._parse_decision(text)
+
+    @staticmethod
+    def _parse_decision(text: str) -> bool:
+        llm_router_decision = text.strip().upper()
+        check_nn = "YES" in llm_router_decision
+        action = "checking NN" if check_nn else "skipping NN check"
+        print(f"(LLM: Weather routing decision: Router said '{llm_router_decision}', so {action})")
+        return check_nn
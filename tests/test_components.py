@@ -1,14 +1,43 @@
 import unittest
+import asyncio
+import json
+import time
 import numpy as np
 import os
 from unittest.mock import patch, MagicMock
 
 # Assuming src is in the Python path
-from src.decision_logic import get_speed_limit, get_weather_speed_reduction
-from src.llm_integration import get_simulated_aqi, get_llm_speed_reduction_recommendation
+from src.decision_logic import (get_speed_limit, get_speed_limits, get_weather_speed_reduction, decide_speed_limit,
+                                JustificationCode)
+from src.llm_integration import (get_simulated_aqi, get_llm_speed_reduction_recommendation,
+                                 async_get_llm_speed_reduction_recommendation,
+                                 async_get_llm_speed_reduction_recommendations, recommendation_cache)
+from src.aqi_cache import AQIRecommendationCache, aqi_band, KEY_BY_BAND
+from src.model_registry import ModelRegistry, ModelComponents, BACKEND_KERAS, BACKEND_NUMPY, BACKEND_TABLE
+from src.risk_table import RiskTable, default_axes, sensor_ranges
+from src.numpy_inference import NumpyMLP, export_numpy_model
+from src.data_preprocessing import (load_and_preprocess_data, load_processed_data, save_processed_data,
+                                    iter_processed_data, _ChunkedSensorAggregator, _count_accident_events, _typed_frame,
+                                    FEATURE_COLUMNS, TARGET_COLUMN, ACCIDENT_COUNT_COLUMNS)
+from src.log_reader import read_sensor_readings, read_accidents, reading_times, accident_times, YEAR
+from src.sensor_matrix import SensorMatrix, OUT_OF_RANGE_DROP
+from src.nn_sweep import expand_search_space, rank_results, share_arrays, open_shared_arrays
+from src.runtime_utils import available_cores, per_row_latency_us, pin_worker
+from src.gemini_client import GeminiClient, TokenBucket, set_client, reset_client
+from src.weather_router import WeatherRouter, MODE_ADVISORY, MODE_GATING, MODE_LOCAL
+from src.cache import TTLCache
+from src.segment_controller import SegmentController
+from src.metrics import Metrics, Histogram, serve_metrics
+from src.fleet import FleetEvaluator, Segment, segments_from_sensors, synthetic_sensors
+from src.audit_log import AuditLog, read_decisions, audit_days, explain
+from src.online_update import OnlineUpdater, ReplayBuffer, STATUS_ACCEPTED, STATUS_SKIPPED
 
 class TestLLMIntegration(unittest.TestCase):
 
+    def setUp(self):
+        reset_client()
+        recommendation_cache.clear()
+
     def test_get_simulated_aqi(self):
         # Test that AQI is within expected ranges for different hours
         aqi_morning = get_simulated_aqi(8) # Morning rush hour
@@ -23,7 +52,7 @@ class TestLLMIntegration(unittest.TestCase):
         self.assertGreaterEqual(aqi_off_peak, 30)
         self.assertLessEqual(aqi_off_peak, 90)
 
-    @patch('src.llm_integration.genai')
+    @patch('src.gemini_client.genai')
     @patch.dict(os.environ, {"GEMINI_API_KEY": "fake_key"})
     def test_get_llm_speed_reduction_recommendation_api(self, mock_genai):
         # Configure the mock to return a specific reduction
@@ -51,6 +80,8 @@ class TestLLMIntegration(unittest.TestCase):
 class TestDecisionLogic(unittest.TestCase):
 
     def setUp(self):
+        reset_client()
+        recommendation_cache.clear()
         # Create mocks for NN components
         self.mock_model = MagicMock()
         self.mock_scaler = MagicMock()
@@ -66,7 +97,8 @@ class TestDecisionLogic(unittest.TestCase):
     def test_default_speed_limit(self, mock_means, mock_scaler, mock_model, mock_aqi):
         # Mock API to return NO for routing
         with patch('google.generativeai.GenerativeModel') as MockModel, \
-             patch('google.generativeai.configure'):
+             patch('google.generativeai.configure'), \
+             patch('src.decision_logic.router', WeatherRouter(mode=MODE_GATING)):
             
             mock_router_model = MagicMock()
             mock_router_response = MagicMock()
@@ -92,6 +124,7 @@ class TestDecisionLogic(unittest.TestCase):
         # Mock API to return YES for routing
         with patch('google.generativeai.GenerativeModel') as MockModel, \
              patch('google.generativeai.configure'), \
+             patch('src.decision_logic.router', WeatherRouter(mode=MODE_GATING)), \
              patch.dict(os.environ, {"GEMINI_API_KEY": "fake_key"}):
             
             mock_router_model = MagicMock()
@@ -126,6 +159,7 @@ class TestDecisionLogic(unittest.TestCase):
         with patch('google.generativeai.GenerativeModel') as MockModel, \
              patch('google.generativeai.configure'), \
              patch('src.decision_logic.get_llm_speed_reduction_recommendation', return_value=20), \
+             patch('src.decision_logic.router', WeatherRouter(mode=MODE_GATING)), \
              patch.dict(os.environ, {"GEMINI_API_KEY": "fake_key"}):
              
             mock_router_model = MagicMock()
@@ -142,5 +176,1467 @@ class TestDecisionLogic(unittest.TestCase):
             self.assertIn("Darkness", reason)
             self.assertIn("Poor air quality", reason)
 
+    @patch('src.decision_logic.get_simulated_aqi', return_value=120)
+    def test_decision_is_structured_and_rendered_on_demand(self, mock_aqi):
+        with patch('src.decision_logic.nn_model', _LinearModel()), patch('src.decision_logic.scaler', None), \
+                patch('src.decision_logic.mean_values', np.zeros(8)), \
+                patch('src.decision_logic.router', WeatherRouter(mode=MODE_LOCAL)), \
+                patch('src.decision_logic.get_llm_speed_reduction_recommendation', return_value=10), \
+                patch('src.decision_logic.render_justification') as render:
+            decision = decide_speed_limit(100, 500, 10, 18)
+            render.assert_not_called()
+        self.assertEqual(decision.speed_limit, 60)
+        self.assertEqual(decision.code, JustificationCode.DARKNESS | JustificationCode.NN_HIGH_RISK
+                         | JustificationCode.POOR_AIR_QUALITY)
+        self.assertEqual(decision.predicted_accidents, 610 / 4)
+        self.assertEqual((decision.weather_reduction, decision.aqi, decision.aqi_reduction), (20, 120, 10))
+        self.assertEqual(decision.aqi_band, 2)
+        self.assertEqual(decision.justification,
+                         "Darkness (illuminance < 500 millilux); NN predicts 152.5 near-accidents/hr, reducing speed "
+                         "by 20 km/h.; Poor air quality (AQI: 120) leading to 10 km/h reduction by LLM recommendation.")
+
+class _SlowStubModel:
+    """Local stand-in for the Gemini model that injects latency and tracks concurrency."""
+
+    def __init__(self, answer="20", latency=0.05):
+        self.answer = answer
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = 0
+
+    async def generate_content_async(self, prompt, request_options=None):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        return MagicMock(text=self.answer)
+
+    def generate_content(self, prompt, request_options=None):
+        # Like the SDK, gives up after request_options['timeout'] seconds
+        timeout = (request_options or {}).get('timeout', float('inf'))
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(min(self.latency, timeout))
+        finally:
+            self.in_flight -= 1
+        if self.latency > timeout:
+            raise TimeoutError("Deadline exceeded")
+        return MagicMock(text=self.answer)
+
+
+class _ThreadedStubModel(_SlowStubModel):
+    """Stub without an async API, so the client runs it on a worker thread."""
+    generate_content_async = None
+
+
+@patch.dict(os.environ, {"GEMINI_API_KEY": "fake_key"})
+class TestGeminiClient(unittest.TestCase):
+
+    def setUp(self):
+        recommendation_cache.clear()
+
+    def tearDown(self):
+        reset_client()
+        recommendation_cache.clear()
+
+    def test_model_is_configured_once(self):
+        with patch('src.gemini_client.genai') as mock_genai:
+            mock_genai.GenerativeModel.return_value.generate_content.return_value.text = "10"
+            for aqi in (60, 70, 80):
+                self.assertEqual(get_llm_speed_reduction_recommendation(aqi), 10)
+            mock_genai.configure.assert_called_once()
+            mock_genai.GenerativeModel.assert_called_once()
+
+    def test_async_requests_respect_concurrency_cap(self):
+        stub = _SlowStubModel(answer="20", latency=0.05)
+        set_client(GeminiClient("fake_key", max_concurrency=3, rate_per_second=0, model=stub))
+        reductions = asyncio.run(async_get_llm_speed_reduction_recommendations(range(100, 112)))
+        self.assertEqual(reductions, [20] * 12)
+        self.assertEqual(stub.calls, 12)
+        self.assertLessEqual(stub.max_in_flight, 3)
+        self.assertGreater(stub.max_in_flight, 1)
+
+    def test_timeout_falls_back_to_rules(self):
+        stub = _SlowStubModel(answer="0", latency=1.0)
+        set_client(GeminiClient("fake_key", rate_per_second=0, model=stub))
+        start = time.perf_counter()
+        reduction = asyncio.run(async_get_llm_speed_reduction_recommendation(180, timeout=0.05))
+        self.assertEqual(reduction, 30)  # _fallback_rule_based_logic(180)
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+    def test_sync_timeout_falls_back_to_rules(self):
+        stub = _SlowStubModel(answer="0", latency=1.0)
+        set_client(GeminiClient("fake_key", rate_per_second=0, timeout=0.05, model=stub))
+        start = time.perf_counter()
+        self.assertEqual(get_llm_speed_reduction_recommendation(180), 30)
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+    def test_timed_out_thread_keeps_its_slot(self):
+        stub = _ThreadedStubModel(answer="0", latency=0.2)
+        client = GeminiClient("fake_key", max_concurrency=1, rate_per_second=0, timeout=1.0, model=stub)
+
+        async def timed_out_then_next():
+            with self.assertRaises(asyncio.TimeoutError):
+                await client.generate_async("first", timeout=0.02)
+            return await client.generate_async("second")
+
+        self.assertEqual(asyncio.run(timed_out_then_next()), "0")
+        self.assertEqual(stub.max_in_flight, 1)
+
+    def test_malformed_env_values_use_defaults(self):
+        from src.gemini_client import env_number
+        with patch.dict(os.environ, {"SPEEDLIMIT_LLM_TIMEOUT": "ten"}):
+            self.assertEqual(env_number("SPEEDLIMIT_LLM_TIMEOUT", 10.0), 10.0)
+        with patch.dict(os.environ, {"SPEEDLIMIT_LLM_MAX_CONCURRENCY": "4"}):
+            self.assertEqual(env_number("SPEEDLIMIT_LLM_MAX_CONCURRENCY", 8, int), 4)
+
+    def test_sync_models_run_off_the_event_loop(self):
+        stub = MagicMock()
+        stub.generate_content.return_value.text = "YES"
+        set_client(GeminiClient("fake_key", rate_per_second=0, model=stub))
+        router = WeatherRouter(mode=MODE_GATING)
+        self.assertTrue(asyncio.run(router.async_should_check_nn(1000, 500, 10, False, False)))
+        self.assertEqual(router.stats()['llm_disagreements'], 1)
+
+    def test_token_bucket_limits_rate(self):
+        now = [0.0]
+        bucket = TokenBucket(rate=2, capacity=2, clock=lambda: now[0])
+        self.assertEqual(bucket._take(), 0.0)
+        self.assertEqual(bucket._take(), 0.0)
+        self.assertAlmostEqual(bucket._take(), 0.5)
+        now[0] = 0.5
+        self.assertEqual(bucket._take(), 0.0)
+
+
+class TestAQIRecommendationCache(unittest.TestCase):
+
+    def setUp(self):
+        recommendation_cache.clear()
+
+    def tearDown(self):
+        reset_client()
+        recommendation_cache.clear()
+
+    def test_band_keying_and_ttl(self):
+        now = [1000.0]
+        cache = AQIRecommendationCache(key_mode=KEY_BY_BAND, ttl=600, clock=lambda: now[0])
+        compute = MagicMock(return_value=20)
+        self.assertEqual(cache.get_or_compute(110, compute), 20)
+        self.assertEqual(cache.get_or_compute(140, compute), 20)  # same "Unhealthy" band
+        compute.assert_called_once()
+        now[0] += 601
+        cache.get_or_compute(120, compute)
+        self.assertEqual(compute.call_count, 2)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 2)
+        self.assertEqual([aqi_band(a) for a in (30, 51, 101, 151)], [0, 1, 2, 3])
+
+    def test_errors_are_not_cached(self):
+        cache = AQIRecommendationCache()
+        with self.assertRaises(ValueError):
+            cache.get_or_compute(80, MagicMock(side_effect=ValueError("bad answer")))
+        self.assertEqual(cache.get_or_compute(80, lambda: 10), 10)
+        self.assertEqual(cache.stats()['errors'], 1)
+
+    def test_persistence_round_trip(self):
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'aqi_cache.json')
+            AQIRecommendationCache(persist_path=path).get_or_compute(95, lambda: 10)
+            warm = AQIRecommendationCache(persist_path=path)
+            compute = MagicMock(return_value=99)
+            self.assertEqual(warm.get_or_compute(95, compute), 10)
+            compute.assert_not_called()
+
+    def test_single_flight_threads(self):
+        from concurrent.futures import ThreadPoolExecutor
+        cache = AQIRecommendationCache()
+        calls = []
+
+        def slow_compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return 20
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: cache.get_or_compute(120, slow_compute), range(8)))
+        self.assertEqual(results, [20] * 8)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats()['single_flight_joins'], 7)
+
+    @patch.dict(os.environ, {"GEMINI_API_KEY": "fake_key"})
+    def test_concurrent_segments_share_one_agent_request(self):
+        stub = _SlowStubModel(answer="20", latency=0.05)
+        set_client(GeminiClient("fake_key", rate_per_second=0, model=stub))
+        reductions = asyncio.run(async_get_llm_speed_reduction_recommendations([120] * 40 + [160] * 10))
+        self.assertEqual(reductions, [20] * 50)
+        self.assertEqual(stub.calls, 2)
+        self.assertEqual(get_llm_speed_reduction_recommendation(120), 20)
+        self.assertEqual(stub.calls, 2)
+
+
+class TestTTLCache(unittest.TestCase):
+
+    def test_lru_eviction_and_expiry(self):
+        now = [0.0]
+        cache = TTLCache(maxsize=2, ttl=10, clock=lambda: now[0])
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')  # 'b' becomes least recently used
+        cache.set('c', 3)
+        self.assertNotIn('b', cache)
+        self.assertEqual(cache.get('a'), 1)
+        now[0] = 11.0
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 1)
+
+
+class TestWeatherRouter(unittest.TestCase):
+
+    def setUp(self):
+        reset_client()
+
+    def _mock_llm(self, answer):
+        mock_router_model = MagicMock()
+        mock_router_model.generate_content.return_value.text = answer
+        return patch('google.generativeai.GenerativeModel', return_value=mock_router_model), mock_router_model
+
+    @patch.dict(os.environ, {"GEMINI_API_KEY": "fake_key"})
+    def test_local_mode_never_calls_llm(self):
+        router = WeatherRouter(mode=MODE_LOCAL)
+        model_patch, mock_router_model = self._mock_llm("NO")
+        with model_patch, patch('google.generativeai.configure'):
+            self.assertTrue(router.should_check_nn(100, 500, 10, True, False))
+            self.assertFalse(router.should_check_nn(1000, 500, 10, False, False))
+        mock_router_model.generate_content.assert_not_called()
+        self.assertEqual(router.stats()['llm_calls_avoided'], 2)
+
+    @patch.dict(os.environ, {"GEMINI_API_KEY": "fake_key"})
+    def test_gating_mode_caches_quantized_inputs(self):
+        router = WeatherRouter(mode=MODE_GATING)
+        model_patch, mock_router_model = self._mock_llm("YES")
+        with model_patch, patch('google.generativeai.configure'):
+            self.assertTrue(router.should_check_nn(100.0, 500, 10, True, False))
+            self.assertTrue(router.should_check_nn(101.0, 500, 10, True, False))
+        mock_router_model.generate_content.assert_called_once()
+        stats = router.stats()
+        self.assertEqual(stats['cache_hits'], 1)
+        self.assertEqual(stats['llm_calls'], 1)
+
+    @patch.dict(os.environ, {"GEMINI_API_KEY": "fake_key"})
+    def test_route_reports_decision_source(self):
+        router = WeatherRouter(mode=MODE_GATING)
+        model_patch, _ = self._mock_llm("YES")
+        with model_patch, patch('google.generativeai.configure'):
+            self.assertEqual(router.route(100.0, 500, 10, True, False), (True, 'llm'))
+            self.assertEqual(router.route(100.0, 500, 10, True, False), (True, 'cache'))
+        with patch('google.generativeai.GenerativeModel', side_effect=RuntimeError("offline")), \
+             patch('google.generativeai.configure'):
+            reset_client()
+            self.assertEqual(router.route(1000, 1500, -5, False, True), (True, 'fallback'))
+        self.assertEqual(WeatherRouter(mode=MODE_LOCAL).route(1000, 500, 10, False, False), (False, 'rule'))
+
+    @patch.dict(os.environ, {"GEMINI_API_KEY": "fake_key"})
+    def test_cache_key_respects_spec_thresholds(self):
+        router = WeatherRouter(mode=MODE_GATING, illuminance_step=100)
+        self.assertNotEqual(router.cache_key(499, 0, 10, True), router.cache_key(501, 0, 10, False))
+
+    @patch.dict(os.environ, {"GEMINI_API_KEY": "fake_key"})
+    def test_gating_mode_falls_back_to_rule_on_error(self):
+        router = WeatherRouter(mode=MODE_GATING)
+        with patch('google.generativeai.GenerativeModel', side_effect=RuntimeError("offline")), \
+             patch('google.generativeai.configure'):
+            self.assertTrue(router.should_check_nn(1000, 1500, -5, False, True))
+        self.assertEqual(router.stats()['llm_errors'], 1)
+
+    @patch.dict(os.environ, {"GEMINI_API_KEY": "fake_key"})
+    def test_advisory_mode_returns_rule_and_consults_llm_in_background(self):
+        router = WeatherRouter(mode=MODE_ADVISORY)
+        model_patch, mock_router_model = self._mock_llm("YES")
+        with model_patch, patch('google.generativeai.configure'):
+            self.assertFalse(router.should_check_nn(1000, 500, 10, False, False))
+            router.wait_for_advisories()
+            # The background answer is cached for comparison, but the rule still decides
+            self.assertFalse(router.should_check_nn(1000, 500, 10, False, False))
+        mock_router_model.generate_content.assert_called_once()
+        stats = router.stats()
+        self.assertEqual(stats['llm_disagreements'], 1)
+        self.assertEqual(stats['cache_hits'], 1)
+
+
+class TestModelRegistry(unittest.TestCase):
+
+    def test_import_does_not_load_tensorflow(self):
+        import subprocess
+        import sys
+        output = subprocess.run(
+            [sys.executable, '-c', "import sys, src.decision_logic; print('tensorflow' in sys.modules)"],
+            capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip().splitlines()[-1], 'False')
+
+    def test_loads_scaler_lazily_and_once(self):
+        import tempfile
+        import joblib
+        from sklearn.preprocessing import StandardScaler
+        with tempfile.TemporaryDirectory() as tmp:
+            scaler_path = os.path.join(tmp, 'scaler.pkl')
+            joblib.dump(StandardScaler().fit(np.arange(16.0).reshape(2, 8)), scaler_path)
+            registry = ModelRegistry(model_path=os.path.join(tmp, 'missing.keras'), scaler_path=scaler_path)
+            self.assertFalse(registry.is_loaded)
+            components = registry.get()
+            self.assertTrue(registry.is_loaded)
+            self.assertIsNone(components.model)
+            np.testing.assert_array_equal(components.mean_values, np.arange(4.0, 12.0))
+            self.assertIs(registry.get(), components)
+
+    def test_concurrent_first_use_loads_once(self):
+        from concurrent.futures import ThreadPoolExecutor
+        registry = ModelRegistry()
+        calls = []
+
+        def slow_load():
+            calls.append(1)
+            time.sleep(0.05)
+            return ModelComponents()
+
+        with patch.object(registry, '_load', side_effect=slow_load), ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda _: registry.get(), range(8)))
+        self.assertEqual(len(calls), 1)
+
+    def test_reload_swaps_components_and_keeps_them_on_failure(self):
+        registry = ModelRegistry(backend=BACKEND_NUMPY)
+        old, new = ModelComponents(MagicMock(), None, np.zeros(8)), ModelComponents(MagicMock(), None, np.zeros(8))
+        with patch.object(registry, '_load', side_effect=[old, new, ModelComponents()]):
+            in_flight = registry.get()
+            self.assertTrue(registry.reload())
+            self.assertIs(registry.get(), new)
+            self.assertFalse(registry.reload())  # nothing loaded: keep serving the new model
+        self.assertIs(registry.get(), new)
+        self.assertIs(in_flight, old)
+        new.model.predict.assert_called_once()  # warmed up before the swap
+
+    @patch.dict(os.environ, {}, clear=True)
+    @patch('src.decision_logic.get_simulated_aqi', return_value=40)
+    def test_decision_logic_uses_registry_components(self, mock_aqi):
+        model = MagicMock()
+        model.predict.return_value = np.array([[1.5]])
+        components = ModelComponents(model, _ShiftScaler(np.zeros(8), np.ones(8)), np.zeros(8))
+        with patch('src.decision_logic.registry') as mock_registry:
+            mock_registry.get.return_value = components
+            speed_limit, _ = get_speed_limit(illuminance=100, water_level=500, temperature=10, current_hour=12)
+        self.assertEqual(speed_limit, 60)
+        model.predict.assert_called_once()
+
+
+class _FakeDense:
+    def __init__(self, kernel, bias, activation):
+        self.name = 'dense'
+        self._weights = [kernel, bias]
+        self._activation = activation
+
+    def get_weights(self):
+        return self._weights
+
+    def get_config(self):
+        return {'activation': self._activation}
+
+
+class TestNumpyInference(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.layers = [
+            _FakeDense(rng.standard_normal((8, 64)), rng.standard_normal(64), 'relu'),
+            _FakeDense(rng.standard_normal((64, 32)), rng.standard_normal(32), 'relu'),
+            _FakeDense(rng.standard_normal((32, 1)), rng.standard_normal(1), 'relu'),
+        ]
+        self.scaler = _ShiftScaler(rng.uniform(0, 100, 8), rng.uniform(1, 10, 8))
+        self.features = self.scaler.mean_ + rng.standard_normal((50, 8)) * self.scaler.scale_
+
+    def _reference_forward(self, features):
+        x = self.scaler.transform(features)
+        for layer in self.layers:
+            kernel, bias = layer.get_weights()
+            x = np.maximum(x @ kernel + bias, 0.0)
+        return x
+
+    def test_export_and_folded_forward_pass(self):
+        import tempfile
+        model = MagicMock(layers=self.layers)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = export_numpy_model(model, self.scaler, os.path.join(tmp, 'nn_model.npz'))
+            engine = NumpyMLP.load(path)
+            registry = ModelRegistry(numpy_model_path=path, backend=BACKEND_NUMPY)
+            components = registry.get()
+        np.testing.assert_allclose(engine.predict(self.features), self._reference_forward(self.features),
+                                   rtol=1e-9, atol=1e-9)
+        self.assertEqual(engine.predict(self.features[0]).shape, (1, 1))
+        self.assertIsNone(components.scaler)
+        np.testing.assert_array_equal(components.mean_values, self.scaler.mean_)
+
+    @unittest.skipUnless(__import__('importlib').util.find_spec('tensorflow'), "TensorFlow not installed")
+    def test_matches_keras_within_tolerance(self):
+        import tempfile
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.layers import Dense, Input
+        model = Sequential([Input(shape=(8,)), Dense(64, activation='relu'),
+                            Dense(32, activation='relu'), Dense(1, activation='relu')])
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = NumpyMLP.load(export_numpy_model(model, self.scaler, os.path.join(tmp, 'nn_model.npz')))
+        expected = model.predict(self.scaler.transform(self.features), verbose=0)
+        np.testing.assert_allclose(engine.predict(self.features), expected, rtol=1e-4, atol=1e-5)
+
+
+class _WeatherModel:
+    """Unscaled model whose output is multilinear in light, temperature and water."""
+
+    def predict(self, X, verbose=0):
+        X = np.asarray(X)
+        return (0.001 * X[:, 1] + 0.02 * X[:, 3] * (1 + X[:, 7] / 1000) + 0.5).reshape(-1, 1)
+
+
+class TestRiskTable(unittest.TestCase):
+
+    def setUp(self):
+        self.mean_values = np.arange(8.0)
+        self.axes = (np.array([0.0, 100.0, 500.0, 2000.0]), np.linspace(-30, 70, 11), np.linspace(0, 10000, 11))
+        self.table = RiskTable.build(_WeatherModel(), None, self.mean_values, self.axes)
+
+    def test_trilinear_lookup_is_exact_for_multilinear_model(self):
+        rng = np.random.default_rng(2)
+        features = np.tile(self.mean_values, (100, 1))
+        features[:, 1] = rng.uniform(0, 2000, 100)
+        features[:, 3] = rng.uniform(-30, 70, 100)
+        features[:, 7] = rng.uniform(0, 10000, 100)
+        expected = _WeatherModel().predict(features)
+        np.testing.assert_allclose(self.table.predict(features), expected, rtol=1e-5)
+        np.testing.assert_allclose(self.table.predict(features[:1]), expected[:1], rtol=1e-5)
+        self.assertLess(self.table.estimate_max_error(_WeatherModel(), None, random_points=500), 1e-4)
+
+    def test_inputs_are_clamped_to_grid(self):
+        self.assertAlmostEqual(self.table.lookup_one(5000.0, 100.0, -5.0), self.table.lookup_one(2000.0, 70.0, 0.0))
+        np.testing.assert_allclose(self.table.lookup([5000.0], [100.0], [-5.0]), [self.table.lookup_one(2000.0, 70.0, 0.0)])
+
+    def test_save_load_memory_mapped_and_registry_backend(self):
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'risk_table.npy')
+            self.table.save(path)
+            loaded = RiskTable.load(path)
+            self.assertIsInstance(loaded.values, np.memmap)
+            components = ModelRegistry(risk_table_path=path, backend=BACKEND_TABLE).get()
+            self.assertIsNone(components.scaler)
+            np.testing.assert_array_equal(components.mean_values, self.mean_values)
+            self.assertAlmostEqual(loaded.lookup_one(250.0, 3.0, 1234.0), self.table.lookup_one(250.0, 3.0, 1234.0))
+            del loaded, components
+
+    def test_default_axes_cover_sensor_ranges(self):
+        ranges = sensor_ranges()
+        light, temperature, water = default_axes(9, 5, 5, ranges)
+        self.assertEqual((light[0], light[-1]), ranges['light'])
+        self.assertEqual((temperature[0], temperature[-1]), ranges['temperature'])
+        self.assertEqual((water[0], water[-1]), ranges['water'])
+
+
+class _LinearModel:
+    """Deterministic stand-in for the Keras model: risk grows with the scaled features."""
+
+    def predict(self, X, verbose=0):
+        X = np.asarray(X)
+        return (np.abs(X).sum(axis=1) / 4.0).reshape(-1, 1)
+
+
+class _ShiftScaler:
+    def __init__(self, mean, scale):
+        self.mean_ = np.asarray(mean, dtype=float)
+        self.scale_ = np.asarray(scale, dtype=float)
+
+    def transform(self, X):
+        return (np.asarray(X) - self.mean_) / self.scale_
+
+
+class TestBatchDecisionLogic(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n = 200
+        self.illuminance = rng.choice([100.0, 499.0, 500.0, 2000.0], size=n)
+        self.water = rng.choice([0.0, 1000.0, 1500.0], size=n)
+        self.temperature = rng.choice([-5.0, 0.0, 10.0], size=n)
+        self.hours = rng.integers(0, 24, size=n)
+        means = np.array([70.0, 800.0, 80.0, 2.0, 2.0, 180.0, 20.0, 600.0])
+        self.scaler = _ShiftScaler(means, np.array([10.0, 300.0, 10.0, 5.0, 5.0, 90.0, 10.0, 400.0]))
+        self.model = _LinearModel()
+
+    def _scalar_results(self):
+        return [
+            get_speed_limit(i, w, t, int(h))
+            for i, w, t, h in zip(self.illuminance, self.water, self.temperature, self.hours)
+        ]
+
+    @patch.dict(os.environ, {}, clear=True)
+    @patch('src.decision_logic.get_simulated_aqi', side_effect=lambda hour: 30 + 5 * hour)
+    def test_batch_matches_scalar_path(self, mock_aqi):
+        with patch('src.decision_logic.nn_model', self.model), \
+             patch('src.decision_logic.scaler', self.scaler), \
+             patch('src.decision_logic.mean_values', self.scaler.mean_):
+            expected = self._scalar_results()
+            limits, codes = get_speed_limits(self.illuminance, self.water, self.temperature, self.hours)
+
+        np.testing.assert_array_equal(limits, [limit for limit, _ in expected])
+        for code, (_, reason) in zip(codes, expected):
+            code = JustificationCode(int(code))
+            self.assertEqual(bool(code & JustificationCode.DARKNESS), "Darkness" in reason)
+            self.assertEqual(bool(code & JustificationCode.BLACK_ICE), "black ice" in reason)
+            self.assertEqual(bool(code & JustificationCode.NN_HIGH_RISK), "NN predicts" in reason)
+            self.assertEqual(bool(code & JustificationCode.POOR_AIR_QUALITY), "Poor air quality" in reason)
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_batch_uses_single_model_call_for_routed_rows(self):
+        model = MagicMock()
+        model.predict.side_effect = lambda X, verbose=0: np.full((len(X), 1), 2.0)
+        with patch('src.decision_logic.nn_model', model), \
+             patch('src.decision_logic.scaler', self.scaler), \
+             patch('src.decision_logic.mean_values', self.scaler.mean_):
+            limits, codes = get_speed_limits(self.illuminance, self.water, self.temperature, self.hours,
+                                             aqi=np.full(len(self.hours), 40))
+
+        routed = (self.illuminance < 500) | ((self.water > 1000) & (self.temperature < 0))
+        model.predict.assert_called_once()
+        self.assertEqual(len(model.predict.call_args[0][0]), routed.sum())
+        np.testing.assert_array_equal(limits, np.where(routed, 60, 80))
+        self.assertTrue(np.all(codes[~routed] == JustificationCode.NONE))
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_batch_accepts_dataframe(self):
+        import pandas as pd
+        snapshots = pd.DataFrame({
+            'illuminance': [1000, 100, 1000],
+            'water_level': [500, 500, 1500],
+            'temperature': [10, 10, -5],
+            'current_hour': [12, 12, 12],
+            'aqi': [40, 40, 120],
+        })
+        with patch('src.decision_logic.nn_model', None):
+            limits, codes = get_speed_limits(snapshots)
+
+        np.testing.assert_array_equal(limits, [80, 60, 60])
+        self.assertEqual(codes[0], JustificationCode.NONE)
+        self.assertEqual(codes[1], JustificationCode.DARKNESS | JustificationCode.NN_HIGH_RISK)
+        self.assertEqual(codes[2], JustificationCode.BLACK_ICE | JustificationCode.NN_HIGH_RISK
+                         | JustificationCode.POOR_AIR_QUALITY)
+
+    @patch.dict(os.environ, {"GEMINI_API_KEY": "fake_key"})
+    @patch('src.decision_logic.get_llm_speed_reduction_recommendation', return_value=0)
+    def test_batch_follows_gating_router_like_scalar_path(self, mock_agent):
+        model = MagicMock()
+        # The LLM routes the bright rows to the NN too, and not the darkest ones
+        model.generate_content.side_effect = lambda prompt, request_options=None: MagicMock(
+            text="NO" if "Illuminance: 100" in prompt or "Illuminance: 499" in prompt else "YES")
+        set_client(GeminiClient("fake_key", rate_per_second=0, model=model))
+        self.addCleanup(reset_client)
+        with patch('src.decision_logic.router', WeatherRouter(mode=MODE_GATING)), \
+             patch('src.decision_logic.nn_model', self.model), \
+             patch('src.decision_logic.scaler', self.scaler), \
+             patch('src.decision_logic.mean_values', self.scaler.mean_), \
+             patch('src.decision_logic.get_simulated_aqi', return_value=40):
+            expected = self._scalar_results()
+            limits, codes = get_speed_limits(self.illuminance, self.water, self.temperature, self.hours)
+        np.testing.assert_array_equal(limits, [limit for limit, _ in expected])
+        for code, (_, reason) in zip(codes, expected):
+            self.assertEqual(bool(code & JustificationCode.NN_HIGH_RISK), "NN predicts" in reason)
+        nn_high_risk = (codes & JustificationCode.NN_HIGH_RISK) > 0
+        self.assertTrue(nn_high_risk[self.illuminance >= 500].any())
+        self.assertFalse(nn_high_risk[self.illuminance == 100].any())
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_batch_broadcasts_scalar_aqi(self):
+        with patch('src.decision_logic.nn_model', None):
+            limits, codes = get_speed_limits([100, 1000], [0, 0], [10, 10], [12, 12], aqi=120)
+            np.testing.assert_array_equal(limits, [60, 60])
+            self.assertTrue(np.all(codes & JustificationCode.POOR_AIR_QUALITY))
+            with self.assertRaises(ValueError):
+                get_speed_limits([100, 1000, 1000], [0, 0, 0], [10, 10, 10], [12, 12, 12], aqi=[40, 120])
+
+class TestDataPreprocessing(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        import tempfile
+        cls.tmp = tempfile.TemporaryDirectory()
+        with patch('builtins.print'):
+            cls.in_memory = load_and_preprocess_data(output_path=os.path.join(cls.tmp.name, 'in_memory.csv'))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def _read(self, name):
+        with open(os.path.join(self.tmp.name, name)) as f:
+            return f.read()
+
+    def test_chunked_output_is_identical(self):
+        for chunksize in (97, 5000):
+            name = f'chunked_{chunksize}.csv'
+            with patch('builtins.print'):
+                chunked = load_and_preprocess_data(output_path=os.path.join(self.tmp.name, name), chunksize=chunksize)
+            self.assertEqual(self._read(name), self._read('in_memory.csv'), f"chunksize={chunksize}")
+            self.assertEqual(list(chunked.columns), list(self.in_memory.columns))
+
+    def test_incremental_output_matches_full_rebuild(self):
+        import shutil
+        from src import data_preprocessing
+        data_dir = os.path.join(self.tmp.name, 'appended')
+        os.makedirs(data_dir)
+        logs = {}
+        for name in (data_preprocessing.SENSORS_FILE, data_preprocessing.SENSOR_TYPES_FILE):
+            shutil.copy(os.path.join('data', name), data_dir)
+        for name in (data_preprocessing.SENSOR_READINGS_FILE, data_preprocessing.ACCIDENTS_FILE):
+            with open(os.path.join('data', name), 'rb') as f:
+                logs[name] = f.read()
+        output_path = os.path.join(self.tmp.name, 'incremental.csv')
+        # Grow both logs in three steps; the middle cut leaves a last line without newline
+        for fraction in (0.3, 0.6, 1.0):
+            for name, content in logs.items():
+                cut = content.find(b'\n', int(len(content) * fraction)) + 1 or len(content)
+                with open(os.path.join(data_dir, name), 'wb') as f:
+                    f.write(content[:cut - 2] if fraction == 0.6 else content[:cut])
+            with patch('builtins.print') as mock_print:
+                load_and_preprocess_data(data_dir, output_path, incremental=True)
+        self.assertIn('hours re-emitted', mock_print.call_args_list[0].args[0])
+        self.assertNotIn('744 of 744', mock_print.call_args_list[0].args[0])
+        self.assertEqual(self._read('incremental.csv'), self._read('in_memory.csv'))
+
+        # A rewritten log invalidates the watermark and forces a rebuild
+        with open(os.path.join(data_dir, data_preprocessing.SENSOR_READINGS_FILE), 'wb') as f:
+            f.write(logs[data_preprocessing.SENSOR_READINGS_FILE].replace(b'0,00', b'0,01', 1))
+        with patch('builtins.print') as mock_print:
+            load_and_preprocess_data(data_dir, output_path, incremental=True)
+        self.assertIn('rebuilding', mock_print.call_args_list[0].args[0])
+        self.assertIn('744 of 744', mock_print.call_args_list[1].args[0])
+
+    def test_incremental_run_leaves_a_partial_record_for_later(self):
+        import shutil
+        from src import data_preprocessing
+        data_dir = os.path.join(self.tmp.name, 'partial')
+        os.makedirs(data_dir)
+        for name in (data_preprocessing.SENSORS_FILE, data_preprocessing.SENSOR_TYPES_FILE):
+            shutil.copy(os.path.join('data', name), data_dir)
+        # A record cut short and a garbled last line with all its fields
+        partial = {data_preprocessing.SENSOR_READINGS_FILE: b'\r\n1;10;',
+                   data_preprocessing.ACCIDENTS_FILE: b'\r\n1;x;;;;;;;;'}
+        for name, line in partial.items():
+            with open(os.path.join('data', name), 'rb') as f:
+                content = f.read()
+            with open(os.path.join(data_dir, name), 'wb') as f:
+                f.write(content + line)
+        output_path = os.path.join(self.tmp.name, 'partial.csv')
+        with patch('builtins.print') as mock_print:
+            load_and_preprocess_data(data_dir, output_path, incremental=True)
+        self.assertIn('incomplete last line', mock_print.call_args_list[0].args[0])
+        self.assertEqual(self._read('partial.csv'), self._read('in_memory.csv'))
+
+    def test_incremental_parquet_store_replaces_only_its_tail(self):
+        import shutil
+        import pandas as pd
+        from src import data_preprocessing
+        data_dir = os.path.join(self.tmp.name, 'appended_parquet')
+        os.makedirs(data_dir)
+        for name in (data_preprocessing.SENSORS_FILE, data_preprocessing.SENSOR_TYPES_FILE,
+                     data_preprocessing.ACCIDENTS_FILE):
+            shutil.copy(os.path.join('data', name), data_dir)
+        readings_path = os.path.join(data_dir, data_preprocessing.SENSOR_READINGS_FILE)
+        with open(os.path.join('data', data_preprocessing.SENSOR_READINGS_FILE), 'rb') as f:
+            readings = f.read()
+        cut = readings.find(b'\n', len(readings) // 2) + 1
+        with open(readings_path, 'wb') as f:
+            f.write(readings[:cut])
+        output_path = os.path.join(self.tmp.name, 'incremental.parquet')
+        with patch('builtins.print'):
+            load_and_preprocess_data(data_dir, output_path, incremental=True)
+        first_part = os.path.join(output_path, 'part-00000.parquet')
+        written = os.stat(first_part).st_mtime_ns
+
+        with open(readings_path, 'ab') as f:
+            f.write(readings[cut:])
+        with patch('builtins.print'):
+            load_and_preprocess_data(data_dir, output_path, incremental=True)
+        self.assertEqual(os.stat(first_part).st_mtime_ns, written)
+        pd.testing.assert_frame_equal(load_processed_data(output_path), _typed_frame(self.in_memory), check_freq=False)
+        self.assertEqual(sum(len(chunk) for chunk in iter_processed_data(output_path, chunk_rows=100)), 744)
+
+        # A late accident of January 9th (hour 195, second week) only rewrites that week's part
+        with open(os.path.join(data_dir, data_preprocessing.ACCIDENTS_FILE), 'ab') as f:
+            f.write(b'\r\n1;9;3;10;AB 123CD;;;20;;\r\n')
+        with patch('builtins.print') as mock_print:
+            recounted = load_and_preprocess_data(data_dir, output_path, incremental=True)
+            rebuilt = load_and_preprocess_data(data_dir, os.path.join(self.tmp.name, 'rebuilt.csv'))
+        self.assertIn('1 of 744 hours re-emitted, 1 earlier hours recounted', mock_print.call_args_list[0].args[0])
+        self.assertEqual(len(recounted), 1)
+        self.assertEqual(os.stat(first_part).st_mtime_ns, written)
+        self.assertEqual(sorted(os.listdir(output_path)),
+                         [f'part-{hour:05d}.parquet' for hour in range(0, 744, data_preprocessing.STORE_PART_HOURS)])
+        pd.testing.assert_frame_equal(load_processed_data(output_path), _typed_frame(rebuilt), check_freq=False)
+
+    def test_accident_event_counts(self):
+        import pandas as pd
+        # Integer columns without gaps: `notna() & col > 0` evaluated as (notna() & col) > 0, i.e. 1 & 20 == 0
+        accidents = pd.DataFrame({'Month': [1, 1, 1, 1], 'Day': [1, 1, 1, 31], 'Hour': [0, 0, 5, 24],
+                                  'Second': [10, 20, 30, 40], 'SkidAngle': [35, 0, 0, 0],
+                                  'CloseCarCm': [20, 20, 0, 8], 'CloseGuardrailCm': [0, 0, 0, 5]})
+        counts = _count_accident_events(accidents)
+        columns = {column: i for i, column in enumerate(ACCIDENT_COUNT_COLUMNS)}
+        self.assertEqual(counts[0, columns['near_accidents']], 2)
+        self.assertEqual(counts[0, columns['skid_events']], 1)
+        self.assertEqual(counts[0, columns['close_car_events']], 2)
+        self.assertEqual(counts[5].sum(), 0)
+        # Hour 24 of January 31st is counted in February 1st, 00:00
+        self.assertEqual(counts[31 * 24, columns['close_guardrail_events']], 1)
+        self.assertEqual(counts.sum(axis=0).tolist(), [3, 1, 3, 1])
+        self.assertEqual(list(self.in_memory.columns[-4:]), ACCIDENT_COUNT_COLUMNS)
+
+    def test_per_sensor_mode_writes_both_views(self):
+        per_sensor_path = os.path.join(self.tmp.name, 'sensors.parquet')
+        with patch('builtins.print'):
+            per_type = load_and_preprocess_data(output_path=os.path.join(self.tmp.name, 'per_type.parquet'),
+                                                per_sensor_path=per_sensor_path)
+        self.assertEqual(list(per_type.columns), list(self.in_memory.columns))
+        np.testing.assert_array_equal(per_type[TARGET_COLUMN], self.in_memory[TARGET_COLUMN])
+        per_sensor = load_processed_data(per_sensor_path)
+        self.assertIn('water_1', per_sensor.columns)
+        self.assertIn('water_11', per_sensor.columns)
+        self.assertEqual(len(per_sensor), len(self.in_memory))
+        with self.assertRaises(ValueError):
+            load_and_preprocess_data(per_sensor_path=per_sensor_path, incremental=True)
+
+    def test_columnar_artifacts_have_typed_schema(self):
+        for extension in ('.parquet', '.feather'):
+            path = save_processed_data(self.in_memory, os.path.join(self.tmp.name, f'processed{extension}'))
+            loaded = load_processed_data(path, columns=FEATURE_COLUMNS + [TARGET_COLUMN])
+            self.assertEqual(list(loaded.columns), FEATURE_COLUMNS + [TARGET_COLUMN])
+            self.assertTrue(all(loaded[column].dtype == np.float32 for column in FEATURE_COLUMNS))
+            self.assertEqual(loaded[TARGET_COLUMN].dtype, np.int32)
+            self.assertEqual(loaded.index.dtype, np.dtype('datetime64[ns]'))
+            np.testing.assert_array_equal(loaded.index, self.in_memory.index)
+            np.testing.assert_allclose(loaded[FEATURE_COLUMNS].to_numpy(), self.in_memory[FEATURE_COLUMNS].to_numpy(),
+                                       rtol=1e-6)
+            np.testing.assert_array_equal(loaded[TARGET_COLUMN], self.in_memory[TARGET_COLUMN])
+
+    def test_csv_export_and_column_selection(self):
+        loaded = load_processed_data(os.path.join(self.tmp.name, 'in_memory.csv'), columns=['light'])
+        self.assertEqual(list(loaded.columns), ['light'])
+        with self.assertRaises(ValueError):
+            save_processed_data(self.in_memory, os.path.join(self.tmp.name, 'processed.xlsx'))
+
+    def test_streams_processed_data_in_chunks(self):
+        import pandas as pd
+        columns = FEATURE_COLUMNS + [TARGET_COLUMN]
+        for extension in ('.parquet', '.feather', '.csv'):
+            path = save_processed_data(self.in_memory, os.path.join(self.tmp.name, f'streamed{extension}'))
+            chunks = list(iter_processed_data(path, columns, chunk_rows=100))
+            self.assertTrue(all(len(chunk) <= 100 for chunk in chunks))
+            streamed = pd.concat(chunks)
+            pd.testing.assert_frame_equal(streamed[columns], load_processed_data(path, columns)[columns])
+
+    def test_chunked_requires_chronological_readings(self):
+        import pandas as pd
+        lookup = pd.DataFrame({'SensorID': [1, 2], 'Type': ['water', 'light']})
+        aggregator = _ChunkedSensorAggregator(lookup)
+        aggregator.add_chunk(np.array([10, 20]), np.array([1, 2]), np.array([1.0, 2.0]))
+        with self.assertRaises(ValueError):
+            aggregator.add_chunk(np.array([5]), np.array([1]), np.array([3.0]))
+
+    def test_chunked_averages_per_timestamp_then_per_hour(self):
+        import pandas as pd
+        lookup = pd.DataFrame({'SensorID': [1, 2, 3], 'Type': ['water', 'water', 'light']})
+        aggregator = _ChunkedSensorAggregator(lookup)
+        # Two water readings share a timestamp split across chunks, unknown sensor -1 is ignored
+        aggregator.add_chunk(np.array([0, 60]), np.array([1, 1]), np.array([1.0, 2.0]))
+        aggregator.add_chunk(np.array([60, 60, 7200]), np.array([2, -1, 3]), np.array([4.0, 99.0, 5.0]))
+        result = aggregator.result()
+        self.assertEqual(len(result), 3)
+        self.assertAlmostEqual(result['water'].iloc[0], (1.0 + 3.0) / 2)
+        self.assertTrue(np.isnan(result['water'].iloc[1]))
+        self.assertEqual(result['light'].iloc[2], 5.0)
+
+class TestLogReader(unittest.TestCase):
+
+    readings_path = 'data/Case_Study_Speed_Limit_SensorReadingsYearN_V100.csv'
+    accidents_path = 'data/Case_Study_Speed_Limit_AccidentsYearN_V100.csv'
+
+    def test_engines_parse_compact_dtypes_identically(self):
+        import pandas as pd
+        default = pd.read_csv(self.readings_path, sep=';', decimal=',')
+        for engine in ('pandas', 'pyarrow'):
+            readings = read_sensor_readings(self.readings_path, engine=engine)
+            self.assertEqual(list(readings.columns), list(default.columns))  # BOM stripped from 'Month'
+            self.assertEqual(readings['Month'].dtype, np.uint8)
+            self.assertEqual(readings['Sensor'].dtype, np.int16)
+            self.assertEqual(readings['Value'].dtype, np.float32)
+            exact = read_sensor_readings(self.readings_path, engine=engine, value_dtype=np.float64)
+            np.testing.assert_array_equal(exact['Value'], default['Value'])
+            chunks = list(read_sensor_readings(self.readings_path, engine=engine, chunksize=1000))
+            self.assertEqual(sum(len(chunk) for chunk in chunks), len(default))
+        with self.assertRaises(ValueError):
+            read_sensor_readings(self.readings_path, engine='polars')
+
+    def test_arithmetic_timestamps_match_datetime_assembly(self):
+        import pandas as pd
+        readings = read_sensor_readings(self.readings_path)
+        expected = pd.to_datetime(pd.read_csv(self.readings_path, sep=';')[['Month', 'Day', 'Hour', 'Minute', 'Second']]
+                                  .assign(Year=YEAR))
+        np.testing.assert_array_equal(reading_times(readings), expected)
+        # Accident hours run up to 24 and roll over into the next day
+        accidents = read_accidents(self.accidents_path)
+        self.assertEqual(accidents['Hour'].max(), 24)
+        expected = pd.to_datetime(pd.read_csv(self.accidents_path, sep=';')[['Month', 'Day', 'Hour', 'Second']]
+                                  .assign(Year=YEAR))
+        np.testing.assert_array_equal(accident_times(accidents), expected)
+
+
+class TestQuantizedModel(unittest.TestCase):
+
+    def test_accuracy_gate(self):
+        from src.quantized_model import check_accuracy
+        target = np.array([0.0, 1.0, 2.0, 3.0])
+        report = check_accuracy(target + 0.1, target + 0.12, target, max_mae_increase=0.05)
+        self.assertAlmostEqual(report['mae_increase'], 0.02)
+        self.assertTrue(report['passed'])
+        self.assertFalse(check_accuracy(target, target + 0.2, target, max_mae_increase=0.05)['passed'])
+
+    @unittest.skipUnless(__import__('importlib').util.find_spec('tensorflow'), "TensorFlow not installed")
+    def test_quantized_backends_track_float_model(self):
+        import tempfile
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.layers import Dense, Input
+        from src.model_registry import BACKEND_TFLITE
+        from src.quantized_model import QuantizedModel, convert, QUANTIZATIONS
+        rng = np.random.default_rng(2)
+        scaler = _ShiftScaler(rng.uniform(0, 100, 8), rng.uniform(1, 10, 8))
+        features = scaler.mean_ + rng.standard_normal((64, 8)) * scaler.scale_
+        model = Sequential([Input(shape=(8,)), Dense(16, activation='relu'), Dense(1, activation='relu')])
+        model.layers[-1].bias.assign([1.0])  # keep the ReLU output away from zero
+        expected = model.predict(scaler.transform(features), verbose=0)
+        for quantization in QUANTIZATIONS:
+            engine = QuantizedModel(convert(model, quantization, scaler.transform(features)), scaler.mean_,
+                                    scaler.scale_, quantization)
+            tolerance = 0.1 if quantization == 'int8' else 0.01
+            np.testing.assert_allclose(engine.predict(features), expected, atol=tolerance * expected.max())
+            np.testing.assert_allclose(engine.predict(features[0]), expected[:1], atol=tolerance * expected.max())
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'nn_model.tflite')
+            engine.save(path)
+            components = ModelRegistry(tflite_model_path=path, backend=BACKEND_TFLITE).get()
+        self.assertEqual(components.model.quantization, QUANTIZATIONS[-1])
+        self.assertIsNone(components.scaler)
+        np.testing.assert_array_equal(components.mean_values, scaler.mean_)
+        np.testing.assert_allclose(components.model.predict(features), engine.predict(features))
+
+
+class TestSensorMatrix(unittest.TestCase):
+
+    def setUp(self):
+        import pandas as pd
+        self.sensors = pd.DataFrame({'SensorID': [1, 2, 3, -1], 'SensorTypeCode': ['W ', 'T', 'W', 'L']})
+        self.sensor_types = pd.DataFrame({'SensorTypeCode': ['W ', 'T', 'T', 'L'],
+                                          'Type': ['water', 'temperature', 'traffic', 'light'],
+                                          'Min': [0, -30, 0, 0], 'Max': [100, 70, 50, 1000]})
+
+    def _matrix(self, **kwargs):
+        matrix = SensorMatrix(self.sensors, self.sensor_types, **kwargs)
+        # Hour 0: water sensors 1 and 3, one out of range; hour 2: shared-code sensor 2; unknown IDs -1 and 9
+        matrix.add_readings(np.array([0, 10, 20, 7200, 30, 40]), np.array([1, 3, 3, 2, -1, 9]),
+                            np.array([10.0, 30.0, 500.0, -5.0, 1.0, np.nan]))
+        return matrix
+
+    def test_validates_ranges_and_counts_unknown_sensors(self):
+        clamped = self._matrix()
+        report = clamped.report()
+        self.assertEqual(report['unknown_sensors'], {-1: 1, 9: 1})
+        self.assertEqual(report['out_of_range'], {'water_3': 1})
+        per_sensor = clamped.per_sensor()
+        self.assertEqual(list(per_sensor.columns), ['water_1', 'temperature/traffic_2', 'water_3'])
+        self.assertEqual(len(per_sensor), 3)
+        self.assertEqual(per_sensor['water_3'].iloc[0], 65.0)  # 500 clamped to Max 100
+        # Shared code T: validated against the envelope [-30, 70], feeds both types
+        self.assertEqual(per_sensor['temperature/traffic_2'].iloc[2], -5.0)
+        dropped = self._matrix(out_of_range=OUT_OF_RANGE_DROP).per_sensor()
+        self.assertEqual(dropped['water_3'].iloc[0], 30.0)
+
+    def test_per_type_view_averages_sensor_means(self):
+        per_type = self._matrix().per_type()
+        self.assertEqual(list(per_type.columns), ['temperature', 'traffic', 'water'])  # no light readings
+        self.assertEqual(per_type['water'].iloc[0], (10.0 + 65.0) / 2)
+        self.assertEqual(per_type['temperature'].iloc[2], per_type['traffic'].iloc[2])
+        self.assertTrue(np.isnan(per_type['water'].iloc[1]))
+
+
+@unittest.skipUnless(__import__('importlib').util.find_spec('tensorflow'), "TensorFlow not installed")
+class TestInputPipeline(unittest.TestCase):
+
+    def test_chronological_splits_scaled_in_pipeline(self):
+        import tempfile
+        import pandas as pd
+        from sklearn.preprocessing import StandardScaler
+        from src.input_pipeline import build_datasets
+        rng = np.random.default_rng(3)
+        index = pd.date_range('2023-01-01', periods=100, freq='h', name='datetime')
+        data = pd.DataFrame(rng.uniform(0, 50, (100, len(FEATURE_COLUMNS))), index=index, columns=FEATURE_COLUMNS)
+        data[TARGET_COLUMN] = np.arange(100)  # the target encodes the hour, to check split membership
+        with tempfile.TemporaryDirectory() as tmp:
+            path = save_processed_data(data, os.path.join(tmp, 'processed.parquet'))
+            datasets, scaler, rows = build_datasets(path, batch_size=16, chunk_rows=30)
+            splits = {split: [batch for batch in dataset.as_numpy_iterator()] for split, dataset in datasets.items()}
+
+        self.assertEqual(rows, {'train': 70, 'validation': 10, 'test': 20})
+        targets = {split: np.concatenate([y for _, y in batches]) for split, batches in splits.items()}
+        np.testing.assert_array_equal(np.sort(targets['train']), np.arange(70))  # shuffled, past hours only
+        np.testing.assert_array_equal(targets['validation'], np.arange(70, 80))
+        np.testing.assert_array_equal(targets['test'], np.arange(80, 100))
+        expected = StandardScaler().fit(data[FEATURE_COLUMNS].to_numpy(dtype=np.float32)[:70])
+        np.testing.assert_allclose(scaler.mean_, expected.mean_, rtol=1e-6)
+        test_features = np.concatenate([x for x, _ in splits['test']])
+        np.testing.assert_allclose(test_features, expected.transform(data[FEATURE_COLUMNS].to_numpy()[80:]),
+                                   rtol=1e-4, atol=1e-4)
+
+    def test_scaled_splits_in_memory_are_chronological(self):
+        import tempfile
+        import pandas as pd
+        from src.input_pipeline import load_scaled_splits
+        rng = np.random.default_rng(4)
+        index = pd.date_range('2023-01-01', periods=50, freq='h', name='datetime')
+        data = pd.DataFrame(rng.uniform(0, 50, (50, len(FEATURE_COLUMNS))), index=index, columns=FEATURE_COLUMNS)
+        data[TARGET_COLUMN] = np.arange(50)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = save_processed_data(data, os.path.join(tmp, 'processed.parquet'))
+            splits, scaler = load_scaled_splits(path, chunk_rows=20)
+
+        np.testing.assert_array_equal(splits['train'][1], np.arange(35))
+        np.testing.assert_array_equal(splits['validation'][1], np.arange(35, 40))
+        np.testing.assert_array_equal(splits['test'][1], np.arange(40, 50))
+        np.testing.assert_allclose(splits['train'][0].mean(axis=0), 0, atol=1e-5)
+        np.testing.assert_allclose(splits['test'][0], scaler.transform(data[FEATURE_COLUMNS].to_numpy()[40:]),
+                                   rtol=1e-4, atol=1e-4)
+
+
+class TestSegmentController(unittest.TestCase):
+
+    def setUp(self):
+        self.model = MagicMock()
+        self.model.predict.return_value = np.array([[2.0]])
+        self.patches = [patch('src.decision_logic.nn_model', self.model), patch('src.decision_logic.scaler', None),
+                        patch('src.decision_logic.mean_values', np.zeros(8)),
+                        patch('src.decision_logic.router', WeatherRouter(mode=MODE_LOCAL)),
+                        patch('src.decision_logic.get_llm_speed_reduction_recommendation',
+                              side_effect=lambda aqi: 20 if aqi > 100 else 0)]
+        self.agent = [p.start() for p in self.patches][-1]
+        self.addCleanup(lambda: [p.stop() for p in self.patches])
+        self.controller = SegmentController('A1', hold_seconds=60)
+
+    def test_hysteresis_keeps_limit_near_darkness_threshold(self):
+        limits = [self.controller.update(illuminance, 500, 10, 12, aqi=40, now=t)[0]
+                  for t, illuminance in enumerate([490, 510, 495, 520, 499, 540])]
+        self.assertEqual(limits, [60] * 6)
+        stats = self.controller.stats()
+        self.assertEqual((stats['limit_changes'], stats['limit_changes_avoided'], stats['conditions_held']), (0, 3, 3))
+        # Past the band, but darkness has not been held for 60 s yet
+        self.assertEqual(self.controller.update(600, 500, 10, 12, aqi=40, now=30)[0], 60)
+        speed_limit, justification = self.controller.update(600, 500, 10, 12, aqi=40, now=61)
+        self.assertEqual(speed_limit, 80)
+        self.assertIn("Default speed limit", justification)
+        self.assertEqual(self.controller.stats()['limit_changes'], 1)
+
+    def test_black_ice_needs_band_to_clear(self):
+        self.controller.update(1000, 1200, -1, 12, aqi=40, now=0)
+        self.controller.update(1000, 990, -1, 12, aqi=40, now=100)
+        self.assertTrue(self.controller.is_black_ice_danger)
+        self.assertEqual(self.controller.update(1000, 900, -1, 12, aqi=40, now=101)[0], 80)
+        self.assertFalse(self.controller.is_black_ice_danger)
+
+    def test_raising_limit_waits_for_hold_time(self):
+        self.assertEqual(self.controller.update(1000, 500, 10, 18, aqi=120, now=0)[0], 60)
+        speed_limit, justification = self.controller.update(1000, 500, 10, 18, aqi=40, now=10)
+        self.assertEqual(speed_limit, 60)
+        self.assertTrue(justification.startswith("Poor air quality (AQI: 120) leading to 20 km/h reduction"))
+        self.assertIn("Holding 60 km/h", justification)
+        self.assertEqual(self.controller.update(1000, 500, 10, 18, aqi=40, now=60)[0], 80)
+        # Reductions are posted at once
+        self.assertEqual(self.controller.update(1000, 500, 10, 18, aqi=130, now=61)[0], 60)
+        self.assertEqual(self.controller.stats()['limit_changes'], 2)
+
+    def test_agent_is_requeried_when_aqi_crosses_a_band(self):
+        recommendation = lambda aqi: 10 * aqi_band(aqi)
+        with patch('src.decision_logic.get_llm_speed_reduction_recommendation', side_effect=recommendation):
+            limits = [self.controller.update(1000, 500, 10, 12, aqi=aqi, now=t)[0]
+                      for t, aqi in enumerate([48, 52, 99, 101, 149, 151])]
+        self.assertEqual(limits, [80, 70, 70, 60, 60, 50])
+        self.assertEqual(self.controller.stats()['aqi_evaluations_skipped'], 0)
+
+    def test_skips_nn_and_agent_when_inputs_barely_move(self):
+        for i in range(5):
+            self.controller.update(100 + i, 500, 10, 12, aqi=60 + i % 2, now=i)
+        self.assertEqual(self.model.predict.call_count, 1)
+        stats = self.controller.stats()
+        self.assertEqual((stats['weather_evaluations'], stats['weather_evaluations_skipped']), (1, 4))
+        self.assertEqual((stats['aqi_evaluations'], stats['aqi_evaluations_skipped']), (1, 4))
+        self.assertEqual(self.agent.call_count, 1)
+        self.controller.update(130, 500, 10, 12, aqi=80, now=5)
+        self.assertEqual(self.model.predict.call_count, 2)
+        self.assertEqual(self.agent.call_count, 2)
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_histogram_summary(self):
+        histogram = Histogram(buckets=(0.001, 0.01, 0.1))
+        for seconds in [0.0005] * 98 + [0.05, 0.5]:
+            histogram.observe(seconds)
+        summary = histogram.snapshot()
+        self.assertEqual(summary['count'], 100)
+        self.assertEqual(summary['p50_us'], 1000.0)
+        self.assertEqual(summary['p99_us'], 100000.0)
+        self.assertEqual(summary['max_us'], 500000.0)
+        self.assertEqual(summary['buckets'], {'0.001': 98, '0.01': 0, '0.1': 1, '+Inf': 1})
+
+    @patch('src.decision_logic.get_simulated_aqi', return_value=120)
+    def test_decision_stages_and_fallbacks_are_recorded(self, mock_aqi):
+        recorder = Metrics()
+        with patch('src.decision_logic.metrics', recorder), patch('src.llm_integration.metrics', recorder), \
+                patch('src.decision_logic.nn_model', None), patch('src.decision_logic.scaler', None), \
+                patch('src.decision_logic.registry') as mock_registry, \
+                patch('src.llm_integration.get_client', return_value=None):
+            mock_registry.get.return_value = ModelComponents()
+            get_speed_limit(100, 500, 10, 18)
+            get_speed_limits([100, 900], [500, 500], [10, 10], [18, 18], aqi=[40, 120])
+        snapshot = recorder.snapshot()
+        self.assertTrue({'router', 'aqi_source', 'decision', 'batch_decision'} <= set(snapshot['stages']))
+        self.assertEqual(snapshot['stages']['decision']['count'], 1)
+        self.assertEqual(snapshot['counters']['fallbacks'], {'aqi_rule': 3, 'no_model': 2})
+        self.assertIn('speedlimit_fallbacks_total{kind="no_model"} 2', recorder.to_prometheus())
+
+    def test_disabled_metrics_record_nothing(self):
+        recorder = Metrics(enabled=False)
+        with recorder.timer('router'):
+            recorder.count('errors', 'nn_predict')
+        self.assertEqual(recorder.snapshot(), {'stages': {}, 'counters': {}, 'collectors': {}})
+
+    def test_exporter_serves_prometheus_and_json(self):
+        import urllib.request
+        recorder = Metrics()
+        recorder.observe('nn_predict', 0.002)
+        recorder.register_collector('router', lambda: {'cache_hits': 3, 'mode': 'local'})
+        server = serve_metrics(port=0, source=recorder)
+        self.addCleanup(server.shutdown)
+        base = f'http://127.0.0.1:{server.server_address[1]}'
+        text = urllib.request.urlopen(f'{base}/metrics').read().decode()
+        self.assertIn('speedlimit_stage_seconds_count{stage="nn_predict"} 1', text)
+        self.assertIn('speedlimit_router_cache_hits 3', text)
+        snapshot = json.loads(urllib.request.urlopen(f'{base}/metrics.json').read())
+        self.assertEqual(snapshot['collectors'], {'router': {'cache_hits': 3}})
+
+
+class TestAuditLog(unittest.TestCase):
+
+    def setUp(self):
+        import tempfile
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(__import__('shutil').rmtree, self.directory, True)
+
+    @patch('src.decision_logic.get_simulated_aqi', return_value=120)
+    def test_single_and_batched_decisions_are_recorded(self, mock_aqi):
+        audit = AuditLog(self.directory)
+        with patch('src.decision_logic.audit_log', audit), patch('src.decision_logic.nn_model', _LinearModel()), \
+                patch('src.decision_logic.scaler', None), patch('src.decision_logic.mean_values', np.zeros(8)), \
+                patch('src.decision_logic.router', WeatherRouter(mode=MODE_LOCAL)), \
+                patch('src.llm_integration.get_client', return_value=None):
+            get_speed_limit(100, 500, 10, 18)
+            get_speed_limits([900, 50], [500, 500], [10, 10], [7, 7], aqi=[40, 40])
+        audit.close()
+        decisions = read_decisions(directory=self.directory)
+        self.assertEqual(list(decisions['path']), ['single', 'batch', 'batch'])
+        self.assertEqual(list(decisions['speed_limit']), [60, 80, 60])
+        self.assertEqual(list(decisions['aqi']), [120, 40, 40])
+        self.assertEqual(list(decisions['aqi_source']), ['rule'] * 3)
+        self.assertEqual(list(decisions['router_source']), ['rule'] * 3)
+        self.assertEqual(list(decisions['check_nn']), [True, False, True])
+        # The NN is skipped in daylight, so there is no prediction to record
+        self.assertEqual(decisions['predicted_accidents'][0], np.float32(610 / 4))
+        self.assertTrue(np.isnan(decisions['predicted_accidents'][1]))
+        self.assertEqual(decisions['code'][0], JustificationCode.DARKNESS | JustificationCode.NN_HIGH_RISK
+                         | JustificationCode.POOR_AIR_QUALITY)
+        self.assertEqual(audit.stats()['written'], 3)
+        justifications = explain(decisions)
+        self.assertIn("NN predicts 152.5 near-accidents/hr", justifications[0])
+        self.assertEqual(justifications[1], "Default speed limit (80 km/h) due to no detected risks.")
+
+    @patch('src.decision_logic.get_llm_speed_reduction_recommendation', return_value=0)
+    def test_fleet_and_segment_decisions_are_recorded_but_not_replays(self, mock_agent):
+        import pandas as pd
+        from src.replay import replay
+        audit = AuditLog(self.directory)
+        readings = pd.Series([100, 500, 10, 900, 500, 10], index=range(1, 7), dtype=float)
+        timeline = pd.DataFrame({'illuminance': [100.0, 900.0], 'water_level': 500.0, 'temperature': 10.0},
+                                index=pd.date_range('2023-01-01', periods=2, freq='h'))
+        with patch('src.decision_logic.audit_log', audit), patch('src.decision_logic.nn_model', _LinearModel()), \
+                patch('src.decision_logic.scaler', None), patch('src.decision_logic.mean_values', np.zeros(8)), \
+                patch('src.decision_logic.router', WeatherRouter(mode=MODE_LOCAL)):
+            with FleetEvaluator(segments_from_sensors(synthetic_sensors(2)), workers=0) as fleet:
+                fleet.evaluate(readings, 18, aqi=40)
+            SegmentController('A1').update(100, 500, 10, 18, aqi=40, now=0)
+            replay(timeline, lambda times: np.full(len(times), 40))
+        audit.close()
+        decisions = read_decisions(directory=self.directory)
+        self.assertEqual(list(decisions['path']), ['fleet', 'fleet', 'segment'])
+        self.assertEqual(list(decisions['speed_limit']), [60, 80, 60])
+        self.assertEqual(list(decisions['check_nn']), [True, False, True])
+        self.assertEqual(decisions['predicted_accidents'][2], np.float32(610 / 4))
+
+    def test_full_queue_drops_records(self):
+        audit = AuditLog(self.directory, flush_seconds=60, max_pending=2)
+        for hour in range(5):
+            audit.record(1000, 500, 10, hour, False, 'rule', float('nan'), 0, 40, 0, 'rule', 80, 0, 1e-5)
+        self.assertEqual(audit.stats()['dropped'], 3)
+        audit.close()
+        self.assertEqual(list(read_decisions(directory=self.directory)['current_hour']), [0, 1])
+
+    def test_files_are_partitioned_by_utc_day(self):
+        now = [1_700_000_000.0]  # 2023-11-14 22:13 UTC
+        audit = AuditLog(self.directory, clock=lambda: now[0])
+        audit.record(1000, 500, 10, 12, False, 'rule', float('nan'), 0, 40, 0, 'rule', 80, 0, 1e-5)
+        audit.flush()
+        now[0] += 86400
+        audit.record(100, 500, 10, 12, True, 'rule', 2.0, 20, 40, 0, 'rule', 60, 5, 1e-5)
+        audit.close()
+        self.assertEqual(audit_days(self.directory), ['2023-11-14', '2023-11-15'])
+        second_day = read_decisions('2023-11-15', self.directory)
+        self.assertEqual(list(second_day['speed_limit']), [60])
+
+
+class TestOnlineUpdate(unittest.TestCase):
+
+    def _hours(self, n, near_accidents, seed=0):
+        import pandas as pd
+        rng = np.random.default_rng(seed)
+        index = pd.date_range('2023-03-01', periods=n, freq='h', name='datetime')
+        data = pd.DataFrame(rng.uniform(0, 50, (n, len(FEATURE_COLUMNS))), index=index, columns=FEATURE_COLUMNS)
+        data[TARGET_COLUMN] = near_accidents
+        return data
+
+    def test_replay_buffer_samples_the_whole_history(self):
+        buffer = ReplayBuffer(capacity=100)
+        buffer.add(np.zeros((10000, len(FEATURE_COLUMNS))), np.arange(10000))
+        _, targets = buffer.arrays()
+        self.assertEqual((len(buffer), buffer.seen), (100, 10000))
+        self.assertTrue((targets < 5000).any() and (targets >= 5000).any())
+
+    def test_waits_for_a_full_holdout_window(self):
+        updater = OnlineUpdater(ModelRegistry(backend=BACKEND_NUMPY), holdout_hours=24)
+        updater.add_hours(self._hours(30, 1.0).iloc[:24])
+        self.assertEqual(updater.update()['status'], STATUS_SKIPPED)
+        self.assertEqual(updater.stats()['pending_hours'], 24)
+
+    @unittest.skipUnless(__import__('importlib').util.find_spec('tensorflow'), "TensorFlow not installed")
+    def test_fine_tunes_validates_and_swaps(self):
+        from src.model_registry import BACKEND_AUTO
+        history, new_hours = self._hours(96, 0.0), self._hours(72, 3.0, seed=1)
+        for backend in (BACKEND_KERAS, BACKEND_AUTO):
+            with self.subTest(backend=backend):
+                self._fine_tune_and_swap(backend, history, new_hours)
+
+    def _fine_tune_and_swap(self, backend, history, new_hours):
+        import tempfile
+        import joblib
+        import tensorflow as tf
+        from sklearn.preprocessing import StandardScaler
+        from src.nn_training import build_model
+        with tempfile.TemporaryDirectory() as tmp:
+            registry = ModelRegistry(model_path=os.path.join(tmp, 'nn_model.keras'),
+                                     scaler_path=os.path.join(tmp, 'scaler.pkl'),
+                                     numpy_model_path=os.path.join(tmp, 'nn_model.npz'), backend=backend)
+            joblib.dump(StandardScaler().fit(history[FEATURE_COLUMNS].to_numpy()), registry.scaler_path)
+            tf.keras.utils.set_random_seed(0)  # the same starting model for every backend
+            build_model(len(FEATURE_COLUMNS), hidden_layers=(4,)).save(registry.model_path)
+            served = registry.warm_up()
+
+            updater = OnlineUpdater(registry, holdout_hours=24, buffer_hours=32, epochs=20, learning_rate=0.05)
+            updater.seed_history(history)
+            updater.add_hours(new_hours)
+            result = updater.update()
+            self.assertEqual(result['status'], STATUS_ACCEPTED, result)
+            self.assertLess(result['candidate_mae'], result['current_mae'])
+            self.assertEqual((result['fresh_hours'], result['replayed_hours']), (48, 32))
+            self.assertTrue(result['swapped'])
+            self.assertIsNot(registry.get().model, served.model)
+            # No temporary files left, and no .npz that would switch an 'auto' registry to NumPy
+            self.assertEqual(sorted(os.listdir(tmp)), ['nn_model.keras', 'scaler.pkl'])
+        self.assertEqual(updater.stats()['pending_hours'], 24)
+
+
+class TestFleetEvaluator(unittest.TestCase):
+
+    def setUp(self):
+        import pandas as pd
+        self.segments = segments_from_sensors(synthetic_sensors(4))
+        # Segment 0: dark, 1: bright, 2: black ice, 3: bright
+        self.readings = pd.Series([100, 500, 10, 900, 500, 10, 900, 1500, -3, 900, 500, 10],
+                                  index=range(1, 13), dtype=float)
+
+    def test_segments_from_sensors_table(self):
+        import pandas as pd
+        sensors = pd.DataFrame({'SensorID': [1, 2, 3, 7, 8, 9, 15], 'SensorTypeCode': ['W', 'L', 'N', 'T', 'W', 'L', 'T']})
+        self.assertEqual(segments_from_sensors(sensors), [Segment(0, 2, 1, 7), Segment(1, 9, 8, 15)])
+        self.assertEqual(self.segments[3], Segment(3, 10, 11, 12))
+
+    @patch('src.decision_logic.get_llm_speed_reduction_recommendation', side_effect=lambda aqi: 20 if aqi > 100 else 0)
+    def test_matches_get_speed_limits(self, mock_agent):
+        with patch('src.decision_logic.nn_model', _LinearModel()), patch('src.decision_logic.scaler', None), \
+                patch('src.decision_logic.mean_values', np.zeros(8)):
+            with FleetEvaluator(self.segments, workers=0) as fleet:
+                speed_limits, codes = fleet.evaluate(self.readings, 18, aqi=[40, 120, 40, 40])
+            self.assertEqual(sorted(call.args[0] for call in mock_agent.call_args_list), [40, 120])
+            expected = get_speed_limits([100, 900, 900, 900], [500, 500, 1500, 500], [10, 10, -3, 10], [18] * 4,
+                                        aqi=[40, 120, 40, 40])
+        np.testing.assert_array_equal(speed_limits, expected[0])
+        np.testing.assert_array_equal(codes, expected[1])
+        self.assertEqual(list(speed_limits), [60, 60, 60, 80])
+
+    def test_missing_sensor_reading_raises(self):
+        with FleetEvaluator(self.segments, workers=0) as fleet:
+            with self.assertRaises(ValueError):
+                fleet.evaluate(self.readings.drop(8), 12, aqi=40)
+
+    @patch('src.decision_logic.get_llm_speed_reduction_recommendation', return_value=0)
+    def test_worker_processes_shard_the_fleet(self, mock_agent):
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmp:
+            # No artifacts: the workers use the simulated NN (1.5 near-accidents/hr when routed)
+            options = {'model_path': os.path.join(tmp, 'missing.keras'), 'scaler_path': os.path.join(tmp, 'missing.pkl'),
+                       'numpy_model_path': os.path.join(tmp, 'missing.npz')}
+            with FleetEvaluator(self.segments, workers=2, min_shard_rows=2, registry_options=options) as fleet:
+                self.assertEqual(len(fleet._shards(4)), 2)
+                speed_limits, codes = fleet.evaluate(self.readings, 12, aqi=40)
+        self.assertEqual(list(speed_limits), [60, 80, 60, 80])
+        self.assertEqual(list(codes), [JustificationCode.DARKNESS | JustificationCode.NN_HIGH_RISK, 0,
+                                       JustificationCode.BLACK_ICE | JustificationCode.NN_HIGH_RISK, 0])
+
+    @patch('src.decision_logic.get_llm_speed_reduction_recommendation', return_value=0)
+    def test_workers_restart_after_a_model_swap(self, mock_agent):
+        import tempfile
+        with tempfile.TemporaryDirectory() as tmp, patch('src.decision_logic.registry', ModelRegistry()) as registry:
+            options = {'model_path': os.path.join(tmp, 'missing.keras'), 'scaler_path': os.path.join(tmp, 'missing.pkl'),
+                       'numpy_model_path': os.path.join(tmp, 'missing.npz')}
+            with FleetEvaluator(self.segments, workers=1, registry_options=options) as fleet:
+                fleet.evaluate(self.readings, 12, aqi=40)
+                pool = fleet._processes
+                fleet.evaluate(self.readings, 12, aqi=40)
+                self.assertIs(fleet._processes, pool)
+                registry.swap(ModelComponents())
+                speed_limits, _ = fleet.evaluate(self.readings, 12, aqi=40)
+                self.assertIsNot(fleet._processes, pool)
+        self.assertEqual(list(speed_limits), [60, 80, 60, 80])
+
+
+class TestReplay(unittest.TestCase):
+
+    def setUp(self):
+        import pandas as pd
+        index = pd.date_range('2023-01-01', periods=6, freq='h', name='datetime')
+        # Darkest, dark, bright, black ice, bright, dark
+        self.timeline = pd.DataFrame({'illuminance': [50.0, 100.0, 900.0, 900.0, 900.0, 100.0],
+                                      'water_level': [0.0, 0.0, 0.0, 1500.0, 0.0, 0.0],
+                                      'temperature': [5.0, 5.0, 5.0, -3.0, 5.0, 5.0],
+                                      TARGET_COLUMN: [3, 0, 4, 2, 0, 1]}, index=index)
+
+    def test_seeded_aqi_is_reproducible_across_batches(self):
+        import pandas as pd
+        from src.replay import SeededAQISource
+        times = pd.date_range('2023-01-01', periods=24 * 14, freq='h')
+        aqi = SeededAQISource(7)(times)
+        np.testing.assert_array_equal(aqi, np.concatenate([SeededAQISource(7)(times[i:i + 50])
+                                                           for i in range(0, len(times), 50)]))
+        self.assertFalse(np.array_equal(aqi, SeededAQISource(8)(times)))
+        rush = (times.hour >= 16) & (times.hour < 20)
+        self.assertTrue(((aqi[rush] >= 80) & (aqi[rush] <= 150)).all())
+
+    def test_recorded_aqi_requires_every_hour(self):
+        import tempfile
+        import pandas as pd
+        from src.replay import RecordedAQISource
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'aqi.csv')
+            pd.DataFrame({'datetime': self.timeline.index[:4], 'aqi': [10, 20, 30, 40]}).to_csv(path, index=False)
+            source = RecordedAQISource(path)
+        np.testing.assert_array_equal(source(self.timeline.index[:4]), [10, 20, 30, 40])
+        with self.assertRaises(ValueError):
+            source(self.timeline.index)
+
+    def test_replay_scores_req1(self):
+        from src.replay import replay, score_req1
+        model = MagicMock()
+        # Predicts high risk for the darkest hour and the black-ice hour only
+        model.predict.side_effect = lambda features, verbose=0: np.where(
+            (features[:, 1] == 50.0) | (features[:, 7] == 1500.0), 2.0, 0.0)
+        with patch('src.decision_logic.nn_model', model), patch('src.decision_logic.scaler', None), \
+                patch('src.decision_logic.mean_values', np.zeros(8)):
+            replayed = replay(self.timeline, lambda times: np.full(len(times), 40), batch_hours=4)
+        self.assertEqual(list(replayed['speed_limit']), [60, 80, 80, 60, 80, 80])
+        self.assertEqual(replayed['reasons'].iloc[3], 'BLACK_ICE, NN_HIGH_RISK')
+        score = score_req1(replayed)
+        self.assertEqual((score['req1_hours'], score['reduced_hours'], score['missed_risky_hours']), (4, 2, 0))
+        self.assertEqual(score['unreduced_mean_near_accidents'], 0.5)
+        self.assertTrue(score['compliant'])
+        self.assertEqual((score['recall'], score['precision']), (1.0, 1.0))
+
+
+class _CollectingWriter:
+    def __init__(self):
+        self.lines = []
+
+    def write(self, data):
+        self.lines.extend(json.loads(line) for line in data.decode().splitlines())
+
+    async def drain(self):
+        pass
+
+
+class TestSpeedLimitService(unittest.TestCase):
+
+    @staticmethod
+    def _evaluate(snapshots):
+        return [int(snapshot['illuminance']) for snapshot in snapshots], [0] * len(snapshots)
+
+    def test_parses_snapshots(self):
+        from src.speed_limit_service import parse_snapshot, SnapshotError
+        snapshot = parse_snapshot(b'{"id": "a", "illuminance": 100, "water_level": 5, "temperature": -1, '
+                                  b'"timestamp": "2023-01-05T18:20:00"}')
+        self.assertEqual((snapshot['id'], snapshot['current_hour'], snapshot['aqi']), ('a', 18, None))
+        with self.assertRaises(SnapshotError) as context:
+            parse_snapshot(b'{"id": 7, "illuminance": 100, "water_level": 5}')
+        self.assertEqual(context.exception.snapshot_id, 7)
+        with self.assertRaises(SnapshotError):
+            parse_snapshot(b'{"illuminance": 1, "water_level": 5, "temperature": 1, "hour": 24}')
+
+    def test_answers_in_order_with_batches(self):
+        from src.speed_limit_service import MicroBatcher, serve_lines
+
+        async def lines():
+            for i in range(5):
+                yield json.dumps({'id': i, 'illuminance': 10 * i, 'water_level': 0, 'temperature': 0,
+                                  'hour': 1}).encode()
+            yield b'not json'
+
+        async def run():
+            batcher = MicroBatcher(self._evaluate, max_batch_size=2, max_latency=0.01)
+            task = asyncio.ensure_future(batcher.run())
+            writer = _CollectingWriter()
+            await serve_lines(lines(), writer, batcher)
+            task.cancel()
+            batcher.close()
+            return writer.lines, batcher.stats()
+
+        responses, stats = asyncio.run(run())
+        self.assertEqual([response.get('id') for response in responses], [0, 1, 2, 3, 4, None])
+        self.assertEqual([response.get('speed_limit') for response in responses[:5]], [0, 10, 20, 30, 40])
+        self.assertIn('error', responses[5])
+        self.assertEqual(stats['decisions'], 5)
+        self.assertLessEqual(stats['largest_batch'], 2)
+
+    def test_back_pressure_stops_reading(self):
+        import threading
+        from src.speed_limit_service import MicroBatcher, serve_lines
+        release = threading.Event()
+        pulled = []
+
+        def blocked_evaluate(snapshots):
+            release.wait(5)
+            return self._evaluate(snapshots)
+
+        async def lines():
+            for i in range(100):
+                pulled.append(i)
+                yield json.dumps({'illuminance': 1, 'water_level': 0, 'temperature': 0, 'hour': 1}).encode()
+
+        async def run():
+            batcher = MicroBatcher(blocked_evaluate, max_batch_size=4, max_latency=0.001, max_pending=4)
+            task = asyncio.ensure_future(batcher.run())
+            serving = asyncio.ensure_future(serve_lines(lines(), _CollectingWriter(), batcher, max_in_flight=8))
+            await asyncio.sleep(0.2)
+            pulled_while_blocked = len(pulled)
+            release.set()
+            await serving
+            task.cancel()
+            batcher.close()
+            return pulled_while_blocked
+
+        # One batch being evaluated, at most max_in_flight awaiting write, one line in hand
+        self.assertLessEqual(asyncio.run(run()), 4 + 8 + 1)
+        self.assertEqual(len(pulled), 100)
+
+
+class TestNNSweep(unittest.TestCase):
+
+    def test_expands_search_space_with_defaults(self):
+        candidates = expand_search_space({'hidden_layers': [[8], [16, 8]], 'learning_rate': [0.01],
+                                          'batch_size': [32, 64], 'epochs': [3]})
+        self.assertEqual(len(candidates), 4)
+        self.assertEqual(candidates[0], {'hidden_layers': (8,), 'learning_rate': 0.01, 'batch_size': 32,
+                                         'epochs': 3, 'early_stopping': 5})
+        with self.assertRaises(ValueError):
+            expand_search_space({'dropout': [0.1]})
+
+    def test_ranks_by_mae_then_latency(self):
+        table = rank_results([{'hidden_layers': 'a', 'test_mae': 0.9, 'latency_us_per_row': 5.0},
+                              {'hidden_layers': 'b', 'test_mae': 0.8, 'latency_us_per_row': 9.0},
+                              {'hidden_layers': 'c', 'test_mae': 0.8, 'latency_us_per_row': 7.0}])
+        self.assertEqual(list(table['hidden_layers']), ['c', 'b', 'a'])
+        self.assertEqual(list(table['rank']), [1, 2, 3])
+
+    def test_shared_arrays_are_memory_mapped(self):
+        import tempfile
+        X = np.arange(12, dtype=np.float32).reshape(4, 3)
+        with tempfile.TemporaryDirectory() as tmp:
+            shared = open_shared_arrays(share_arrays({'X': X}, tmp))
+            self.assertIsInstance(shared['X'], np.memmap)
+            np.testing.assert_array_equal(shared['X'], X)
+            del shared
+
+    def test_runtime_utils_time_single_rows_and_pin_workers(self):
+        import multiprocessing
+        shapes = []
+        latency = per_row_latency_us(lambda row: shapes.append(row.shape), np.zeros((5, 8)), rows=3)
+        self.assertEqual(shapes, [(1, 8)] * 3)
+        self.assertGreaterEqual(latency, 0)
+        cores, next_worker = available_cores(), multiprocessing.Value('i', 0)
+        with patch('os.sched_setaffinity', create=True) as mock_affinity:
+            pin_worker(cores, next_worker)
+            pin_worker(cores, next_worker)
+        self.assertEqual(next_worker.value, 2)
+        self.assertEqual(mock_affinity.call_args.args, (0, {cores[1 % len(cores)]}))
+
+    @unittest.skipUnless(__import__('importlib').util.find_spec('tensorflow'), "TensorFlow not installed")
+    def test_trains_candidate_on_shared_data(self):
+        from src import nn_sweep
+        rng = np.random.default_rng(0)
+        X = rng.standard_normal((64, 8)).astype(np.float32)
+        data = {'X_train': X[:40], 'y_train': np.abs(X[:40, 0]), 'X_validation': X[40:48],
+                'y_validation': np.abs(X[40:48, 0]), 'X_test': X[48:], 'y_test': np.abs(X[48:, 0]),
+                'scaler_mean': np.zeros(8), 'scaler_scale': np.ones(8)}
+        candidate = expand_search_space({'hidden_layers': [[4]], 'learning_rate': [0.01], 'batch_size': [16],
+                                         'epochs': [2], 'early_stopping': [None]})[0]
+        with patch.dict(nn_sweep._data, data):
+            result = nn_sweep._train_candidate(candidate)
+        self.assertEqual(result['hidden_layers'], '4')
+        self.assertEqual(result['epochs_trained'], 2)
+        self.assertEqual(result['parameters'], 8 * 4 + 4 + 4 + 1)
+        self.assertGreater(result['latency_us_per_row'], 0)
+
+
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()